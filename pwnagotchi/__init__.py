@@ -56,56 +56,37 @@ def uptime():
 
 
 def mem_usage():
-    with open('/proc/meminfo') as fp:
-        for line in fp:
-            line = line.strip()
-            if line.startswith("MemTotal:"):
-                kb_mem_total = int(line.split()[1])
-            if line.startswith("MemFree:"):
-                kb_mem_free = int(line.split()[1])
-            if line.startswith("Buffers:"):
-                kb_main_buffers = int(line.split()[1])
-            if line.startswith("Cached:"):
-                kb_main_cached = int(line.split()[1])
-        kb_mem_used = kb_mem_total - kb_mem_free - kb_main_cached - kb_main_buffers
-        return round(kb_mem_used / kb_mem_total, 1)
-
-    return 0
-
-
-def _cpu_stat():
     """
-    Returns the splitted first line of the /proc/stat file
+    Returns the memory usage of the last sysmon sample
     """
-    with open('/proc/stat', 'rt') as fp:
-        return list(map(int, fp.readline().split()[1:]))
+    from pwnagotchi import sysmon
+    return round(sysmon.latest()['mem_usage'], 1)
 
 
 def cpu_load():
     """
-    Returns the current cpuload
+    Returns the cpu load of the last sysmon sample
     """
-    parts0 = _cpu_stat()
-    time.sleep(0.1)
-    parts1 = _cpu_stat()
-    parts_diff = [p1 - p0 for (p0, p1) in zip(parts0, parts1)]
-    user, nice, sys, idle, iowait, irq, softirq, steal, _guest, _guest_nice = parts_diff
-    idle_sum = idle + iowait
-    non_idle_sum = user + nice + sys + irq + softirq + steal
-    total = idle_sum + non_idle_sum
-    return non_idle_sum / total
+    from pwnagotchi import sysmon
+    return sysmon.latest()['cpu_load']
 
 
 def temperature(celsius=True):
-    with open('/sys/class/thermal/thermal_zone0/temp', 'rt') as fp:
-        temp = int(fp.read().strip())
-    c = int(temp / 1000)
+    from pwnagotchi import sysmon
+    c = sysmon.latest()['temperature']
     return c if celsius else ((c * (9 / 5)) + 32)
 
 
+def _save_ai():
+    from pwnagotchi.ai import checkpoint
+    checkpoint.flush_all()
+
+
 def shutdown():
     logging.warning("Shutting down...")
 
+    _save_ai()
+
     from pwnagotchi.ui import view
     if view.ROOT:
         view.ROOT.on_shutdown()
@@ -125,6 +106,8 @@ def shutdown():
 def restart(mode):
     logging.warning(f"Restarting in {mode} mode...")
 
+    _save_ai()
+
     if mode == 'AUTO':
         os.system("touch /root/.pwnagotchi-auto")
     else:
@@ -141,6 +124,8 @@ def reboot(mode=None):
     else:
         logging.warning("Rebooting...")
 
+    _save_ai()
+
     from pwnagotchi.ui import view
     if view.ROOT:
         view.ROOT.on_rebooting()
@@ -1,7 +1,5 @@
 import time
-import json
 import os
-import re
 import logging
 import asyncio
 import _thread
@@ -9,41 +7,105 @@ import _thread
 import pwnagotchi
 import pwnagotchi.utils as utils
 import pwnagotchi.plugins as plugins
+import pwnagotchi.metrics as metrics
+import pwnagotchi.scheduler as scheduler
+import pwnagotchi.sysmon as sysmon
+import pwnagotchi.timing as timing
 from pwnagotchi.ui.web.server import Server
 from pwnagotchi.automata import Automata
 from pwnagotchi.log import LastSession
 from pwnagotchi.bettercap import Client
+from pwnagotchi.channels import ChannelPlanner
+from pwnagotchi.history import InteractionHistory
+from pwnagotchi.journal import Journal
+from pwnagotchi.radio import RadioModel
+from pwnagotchi.radios import Radio, TargetIndex
+from pwnagotchi.whitelist import Whitelist
+from pwnagotchi.runtime import Runtime
 from pwnagotchi.mesh.utils import AsyncAdvertiser
 from pwnagotchi.ai.train import AsyncTrainer
 
 RECOVERY_DATA_FILE = '/root/.pwnagotchi-recovery'
 
+UPTIME = metrics.gauge('pwnagotchi_uptime_seconds', 'System uptime.')
+ACCESS_POINTS = metrics.gauge('pwnagotchi_access_points', 'Access points in range, after the whitelist and filter.')
+STATIONS = metrics.gauge('pwnagotchi_stations', 'Client stations of the access points in range.')
+PEERS = metrics.gauge('pwnagotchi_peers', 'Units nearby.')
+HANDSHAKES = metrics.gauge('pwnagotchi_handshakes', 'Handshakes captured in this session.')
+UNIQUE_HANDSHAKES = metrics.gauge('pwnagotchi_unique_handshakes', 'Handshake files in the handshakes folder.')
+
 
 class Agent(Client, Automata, AsyncAdvertiser, AsyncTrainer):
     def __init__(self, view, config, keypair):
+        self._runtime = None
+        if config['main']['runtime'] == 'asyncio':
+            self._runtime = Runtime()
+            plugins.executor = self._runtime.plugins_executor
+
         Client.__init__(self, config['bettercap']['hostname'],
                         config['bettercap']['scheme'],
                         config['bettercap']['port'],
                         config['bettercap']['username'],
-                        config['bettercap']['password'])
+                        config['bettercap']['password'],
+                        (config['bettercap']['connect_timeout'], config['bettercap']['read_timeout']),
+                        config['bettercap']['session_max_age'],
+                        config['bettercap']['events_queue_size'])
         Automata.__init__(self, config, view)
         AsyncAdvertiser.__init__(self, config, view, keypair)
         AsyncTrainer.__init__(self, config)
 
         self._started_at = time.time()
-        self._filter = None if not config['main']['filter'] else re.compile(config['main']['filter'])
+        timing.enable(config['main']['timing'])
+        sysmon.start(config['main']['sysmon']['interval'], config['main']['sysmon']['history'])
+        self._scheduler = scheduler.load(config)
+        self._channel_planner = ChannelPlanner(config)
+        self._whitelist = Whitelist(config['main']['whitelist'], config['main']['filter'])
         self._current_channel = 0
         self._tot_aps = 0
         self._aps_on_channel = 0
         self._supported_channels = utils.iface_channels(config['main']['iface'])
+        self._targets = TargetIndex()
+        self._radios = [Radio(config['main']['iface'], self, self._supported_channels, primary=True)]
+        for extra in config['main']['radios']:
+            client = Client(extra.get('hostname', config['bettercap']['hostname']),
+                            config['bettercap']['scheme'],
+                            extra['port'],
+                            config['bettercap']['username'],
+                            config['bettercap']['password'],
+                            (config['bettercap']['connect_timeout'], config['bettercap']['read_timeout']),
+                            config['bettercap']['session_max_age'],
+                            config['bettercap']['events_queue_size'])
+            self._radios.append(Radio(extra['iface'], client, utils.iface_channels(extra['iface'])))
         self._view = view
         self._view.set_agent(self)
         self._web_ui = Server(self, config['ui'])
 
+        self._radio = None
+        if config['bettercap']['radio']['enabled']:
+            self._radio = RadioModel(config['bettercap']['radio']['reconcile_secs'])
+            for tag in RadioModel.TAGS:
+                self.events.register(tag, self._on_radio_event)
+        # plugins and the session lookup can block, keep them out of the websocket consumer
+        self.events.register('wifi.client.handshake', self._on_handshake, blocking=True)
         self._access_points = []
+        # the access points of all the radios and the version they were merged at
+        self._unfiltered = (None, [])
+        # (total aps, total stations, {channel: (aps, stations)})
+        self._counts = (0, 0, {})
         self._last_pwnd = None
-        self._history = {}
+        # interactions per MAC, keyed by utils.mac_to_int
+        self._history = InteractionHistory(config['main']['history']['max_memory'],
+                                           config['main']['history']['ttl'])
+        self._epoch.history = self._history
+        self._epoch.radios = self._radios
         self._handshakes = {}
+        # MACs of access points and stations we already have a handshake for
+        self._pwned_aps = set()
+        self._pwned_stas = set()
+        self._journal = Journal(RECOVERY_DATA_FILE,
+                                config['main']['recovery']['sync_every'],
+                                config['main']['recovery']['sync_secs'],
+                                config['main']['recovery']['compact_every'])
         self.last_session = LastSession(self._config)
         self.mode = 'auto'
 
@@ -61,25 +123,34 @@ class Agent(Client, Automata, AsyncAdvertiser, AsyncTrainer):
         return self._view
 
     def supported_channels(self):
-        return self._supported_channels
+        """
+        Channels at least one of the radios can tune to.
+        """
+        if len(self._radios) == 1:
+            return self._supported_channels
+        return sorted(set().union(*(radio.supported_channels for radio in self._radios)))
 
     def setup_events(self):
         logging.info(f"Connecting to {self.url}...")
 
-        for tag in self._config['bettercap']['silence']:
-            try:
-                self.run(f'events.ignore {tag}', verbose_errors=False)
-            except Exception:
-                pass
-
-    def _reset_wifi_settings(self):
-        mon_iface = self._config['main']['iface']
-        self.run(f"set wifi.interface {mon_iface}")
-        self.run(f"set wifi.ap.ttl {self._config['personality']['ap_ttl']}")
-        self.run(f"set wifi.sta.ttl {self._config['personality']['sta_ttl']}")
-        self.run(f"set wifi.rssi.min {self._config['personality']['min_rssi']}")
-        self.run(f"set wifi.handshakes.file {self._config['bettercap']['handshakes']}")
-        self.run("set wifi.handshakes.aggregate false")
+        silence = [f'events.ignore {tag}' for tag in self._config['bettercap']['silence']
+                   if self._radio is None or tag not in RadioModel.TAGS]
+        self.run_batch(silence, verbose_errors=False)
+
+    def _reset_wifi_settings(self, radio=None):
+        radio = self._radios[0] if radio is None else radio
+        mon_iface = radio.name
+        commands = [
+            f"set wifi.interface {mon_iface}",
+            f"set wifi.ap.ttl {self._config['personality']['ap_ttl']}",
+            f"set wifi.sta.ttl {self._config['personality']['sta_ttl']}",
+            f"set wifi.rssi.min {self._config['personality']['min_rssi']}",
+            f"set wifi.handshakes.file {self._config['bettercap']['handshakes']}",
+            "set wifi.handshakes.aggregate false"
+        ]
+        for command, result in zip(commands, radio.client.run_batch(commands)):
+            if isinstance(result, Exception):
+                logging.error(f"Error while running '{command}' ({result})")
 
     def start_monitor_mode(self):
         mon_iface = self._config['main']['iface']
@@ -88,7 +159,7 @@ class Agent(Client, Automata, AsyncAdvertiser, AsyncTrainer):
         has_mon = False
 
         while has_mon is False:
-            s = self.session()
+            s = self.session(max_age=0)
             for iface in s['interfaces']:
                 if iface['name'] == mon_iface:
                     logging.info(f"Found monitor interface: {iface['name']}")
@@ -122,13 +193,18 @@ class Agent(Client, Automata, AsyncAdvertiser, AsyncTrainer):
     def _wait_bettercap(self):
         while True:
             try:
-                _s = self.session()
+                _s = self.session(max_age=0)
                 return
             except Exception:
                 logging.info("Waiting for bettercap API to be available...")
                 time.sleep(1)
 
     def start(self):
+        # before anything gets journaled, next_epoch included
+        self._load_recovery_data()
+        if self._runtime is not None:
+            logging.info("Using the asyncio runtime.")
+            self._runtime.start()
         self.start_ai()
         self._wait_bettercap()
         self.setup_events()
@@ -136,10 +212,12 @@ class Agent(Client, Automata, AsyncAdvertiser, AsyncTrainer):
         self.start_monitor_mode()
         self.start_event_polling()
         self.start_session_fetcher()
+        self.start_radios()
         # print initial stats
         self.next_epoch()
         self.set_ready()
 
+    @timing.timed('recon')
     def recon(self):
         recon_time = self._config['personality']['recon_time']
         max_inactive = self._config['personality']['max_inactive_scale']
@@ -151,6 +229,8 @@ class Agent(Client, Automata, AsyncAdvertiser, AsyncTrainer):
 
         self._view.set('channel', '*')
 
+        self._channel_planner.leave()
+        self._recon_radios(channels)
         if not channels:
             self._current_channel = 0
             logging.debug(f"RECON {recon_time}s")
@@ -164,31 +244,102 @@ class Agent(Client, Automata, AsyncAdvertiser, AsyncTrainer):
 
         self.wait_for(recon_time, sleeping=False)
 
+    def _compiled_whitelist(self):
+        whitelist, filters = self._config['main']['whitelist'], self._config['main']['filter']
+        if not self._whitelist.compiled_from(whitelist, filters):
+            logging.debug("whitelist or filter changed, recompiling")
+            self._whitelist = Whitelist(whitelist, filters)
+        return self._whitelist
+
     def _filter_included(self, ap):
-        return self._filter is None or \
-               self._filter.match(ap['hostname']) is not None or \
-               self._filter.match(ap['mac']) is not None
+        return not self._compiled_whitelist().filtered_out(ap)
 
     def set_access_points(self, aps):
+        if aps is not self._access_points:
+            per_channel = {}
+            tot_stas = 0
+            for ap in aps:
+                num_stas = len(ap['clients'])
+                tot_stas += num_stas
+                on_channel = per_channel.get(ap['channel'], (0, 0))
+                per_channel[ap['channel']] = (on_channel[0] + 1, on_channel[1] + num_stas)
+            self._counts = (len(aps), tot_stas, per_channel)
+
         self._access_points = aps
         plugins.on('wifi_update', self, aps)
         self._epoch.observe(aps, list(self._peers.values()))
         return self._access_points
 
+    def _unfiltered_access_points(self):
+        """
+        Returns the access points seen by bettercap, parsed once per session or radio model version.
+        """
+        if self._radio is None:
+            snap = self.session_snapshot()
+            version, aps = snap.generation, snap.data['wifi']['aps']
+        else:
+            if self._radio.needs_reconcile():
+                self._radio.begin_reconcile()
+                try:
+                    # a cached session could predate the events we start buffering now
+                    self._radio.reconcile(self.session_snapshot(max_age=0))
+                finally:
+                    self._radio.end_reconcile()
+            version, aps = ('radio', self._radio.version), self._radio.access_points()
+
+        if len(self._radios) > 1:
+            versions = self._radios_versions(version)
+            if versions != self._unfiltered[0]:
+                self._unfiltered = (versions, self._merge_radios_access_points(aps))
+            aps = self._unfiltered[1]
+        return aps
+
+    def _radios_versions(self, version):
+        versions = [version]
+        for radio in self._radios[1:]:
+            if radio.ready:
+                try:
+                    versions.append((radio.name, radio.client.session_snapshot().generation))
+                except Exception as e:
+                    logging.debug(f"can't get the session of {radio.name} ({e})")
+        return tuple(versions)
+
+    def _merge_radios_access_points(self, aps):
+        """
+        Adds the access points only the extra radios see, on channels the main interface doesn't
+        support or out of its range, so that they get planned and dispatched too.
+        """
+        seen = {ap['mac'].lower() for ap in aps}
+        merged = None
+        for radio in self._radios[1:]:
+            if not radio.ready:
+                continue
+            try:
+                snap = radio.client.session_snapshot()
+            except Exception as e:
+                logging.debug(f"can't get the session of {radio.name} ({e})")
+                continue
+            for ap in snap.data['wifi']['aps']:
+                mac = ap['mac'].lower()
+                if mac not in seen:
+                    seen.add(mac)
+                    if merged is None:
+                        merged = list(aps)
+                    merged.append(ap)
+        return aps if merged is None else merged
+
+    @timing.timed('get_access_points')
     def get_access_points(self):
-        whitelist = self._config['main']['whitelist']
         aps = []
         try:
-            s = self.session()
-            plugins.on("unfiltered_ap_list", self, s['wifi']['aps'])
-            for ap in s['wifi']['aps']:
+            whitelist = self._compiled_whitelist()
+            unfiltered = self._unfiltered_access_points()
+            plugins.on("unfiltered_ap_list", self, unfiltered)
+            for ap in unfiltered:
                 if ap['encryption'] == '' or ap['encryption'] == 'OPEN':
                     continue
-                if ap['hostname'] not in whitelist \
-                        and ap['mac'].lower() not in whitelist \
-                        and ap['mac'][:8].lower() not in whitelist:
-                    if self._filter_included(ap):
-                        aps.append(ap)
+                if whitelist.included(ap):
+                    aps.append(ap)
         except Exception as e:
             logging.exception(f"Error while getting acces points ({e})")
 
@@ -237,18 +388,18 @@ class Agent(Client, Automata, AsyncAdvertiser, AsyncTrainer):
     def _update_uptime(self):
         secs = pwnagotchi.uptime()
         self._view.set('uptime', utils.secs_to_hhmmss(secs))
+        UPTIME.set(secs)
         # self._view.set('epoch', '%04d' % self._epoch.epoch)
 
     def _update_counters(self):
-        self._tot_aps = len(self._access_points)
-        tot_stas = sum(len(ap['clients']) for ap in self._access_points)
+        self._tot_aps, tot_stas, per_channel = self._counts
+        ACCESS_POINTS.set(self._tot_aps)
+        STATIONS.set(tot_stas)
         if self._current_channel == 0:
             self._view.set('aps', '%d' % self._tot_aps)
             self._view.set('sta', '%d' % tot_stas)
         else:
-            self._aps_on_channel = len([ap for ap in self._access_points if ap['channel'] == self._current_channel])
-            stas_on_channel = sum(
-                [len(ap['clients']) for ap in self._access_points if ap['channel'] == self._current_channel])
+            self._aps_on_channel, stas_on_channel = per_channel.get(self._current_channel, (0, 0))
             self._view.set('aps', '%d (%d)' % (self._aps_on_channel, self._tot_aps))
             self._view.set('sta', '%d (%d)' % (stas_on_channel, tot_stas))
 
@@ -258,6 +409,8 @@ class Agent(Client, Automata, AsyncAdvertiser, AsyncTrainer):
 
         tot = utils.total_unique_handshakes(self._config['bettercap']['handshakes'])
         txt = '%d (%d)' % (len(self._handshakes), tot)
+        HANDSHAKES.set(len(self._handshakes))
+        UNIQUE_HANDSHAKES.set(tot)
 
         if self._last_pwnd is not None:
             txt += ' [%s]' % self._last_pwnd[:20]
@@ -269,98 +422,167 @@ class Agent(Client, Automata, AsyncAdvertiser, AsyncTrainer):
 
     def _update_peers(self):
         self._view.set_closest_peer(self._closest_peer, len(self._peers))
+        PEERS.set(len(self._peers))
+
+    @timing.timed('next_epoch')
+    def next_epoch(self):
+        Automata.next_epoch(self)
+        self._journal_change('epoch', self._epoch.epoch)
+        self._journal.sync()
 
     def _reboot(self):
         self.set_rebooting()
         self._save_recovery_data()
         pwnagotchi.reboot()
 
+    def _recovery_state(self):
+        return {
+            'started_at': self._started_at,
+            'epoch': self._epoch.epoch,
+            'history': {str(mac): [count, seen] for mac, count, seen in self._history.entries()},
+            'handshakes': dict(self._handshakes),
+            'last_pwnd': self._last_pwnd
+        }
+
     def _save_recovery_data(self):
         logging.warning(f"Writing recovery data to {RECOVERY_DATA_FILE}...")
-        with open(RECOVERY_DATA_FILE, 'w') as fp:
-            data = {
-                'started_at': self._started_at,
-                'epoch': self._epoch.epoch,
-                'history': self._history,
-                'handshakes': self._handshakes,
-                'last_pwnd': self._last_pwnd
-            }
-            json.dump(data, fp)
-
-    def _load_recovery_data(self, delete=True, no_exceptions=True):
+        self._journal.compact(self._recovery_state)
+
+    def _journal_change(self, kind, *values):
+        try:
+            if self._journal.append(kind, *values):
+                self._journal.compact(self._recovery_state)
+        except Exception as e:
+            logging.error(f"Error while writing recovery data ({e})")
+
+    def _replay_change(self, record):
+        kind, values = record[1], record[2:]
+        if kind == 'interaction':
+            # older records have no timestamp
+            self._history.set(values[0], values[1], values[2] if len(values) > 2 else None)
+        elif kind == 'handshake':
+            self._handshakes[values[0]] = values[1]
+        elif kind == 'last_pwnd':
+            self._last_pwnd = values[0]
+        elif kind == 'epoch':
+            self._epoch.epoch = values[0]
+
+    def _load_recovery_data(self, compact=True, no_exceptions=True):
         try:
-            with open(RECOVERY_DATA_FILE, 'rt') as fp:
-                data = json.load(fp)
-                logging.info(f"Found recovery data: {data}")
-                self._started_at = data['started_at']
-                self._epoch.epoch = data['epoch']
-                self._handshakes = data['handshakes']
-                self._history = data['history']
-                self._last_pwnd = data['last_pwnd']
-
-                if delete:
-                    logging.info(f"Deleting {RECOVERY_DATA_FILE}")
-                    os.unlink(RECOVERY_DATA_FILE)
+            last_write = self._journal.last_write()
+            if last_write is not None and time.time() - last_write > self._config['main']['recovery']['max_age']:
+                logging.info(f"Recovery data in {RECOVERY_DATA_FILE} is too old, starting a new session")
+                self._journal.clear()
+            elif last_write is not None:
+                data, records = self._journal.load()
+                if data is not None:
+                    logging.info(f"Found recovery data: epoch {data['epoch']}, {len(data['handshakes'])} handshakes")
+                    self._started_at = data['started_at']
+                    self._epoch.epoch = data['epoch']
+                    self._handshakes = data['handshakes']
+                    self._history.clear()
+                    for key, entry in data['history'].items():
+                        # older recovery files are keyed by MAC address and have no timestamps
+                        count, seen = entry if isinstance(entry, list) else (entry, None)
+                        self._history.set(int(key) if key.isdigit() else utils.mac_to_int(key), count, seen)
+                    self._last_pwnd = data['last_pwnd']
+
+                for record in records:
+                    self._replay_change(record)
+                logging.info(f"Replayed {len(records)} changes from {self._journal.log_path}")
+
+                for key in self._handshakes:
+                    sta_mac, ap_mac = key.split(' -> ')
+                    self._index_handshake(sta_mac, ap_mac)
+
+            if compact:
+                # fold what we recovered in a new snapshot, this also marks the start of the session
+                self._journal.compact(self._recovery_state)
         except:
             if not no_exceptions:
                 raise
 
-
     def start_session_fetcher(self):
-        _thread.start_new_thread(self._fetch_stats, ())
+        if self._runtime is not None:
+            self._runtime.every(1, self._update_stats, blocking=True)
+        else:
+            _thread.start_new_thread(self._fetch_stats, ())
 
+    def _update_stats(self):
+        self._update_uptime()
+        self._update_advertisement()
+        self._update_peers()
+        self._update_counters()
+        self._update_handshakes(0)
 
     def _fetch_stats(self):
         while True:
-            s = self.session()
-            self._update_uptime()
-            self._update_advertisement()
-            self._update_peers()
-            self._update_counters()
-            self._update_handshakes(0)
+            self._update_stats()
             time.sleep(1)
 
-    async def _on_event(self, msg):
+    def _find_ap_sta(self, station_mac, ap_mac):
+        if self._radio is not None:
+            return self._radio.find(station_mac, ap_mac)
+        return self._find_ap_sta_in(station_mac, ap_mac, self.session())
+
+    def _on_radio_event(self, jmsg):
+        self._radio.on_event(jmsg['tag'], jmsg['data'])
+
+    def _on_handshake(self, jmsg, radio=None):
         found_handshake = False
-        jmsg = json.loads(msg)
-
-        if jmsg['tag'] == 'wifi.client.handshake':
-            filename = jmsg['data']['file']
-            sta_mac = jmsg['data']['station']
-            ap_mac = jmsg['data']['ap']
-            key = "%s -> %s" % (sta_mac, ap_mac)
-            if key not in self._handshakes:
+        filename = jmsg['data']['file']
+        sta_mac = jmsg['data']['station']
+        ap_mac = jmsg['data']['ap']
+        key = "%s -> %s" % (sta_mac, ap_mac)
+        # the extra radios report handshakes from their own threads
+        with self._journal.lock:
+            new = key not in self._handshakes
+            if new:
                 self._handshakes[key] = jmsg
-                s = self.session()
-                ap_and_station = self._find_ap_sta_in(sta_mac, ap_mac, s)
-                if ap_and_station is None:
-                    logging.warning(f"!!! Captured new handshake: {key} !!!")
-                    self._last_pwnd = ap_mac
-                    plugins.on('handshake', self, filename, ap_mac, sta_mac)
-                else:
-                    (ap, sta) = ap_and_station
-                    self._last_pwnd = ap['hostname'] if ap['hostname'] != '' and ap['hostname'] != '<hidden>' else ap_mac
-                    logging.warning(
-                        f"!!! Captured new handshake on channel {ap['channel']}, {ap['rssi']} dBm: {sta['mac']} ({sta['vendor']}) -> {ap['hostname']} [{ap['mac']} ({ap['vendor']})] !!!")
-                    plugins.on('handshake', self, filename, ap, sta)
-                found_handshake = True
-            self._update_handshakes(1 if found_handshake else 0)
+                self._journal_change('handshake', key, jmsg)
+        if new:
+            self._index_handshake(sta_mac, ap_mac)
+            ap_and_station = self._find_ap_sta(sta_mac, ap_mac)
+            self._channel_planner.on_handshake(ap_and_station[0]['channel'] if ap_and_station else None, sta_mac)
+            if ap_and_station is None:
+                logging.warning(f"!!! Captured new handshake: {key} !!!")
+                self._last_pwnd = ap_mac
+                plugins.on('handshake', self, filename, ap_mac, sta_mac)
+            else:
+                (ap, sta) = ap_and_station
+                self._last_pwnd = ap['hostname'] if ap['hostname'] != '' and ap['hostname'] != '<hidden>' else ap_mac
+                logging.warning(
+                    f"!!! Captured new handshake on channel {ap['channel']}, {ap['rssi']} dBm: {sta['mac']} ({sta['vendor']}) -> {ap['hostname']} [{ap['mac']} ({ap['vendor']})] !!!")
+                plugins.on('handshake', self, filename, ap, sta)
+            self._journal_change('last_pwnd', self._last_pwnd)
+            (self._radios[0] if radio is None else radio).count('handshakes')
+            found_handshake = True
+        self._update_handshakes(1 if found_handshake else 0)
 
     def _event_poller(self, loop):
-        self._load_recovery_data()
         self.run('events.clear')
 
+        asyncio.set_event_loop(loop)
         while True:
             logging.debug("Polling events...")
             try:
-                loop.create_task(self.start_websocket(self._on_event))
-                loop.run_forever()
+                # start_websocket reconnects on its own, this only returns on unexpected errors
+                loop.run_until_complete(self.start_websocket())
             except Exception as ex:
                 logging.debug(f"Error while polling via websocket ({ex}).")
+                time.sleep(1)
+
+    async def _async_event_poller(self):
+        await self.run_async('events.clear')
+        await self.start_websocket()
 
     def start_event_polling(self):
-        # start a thread and pass in the mainloop
-        _thread.start_new_thread(self._event_poller, (asyncio.get_event_loop(),))
+        if self._runtime is not None:
+            self._runtime.on_stop(self.close_async)
+            self._runtime.spawn(self._async_event_poller())
+        else:
+            # start a thread with its own event loop
+            _thread.start_new_thread(self._event_poller, (asyncio.new_event_loop(),))
 
 
     def is_module_running(self, module):
@@ -376,24 +598,28 @@ class Agent(Client, Automata, AsyncAdvertiser, AsyncTrainer):
     def restart_module(self, module):
         self.run('%s off; %s on' % (module, module))
 
+    def _index_handshake(self, sta_mac, ap_mac):
+        try:
+            self._pwned_stas.add(utils.mac_to_int(sta_mac))
+            self._pwned_aps.add(utils.mac_to_int(ap_mac))
+        except ValueError:
+            logging.debug(f"Can't index handshake {sta_mac} -> {ap_mac}")
+
     def _has_handshake(self, bssid):
-        for key in self._handshakes:
-            if bssid.lower() in key:
-                return True
-        return False
+        mac = utils.mac_to_int(bssid)
+        return mac in self._pwned_aps or mac in self._pwned_stas
 
     def _should_interact(self, who):
         if self._has_handshake(who):
             return False
 
-        if who not in self._history:
-            self._history[who] = 1
-            return True
+        mac = utils.mac_to_int(who)
+        count = self._history.incr(mac)
+        self._journal_change('interaction', mac, count, int(time.time()))
+        return count == 1 or count < self._config['personality']['max_interactions']
 
-        self._history[who] += 1
-        return self._history[who] < self._config['personality']['max_interactions']
-
-    def associate(self, ap, throttle=0):
+    def associate(self, ap, throttle=0, radio=None):
+        radio = self._radios[0] if radio is None else radio
         if self.is_stale():
             logging.debug(f"Recon is stale, skipping assoc({ap['mac']}).")
             return
@@ -403,8 +629,11 @@ class Agent(Client, Automata, AsyncAdvertiser, AsyncTrainer):
 
             try:
                 logging.info(f"Sending association frame to {ap['hostname']} ({ap['mac']} {ap['vendor']}) on channel {ap['channel']} [{len(ap['clients'])} clients], {ap['rssi']} dBm...")
-                self.run(f"wifi.assoc {ap['mac']}")
+                with timing.phase('assoc'):
+                    radio.client.run(f"wifi.assoc {ap['mac']}")
                 self._epoch.track(assoc=True)
+                radio.did_associate = True
+                radio.count('associations')
             except Exception as e:
                 self._on_error(ap['mac'], e)
 
@@ -413,7 +642,8 @@ class Agent(Client, Automata, AsyncAdvertiser, AsyncTrainer):
                 time.sleep(throttle)
             self._view.on_normal()
 
-    def deauth(self, ap, sta, throttle=0):
+    def deauth(self, ap, sta, throttle=0, radio=None):
+        radio = self._radios[0] if radio is None else radio
         if self.is_stale():
             logging.debug(f"Recon is stale, skipping deauth({sta['mac']}).")
             return
@@ -423,8 +653,11 @@ class Agent(Client, Automata, AsyncAdvertiser, AsyncTrainer):
 
             try:
                 logging.info(f"Deauthing {sta['mac']} ({sta['vendor']}) from {ap['hostname']} ({ap['mac']} {ap['vendor']}) on channel {ap['channel']}, {ap['rssi']} dBm...")
-                self.run(f"wifi.deauth {sta['mac']}")
+                with timing.phase('deauth'):
+                    radio.client.run(f"wifi.deauth {sta['mac']}")
                 self._epoch.track(deauth=True)
+                radio.did_deauth = True
+                radio.count('deauths')
             except Exception as e:
                 self._on_error(sta['mac'], e)
 
@@ -433,6 +666,147 @@ class Agent(Client, Automata, AsyncAdvertiser, AsyncTrainer):
                 time.sleep(throttle)
             self._view.on_normal()
 
+    def plan_attacks(self, channels):
+        self._channel_planner.observe(channels)
+        plans = self._scheduler.plan(channels, self._has_handshake, self._history)
+        logging.debug(f"attack plan: {self._scheduler.stats}")
+        return self._channel_planner.order(plans)
+
+    def channel_plan(self):
+        return self._channel_planner.data()
+
+    def attack(self, plan, radio=None):
+        radio = self._radios[0] if radio is None else radio
+        deadline = time.time() + plan.budget if plan.budget > 0 else None
+        for action in plan.actions:
+            started = time.time()
+            if deadline is not None and started >= deadline:
+                logging.debug(f"channel {plan.channel} budget of {plan.budget}s exhausted")
+                break
+
+            if not self._targets.claim(action.ap['mac'], radio.name):
+                logging.debug(f"{action.ap['mac']} is being attacked by another radio, skipping")
+                radio.count('skipped')
+                continue
+            try:
+                if action.kind == scheduler.ASSOC:
+                    self.associate(action.ap, radio=radio)
+                else:
+                    self.deauth(action.ap, action.sta, radio=radio)
+                    self._channel_planner.on_deauth(plan.channel, action.sta['mac'])
+            finally:
+                self._targets.release(action.ap['mac'], radio.name)
+            self._scheduler.attempted(action, time.time() - started)
+
+    def dispatch(self, plans):
+        """
+        Splits the channel plans between the radios that are ready, balancing the number of actions,
+        hands the extra radios their share and returns the one of the primary radio.
+        """
+        radios = [radio for radio in self._radios if radio.ready]
+        if len(radios) == 1:
+            return plans
+
+        assigned = {radio.name: [] for radio in radios}
+        load = dict.fromkeys(assigned, 0)
+        for plan in plans:
+            candidates = [radio for radio in radios if radio.supports(plan.channel)] or radios[:1]
+            radio = min(candidates, key=lambda r: load[r.name])
+            assigned[radio.name].append(plan)
+            load[radio.name] += len(plan.actions)
+
+        for radio in radios[1:]:
+            if assigned[radio.name]:
+                radio.submit(assigned[radio.name])
+        return assigned[radios[0].name]
+
+    def wait_radios(self):
+        for radio in self._radios[1:]:
+            radio.wait()
+
+    def radios(self):
+        return [radio.data() for radio in self._radios]
+
+    def start_radios(self):
+        for radio in self._radios[1:]:
+            _thread.start_new_thread(self._radio_worker, (radio,))
+
+    def _start_radio(self, radio):
+        while True:
+            try:
+                radio.client.session(max_age=0)
+                break
+            except Exception:
+                logging.info(f"waiting for the bettercap instance of {radio.name} on {radio.client.url} ...")
+                time.sleep(5)
+
+        silence = [f'events.ignore {tag}' for tag in self._config['bettercap']['silence']]
+        radio.client.run_batch(silence, verbose_errors=False)
+        self._reset_wifi_settings(radio)
+        try:
+            radio.client.run('wifi.recon on')
+        except Exception as e:
+            logging.debug(f"wifi.recon on {radio.name}: {e}")
+
+        radio.client.events.register('wifi.client.handshake', lambda jmsg: self._on_handshake(jmsg, radio),
+                                     blocking=True)
+        if self._runtime is not None:
+            self._runtime.spawn(radio.client.start_websocket())
+        else:
+            _thread.start_new_thread(self._radio_event_poller, (radio, asyncio.new_event_loop()))
+
+    def _radio_event_poller(self, radio, loop):
+        asyncio.set_event_loop(loop)
+        while True:
+            try:
+                loop.run_until_complete(radio.client.start_websocket())
+            except Exception as ex:
+                logging.debug(f"Error while polling {radio.name} events ({ex}).")
+                time.sleep(1)
+
+    def _radio_worker(self, radio):
+        self._start_radio(radio)
+        logging.info(f"radio {radio.name} ready, supported channels: {sorted(radio.supported_channels)}")
+        radio.ready = True
+        while True:
+            plans = radio.next_plans()
+            try:
+                for plan in plans:
+                    self._radio_set_channel(radio, plan.channel)
+                    self.attack(plan, radio)
+            except Exception as e:
+                logging.exception(f"radio {radio.name} error ({e})")
+            finally:
+                radio.done()
+
+    def _radio_set_channel(self, radio, channel):
+        if channel == radio.channel:
+            return
+        if radio.channel:
+            wait = self._channel_planner.dwell(radio.channel, radio.did_deauth, radio.did_associate)
+            if wait > 0:
+                logging.debug(f"[{radio.name}] waiting for {wait}s on channel {radio.channel}...")
+                time.sleep(wait)
+        try:
+            radio.client.run(f'wifi.recon.channel {channel}')
+            radio.hopped(channel)
+            self._update_radios_view()
+        except Exception as e:
+            logging.error(f"Error while setting channel of {radio.name} ({e})")
+
+    def _recon_radios(self, channels):
+        for radio in self._radios[1:]:
+            if radio.ready:
+                try:
+                    radio.client.run('wifi.recon.channel %s' % (','.join(map(str, channels)) if channels else 'clear'))
+                    radio.channel = 0
+                except Exception as e:
+                    logging.error(f"Error while starting recon on {radio.name} ({e})")
+
+    def _update_radios_view(self):
+        if len(self._radios) > 1:
+            self._view.set('channel', '/'.join(str(radio.channel) if radio.channel else '*' for radio in self._radios))
+
     def set_channel(self, channel, verbose=True):
         if self.is_stale():
             logging.debug(f"Recon is stale, skipping set_channel({channel}).")
@@ -441,12 +815,9 @@ class Agent(Client, Automata, AsyncAdvertiser, AsyncTrainer):
         # if in the previous loop no client stations has been deauthenticated
         # and only association frames have been sent, we don't need to wait
         # very long before switching channel as we don't have to wait for
-        # such client stations to reconnect in order to sniff the handshake.
-        wait = 0
-        if self._epoch.did_deauth:
-            wait = self._config['personality']['hop_recon_time']
-        elif self._epoch.did_associate:
-            wait = self._config['personality']['min_recon_time']
+        # such client stations to reconnect in order to sniff the handshake,
+        # otherwise we wait as long as they usually take on that channel.
+        wait = self._channel_planner.dwell(self._current_channel, self._epoch.did_deauth, self._epoch.did_associate)
 
         if channel != self._current_channel:
             if self._current_channel != 0 and wait > 0:
@@ -454,14 +825,18 @@ class Agent(Client, Automata, AsyncAdvertiser, AsyncTrainer):
                     logging.info(f"Waiting for {wait}s on channel {self._current_channel}...")
                 else:
                     logging.debug(f"Waiting for {wait}s on channel {self._current_channel}...")
-                self.wait_for(wait)
+                with timing.phase('hop_wait'):
+                    self.wait_for(wait)
             if verbose and self._epoch.any_activity:
                 logging.info(f"CHANNEL {channel}")
             try:
                 self.run(f'wifi.recon.channel {channel}')
                 self._current_channel = channel
+                self._channel_planner.enter(channel)
                 self._epoch.track(hop=True)
+                self._radios[0].hopped(channel)
                 self._view.set('channel', f'{channel}')
+                self._update_radios_view()
 
                 plugins.on('channel_hop', self, channel)
 
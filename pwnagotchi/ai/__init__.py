@@ -6,7 +6,69 @@ import logging
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'  # or any {'0', '1', '2'}
 
 
-def load(config, agent, epoch, from_disk=True):
+def environment(agent, epoch):
+    """
+    The gym environment, this doesn't need TensorFlow.
+    """
+    try:
+        start = time.time()
+        import pwnagotchi.ai.gym as wrappers
+        logging.debug("[ai] gym wrapper imported in %.2fs" % (time.time() - start))
+        return wrappers.Environment(agent, epoch)
+    except Exception as e:
+        logging.exception("error while creating the AI environment (%s)", e)
+    return False
+
+
+def load_policy(config, env):
+    """
+    The NumPy policy exported next to the brain, None if it's missing, stale or doesn't fit env.
+    """
+    from pwnagotchi.ai.inference import Policy, npz_path
+
+    nn_path = config['ai']['path']
+    path = npz_path(nn_path)
+    if not os.path.exists(path):
+        return None
+    if os.path.exists(nn_path) and os.path.getmtime(nn_path) > os.path.getmtime(path):
+        logging.info("[ai] %s is older than %s, ignoring it" % (path, nn_path))
+        return None
+
+    try:
+        start = time.time()
+        policy = Policy.load(path)
+        logging.debug("[ai] %s loaded in %.2fs" % (path, time.time() - start))
+    except Exception as e:
+        logging.exception("[ai] error while loading %s (%s)", path, e)
+        return None
+
+    if policy.action_sizes != [int(n) for n in env.action_space.nvec] or \
+            policy.n_input != env.observation_space.shape[-1]:
+        logging.warning("[ai] %s doesn't match the observation and action spaces of this unit, ignoring it" % path)
+        return None
+    return policy
+
+
+def dependencies():
+    """
+    Imports stable-baselines, and TensorFlow with it, the slowest part of loading the model.
+    """
+    start = time.time()
+    from stable_baselines import A2C
+    logging.debug("[ai] A2C imported in %.2fs" % (time.time() - start))
+
+    start = time.time()
+    from stable_baselines.common.policies import MlpLstmPolicy
+    logging.debug("[ai] MlpLstmPolicy imported in %.2fs" % (time.time() - start))
+
+    start = time.time()
+    from stable_baselines.common.vec_env import DummyVecEnv
+    logging.debug("[ai] DummyVecEnv imported in %.2fs" % (time.time() - start))
+
+    return A2C, MlpLstmPolicy, DummyVecEnv
+
+
+def load(config, agent, epoch, from_disk=True, env=None):
     config = config['ai']
     if not config['enabled']:
         logging.info("ai disabled")
@@ -16,38 +78,29 @@ def load(config, agent, epoch, from_disk=True):
         begin = time.time()
 
         logging.info("[ai] bootstrapping dependencies...")
+        A2C, MlpLstmPolicy, DummyVecEnv = dependencies()
 
-        start = time.time()
-        from stable_baselines import A2C
-        logging.debug("[ai] A2C imported in %.2fs" % (time.time() - start))
-
-        start = time.time()
-        from stable_baselines.common.policies import MlpLstmPolicy
-        logging.debug("[ai] MlpLstmPolicy imported in %.2fs" % (time.time() - start))
-
-        start = time.time()
-        from stable_baselines.common.vec_env import DummyVecEnv
-        logging.debug("[ai] DummyVecEnv imported in %.2fs" % (time.time() - start))
-
-        start = time.time()
-        import pwnagotchi.ai.gym as wrappers
-        logging.debug("[ai] gym wrapper imported in %.2fs" % (time.time() - start))
+        if env is None:
+            start = time.time()
+            import pwnagotchi.ai.gym as wrappers
+            logging.debug("[ai] gym wrapper imported in %.2fs" % (time.time() - start))
+            env = wrappers.Environment(agent, epoch)
 
-        env = wrappers.Environment(agent, epoch)
         env = DummyVecEnv([lambda: env])
 
-        logging.info("[ai] creating model...")
-
-        start = time.time()
-        a2c = A2C(MlpLstmPolicy, env, **config['params'])
-        logging.debug("[ai] A2C created in %.2fs" % (time.time() - start))
-
         if from_disk and os.path.exists(config['path']):
             logging.info("[ai] loading %s..." % config['path'])
             start = time.time()
-            a2c.load(config['path'], env)
+            # load is a class method returning the model
+            a2c = A2C.load(config['path'], env)
             logging.debug("[ai] A2C loaded in %.2fs" % (time.time() - start))
         else:
+            logging.info("[ai] creating model...")
+
+            start = time.time()
+            a2c = A2C(MlpLstmPolicy, env, **config['params'])
+            logging.debug("[ai] A2C created in %.2fs" % (time.time() - start))
+
             logging.info("[ai] model created:")
             for key, value in config['params'].items():
                 logging.info("      %s: %s" % (key, value))
@@ -0,0 +1,125 @@
+"""
+A policy engine for the units that can't run TensorFlow: every personality parameter is an
+independent multi-armed bandit over a few of its values, and each epoch Thompson sampling picks
+one value per parameter, scored by the same reward as the A2C engine.
+"""
+import logging
+import os
+import time
+
+import numpy as np
+
+import pwnagotchi.ai.reward as reward
+
+
+def state_path(nn_path):
+    return "%s.bandit.npz" % os.path.splitext(nn_path)[0]
+
+
+class Bandit(object):
+    """
+    Gaussian Thompson sampling per parameter. Old rewards are discounted by decay at every update
+    so that the choices follow the unit as it moves around.
+    """
+
+    def __init__(self, params, arms=8, decay=0.99):
+        self.params = params
+        self.decay = decay
+        # the policy values (as in the action space of the A2C engine) each parameter can choose
+        self._values = [np.unique(np.linspace(0, p.space_size() - 1, min(arms, p.space_size())).round().astype(int))
+                        for p in params]
+        width = max(len(v) for v in self._values)
+        self._invalid = np.ones((len(params), width), dtype=bool)
+        for i, values in enumerate(self._values):
+            self._invalid[i, :len(values)] = False
+        self._rows = np.arange(len(params))
+        # untried arms are sampled around 0 with the spread of the whole reward range
+        self._prior = (reward.range[1] - reward.range[0]) / 2.0
+
+        self.pulls = np.zeros((len(params), width), dtype=np.float32)
+        self.rewards = np.zeros((len(params), width), dtype=np.float32)
+        self.updates = 0
+        self._chosen = None
+
+    def choose(self):
+        """
+        Returns the policy for the next epoch, one value per parameter.
+        """
+        mean = self.rewards / np.maximum(self.pulls, 1.0)
+        sample = np.random.normal(mean, self._prior / np.sqrt(self.pulls + 1.0))
+        sample[self._invalid] = -np.inf
+        self._chosen = sample.argmax(axis=1)
+        return [int(values[i]) for values, i in zip(self._values, self._chosen)]
+
+    def update(self, r):
+        """
+        Credits the reward of the last epoch to the values that were chosen for it.
+        """
+        if self._chosen is None:
+            return
+        self.pulls *= self.decay
+        self.rewards *= self.decay
+        self.pulls[self._rows, self._chosen] += 1.0
+        self.rewards[self._rows, self._chosen] += r
+        self.updates += 1
+
+    def best(self):
+        """
+        The values with the best average reward so far.
+        """
+        mean = np.where(self.pulls > 0, self.rewards / np.maximum(self.pulls, 1.0), -np.inf)
+        mean[self._invalid] = -np.inf
+        return [int(values[i]) for values, i in zip(self._values, mean.argmax(axis=1))]
+
+    def save(self, path):
+        temp = "%s.tmp.npz" % os.path.splitext(path)[0]
+        np.savez(temp, names=np.array([p.name for p in self.params]), pulls=self.pulls, rewards=self.rewards,
+                 updates=np.array(self.updates))
+        os.replace(temp, path)
+
+    def load(self, path):
+        """
+        Restores the state saved by save(), returns False if it's missing or for other parameters.
+        """
+        if not os.path.exists(path):
+            return False
+
+        with np.load(path) as data:
+            if list(data['names']) != [p.name for p in self.params] or data['pulls'].shape != self.pulls.shape:
+                logging.warning("[ai] %s was saved for other parameters, starting from scratch" % path)
+                return False
+            self.pulls[:] = data['pulls']
+            self.rewards[:] = data['rewards']
+            self.updates = int(data['updates'])
+        return True
+
+
+class Engine(object):
+    """
+    Saves the bandit every save_every seconds and before shutting down.
+    """
+
+    def __init__(self, params, path, arms=8, decay=0.99, save_every=600):
+        self.path = path
+        self.bandit = Bandit(params, arms, decay)
+        self._save_every = save_every
+        self._saved_at = time.time()
+
+        try:
+            if self.bandit.load(path):
+                logging.info("[ai] bandit loaded from %s (%d updates)" % (path, self.bandit.updates))
+        except Exception as e:
+            logging.exception("[ai] error while loading %s (%s)", path, e)
+
+    def choose(self):
+        return self.bandit.choose()
+
+    def update(self, r):
+        self.bandit.update(r)
+        if time.time() - self._saved_at >= self._save_every:
+            self.flush()
+
+    def flush(self, timeout=None):
+        self.bandit.save(self.path)
+        self._saved_at = time.time()
+        return True
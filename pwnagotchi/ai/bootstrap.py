@@ -0,0 +1,68 @@
+import logging
+import threading
+import time
+
+
+class Bootstrap(object):
+    """
+    Runs the AI startup as a sequence of named stages and keeps how long each one took. A stage
+    that's already done is skipped, so after a failure the next run resumes from the stage
+    that failed.
+    """
+
+    def __init__(self, on_stage=None):
+        self._lock = threading.Lock()
+        self._on_stage = on_stage
+        # name -> {'state': 'running' | 'done' | 'failed', 'seconds': float}
+        self._stages = {}
+        self._order = []
+        self._results = {}
+        self.started_at = None
+        self.ready_at = None
+
+    def run(self, name, fn, *args):
+        """
+        Runs fn(*args) as the stage name unless it's done already, returns its result.
+        """
+        with self._lock:
+            if name not in self._stages:
+                self._order.append(name)
+            elif self._stages[name]['state'] == 'done':
+                return self._results[name]
+            if self.started_at is None:
+                self.started_at = time.time()
+            self._stages[name] = {'state': 'running', 'seconds': 0.0}
+
+        if self._on_stage is not None:
+            self._on_stage(name)
+
+        start = time.time()
+        try:
+            result = fn(*args)
+        except Exception:
+            self._finish(name, 'failed', start)
+            raise
+
+        # the AI loaders return False or None when they fail
+        self._finish(name, 'failed' if result is False else 'done', start)
+        with self._lock:
+            self._results[name] = result
+        return result
+
+    def _finish(self, name, state, start):
+        seconds = time.time() - start
+        with self._lock:
+            self._stages[name] = {'state': state, 'seconds': seconds}
+        logging.info("[ai] bootstrap stage %s %s in %.2fs" % (name, state, seconds))
+
+    def ready(self):
+        self.ready_at = time.time()
+
+    def status(self):
+        with self._lock:
+            return {
+                'stages': [dict(name=name, **self._stages[name]) for name in self._order],
+                'started_at': self.started_at,
+                'ready_at': self.ready_at,
+                'seconds': (self.ready_at - self.started_at) if self.ready_at and self.started_at else None
+            }
@@ -0,0 +1,179 @@
+import logging
+import os
+import threading
+import time
+
+import pwnagotchi.metrics as metrics
+from pwnagotchi.ai.inference import export_weights, npz_path
+
+CHECKPOINT_TIME = metrics.histogram('pwnagotchi_ai_checkpoint_seconds', 'Time to write a checkpoint of the AI.',
+                                    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0))
+CHECKPOINT_SIZE = metrics.gauge('pwnagotchi_ai_checkpoint_bytes', 'Size of the last checkpoint of the AI.')
+CHECKPOINTS = metrics.counter('pwnagotchi_ai_checkpoints', 'Checkpoints of the AI, by result.', ['result'])
+
+# what has to be saved before shutting down or rebooting: objects with a flush(timeout) method
+_active = []
+
+
+def register(obj):
+    _active.append(obj)
+
+
+class Snapshot(object):
+    """
+    model.save() split in two: what it would write (the model data and a copy of the weights) is
+    captured on the training thread, then write() serializes it from any other thread.
+    """
+
+    def __init__(self, model):
+        self.taken_at = time.time()
+        self._class = type(model)
+        self._names = [v.name for v in model.params]
+        self._action_sizes = model.action_space.nvec
+        self._saved = {}
+
+        # the weights are fetched from the session by save(), the file is written by _save_to_file
+        model._save_to_file = self._capture
+        try:
+            model.save('snapshot')
+        finally:
+            del model._save_to_file
+
+    def _capture(self, save_path, data=None, params=None, **kwargs):
+        self._saved = {'data': data, 'params': params, 'kwargs': kwargs}
+
+    def weights(self):
+        params = self._saved['params']
+        # a list of arrays on older stable-baselines, a {name: array} dict on newer ones
+        return dict(params) if isinstance(params, dict) else dict(zip(self._names, params))
+
+    def write(self, path):
+        """
+        Writes the brain and its exported policy, returns the policy and the bytes written.
+        """
+        temp = "%s.tmp" % path
+        self._class._save_to_file(temp, data=self._saved['data'], params=self._saved['params'],
+                                  **self._saved['kwargs'])
+        os.replace(temp, path)
+        policy = export_weights(self.weights(), self._action_sizes, npz_path(path))
+        return policy, os.path.getsize(path) + os.path.getsize(npz_path(path))
+
+
+class Checkpointer(object):
+    """
+    Decides when the model is saved (every_steps training steps, every_secs seconds and whenever
+    asked to) and writes the checkpoints from a background thread, so that the training steps only
+    pay for copying the weights. A snapshot taken while the previous one is still waiting to be
+    written replaces it.
+    """
+
+    def __init__(self, model, path, every_steps=10, every_secs=600, on_saved=None):
+        self.model = model
+        self.path = path
+        self.every_steps = every_steps
+        self.every_secs = every_secs
+        self._on_saved = on_saved
+        self._snapshot_lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._pending = None
+        self._writing = False
+        self._thread = None
+        self._steps = 0
+        self._last = time.time()
+
+        self.saved = 0
+        self.coalesced = 0
+        self.last_seconds = 0.0
+        self.last_bytes = 0
+
+        register(self)
+
+    def step(self):
+        """
+        Called after every training step, checkpoints if it's time.
+        """
+        self._steps += 1
+        if self._steps >= self.every_steps or time.time() - self._last >= self.every_secs:
+            self.save()
+
+    def dirty(self):
+        return self._steps > 0
+
+    def save(self):
+        """
+        Takes a snapshot of the model and queues it for writing.
+        """
+        with self._snapshot_lock:
+            snapshot = Snapshot(self.model)
+            self._steps = 0
+            self._last = time.time()
+
+        with self._cond:
+            if self._pending is not None:
+                self.coalesced += 1
+                CHECKPOINTS.inc(result='coalesced')
+            self._pending = snapshot
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._writer, name='ai-checkpoint', daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def wait(self, timeout=None):
+        """
+        Waits for the queued checkpoint to be written, returns False on timeout.
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: self._pending is None and not self._writing, timeout)
+
+    def flush(self, timeout=None):
+        """
+        Saves whatever wasn't checkpointed yet and waits for it to be on disk.
+        """
+        if self.dirty():
+            self.save()
+        return self.wait(timeout)
+
+    def _writer(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending is not None)
+                snapshot, self._pending = self._pending, None
+                self._writing = True
+
+            try:
+                start = time.time()
+                policy, size = snapshot.write(self.path)
+                self.last_seconds = time.time() - start
+                self.last_bytes = size
+                self.saved += 1
+                CHECKPOINTS.inc(result='saved')
+                CHECKPOINT_TIME.observe(self.last_seconds)
+                CHECKPOINT_SIZE.set(size)
+                logging.info("[ai] checkpoint #%d saved to %s in %.2fs (%d bytes, %.2fs after the snapshot)" % (
+                    self.saved, self.path, self.last_seconds, size, time.time() - snapshot.taken_at))
+                if self._on_saved is not None:
+                    self._on_saved(policy)
+            except Exception as e:
+                CHECKPOINTS.inc(result='failed')
+                logging.exception("[ai] error while saving the checkpoint to %s (%s)", self.path, e)
+            finally:
+                with self._cond:
+                    self._writing = False
+                    self._cond.notify_all()
+
+    def stats(self):
+        return {
+            'saved': self.saved,
+            'coalesced': self.coalesced,
+            'last_seconds': self.last_seconds,
+            'last_bytes': self.last_bytes
+        }
+
+
+def flush_all(timeout=60):
+    for obj in _active:
+        try:
+            if not obj.flush(timeout):
+                logging.warning("[ai] timed out while saving %s" % obj.path)
+        except Exception as e:
+            logging.exception("[ai] error while saving %s (%s)", obj.path, e)
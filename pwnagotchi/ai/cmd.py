@@ -0,0 +1,65 @@
+# Handles the commandline stuff
+
+import logging
+import os
+
+
+def add_parsers(subparsers):
+    """
+    Adds the ai subcommand to the subparsers of the main argparse.ArgumentParser
+    """
+    ## pwnagotchi ai
+    parser_ai = subparsers.add_parser('ai')
+    ai_subparsers = parser_ai.add_subparsers(dest='aicmd')
+
+    ## pwnagotchi ai train
+    parser_ai_train = ai_subparsers.add_parser('train', help='Trains the brain offline on experience journals')
+    parser_ai_train.add_argument('--journal', action='append', required=True, metavar='DIR',
+                                 help='Folder with the journals of one or more units (can be repeated)')
+    parser_ai_train.add_argument('--brain', type=str, default=None,
+                                 help='Model to fine-tune, ai.path by default (a new one is trained if missing)')
+    parser_ai_train.add_argument('--output', type=str, default=None,
+                                 help='Where to save the trained model, over the brain by default')
+    parser_ai_train.add_argument('--timesteps', type=int, default=100000, help='Training steps')
+    parser_ai_train.add_argument('--envs', type=int, default=os.cpu_count() or 1,
+                                 help='Replay environments running in parallel')
+    parser_ai_train.add_argument('--ridge', type=float, default=1.0,
+                                 help='L2 regularization of the reward model')
+
+    return subparsers
+
+
+def used_ai_cmd(args):
+    """
+    Checks if the ai subcommand was used
+    """
+    return hasattr(args, 'aicmd')
+
+
+def handle_cmd(args, config):
+    """
+    Parses the arguments and does the thing the user wants
+    """
+    if args.aicmd == 'train':
+        return train(args, config)
+
+    logging.error("missing or unknown ai subcommand, see pwnagotchi ai --help")
+    return 1
+
+
+def train(args, config):
+    """
+    Trains or fine-tunes the brain on the journals
+    """
+    from pwnagotchi.ai.replay import train as train_on_journals
+
+    brain = args.brain or config['ai']['path']
+    output = args.output or brain
+    try:
+        ok = train_on_journals(args.journal, brain, output, args.timesteps, args.envs,
+                               params=config['ai']['params'],
+                               episode_length=config['ai']['epochs_per_episode'], l2=args.ridge)
+    except Exception as e:
+        logging.exception("error while training (%s)", e)
+        return 1
+    return 0 if ok else 1
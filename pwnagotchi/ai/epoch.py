@@ -1,13 +1,37 @@
 import time
 import threading
 import logging
+from operator import attrgetter, itemgetter
 
-import pwnagotchi
+import numpy as np
+
+import pwnagotchi.sysmon as sysmon
 import pwnagotchi.utils as utils
+import pwnagotchi.metrics as metrics
+import pwnagotchi.timing as timing
 import pwnagotchi.mesh.wifi as wifi
 
 from pwnagotchi.ai.reward import RewardFunction
 
+EPOCHS = metrics.counter('pwnagotchi_epochs', 'Epochs completed.')
+EPOCH_EVENTS = metrics.counter('pwnagotchi_epoch_events', 'Events counted by the epochs.', ['event'])
+# Epoch.data() key -> event label
+COUNTED = {
+    'num_deauths': 'deauth',
+    'num_associations': 'association',
+    'num_handshakes': 'handshake',
+    'num_hops': 'hop',
+    'missed_interactions': 'missed',
+    'slept_for_secs': 'slept_secs'
+}
+# rows of the observation histograms
+APS, STATIONS, PEERS = range(3)
+SYSTEM = {
+    'cpu_load': metrics.gauge('pwnagotchi_cpu_load', 'CPU load, from 0 to 1.'),
+    'mem_usage': metrics.gauge('pwnagotchi_memory_usage', 'Memory usage, from 0 to 1.'),
+    'temperature': metrics.gauge('pwnagotchi_temperature_celsius', 'CPU temperature.')
+}
+
 
 class Epoch(object):
     def __init__(self, config):
@@ -55,24 +79,41 @@ class Epoch(object):
         self.epoch_duration = 0
         # https://www.metageek.com/training/resources/why-channels-1-6-11.html
         self.non_overlapping_channels = {1: 0, 6: 0, 11: 0}
-        # observation vectors
+        # interactions history of the agent, its counters end up in the epoch log
+        self.history = None
+        # monitor interfaces of the agent, their counters end up in the epoch data
+        self.radios = []
+        # observation vectors, written in place by observe() many times per epoch
+        self._histogram = np.zeros((3, wifi.NumChannels), dtype=np.float32)
         self._observation = {
-            'aps_histogram': [0.0] * wifi.NumChannels,
-            'sta_histogram': [0.0] * wifi.NumChannels,
-            'peers_histogram': [0.0] * wifi.NumChannels
+            'aps_histogram': self._histogram[APS],
+            'sta_histogram': self._histogram[STATIONS],
+            'peers_histogram': self._histogram[PEERS]
         }
+        # copy of the observation taken at the end of each epoch, handed to the AI thread
+        self._epoch_observation = {key: value.copy() for key, value in self._observation.items()}
         self._observation_ready = threading.Event()
         self._epoch_data = {}
         self._epoch_data_ready = threading.Event()
         self._reward = RewardFunction()
 
+    def _update_metrics(self):
+        EPOCHS.inc()
+        for key, value in self._epoch_data.items():
+            if key in COUNTED:
+                EPOCH_EVENTS.inc(value, event=COUNTED[key])
+            elif key in SYSTEM:
+                SYSTEM[key].set(value)
+            elif isinstance(value, (int, float)):
+                metrics.gauge('pwnagotchi_epoch_%s' % key, 'Last epoch %s.' % key.replace('_', ' ')).set(value)
+
     def wait_for_epoch_data(self, with_observation=True, timeout=None):
         # if with_observation:
         #    self._observation_ready.wait(timeout)
         #    self._observation_ready.clear()
         self._epoch_data_ready.wait(timeout)
         self._epoch_data_ready.clear()
-        return self._epoch_data if with_observation is False else {**self._observation, **self._epoch_data}
+        return self._epoch_data if with_observation is False else {**self._epoch_observation, **self._epoch_data}
 
     def data(self):
         return self._epoch_data
@@ -92,39 +133,36 @@ class Epoch(object):
         self.tot_bond_factor = sum((peer.encounters for peer in peers)) / bond_unit_scale
         self.avg_bond_factor = self.tot_bond_factor / num_peers
 
-        num_aps = len(aps) + 1e-10
-        num_sta = sum(len(ap['clients']) for ap in aps) + 1e-10
-        aps_per_chan = [0.0] * wifi.NumChannels
-        sta_per_chan = [0.0] * wifi.NumChannels
-        peers_per_chan = [0.0] * wifi.NumChannels
-
-        for ap in aps:
-            ch_idx = ap['channel'] - 1
-            try:
-                aps_per_chan[ch_idx] += 1.0
-                sta_per_chan[ch_idx] += len(ap['clients'])
-            except IndexError:
-                logging.error("got data on channel %d, we can store %d channels" % (ap['channel'], wifi.NumChannels))
-
-        for peer in peers:
-            try:
-                peers_per_chan[peer.last_channel - 1] += 1.0
-            except IndexError:
-                logging.error(
-                    "got peer data on channel %d, we can store %d channels" % (peer.last_channel, wifi.NumChannels))
+        ap_channels = self._channel_indexes(map(itemgetter('channel'), aps), len(aps), "")
+        ap_clients = np.fromiter(map(len, map(itemgetter('clients'), aps)), dtype=np.float32, count=len(aps))
+        peer_channels = self._channel_indexes(map(attrgetter('last_channel'), peers), len(peers), "peer ")
+
+        hist = self._histogram
+        valid = ap_channels >= 0
+        hist[APS] = np.bincount(ap_channels[valid], minlength=wifi.NumChannels)
+        hist[STATIONS] = np.bincount(ap_channels[valid], weights=ap_clients[valid], minlength=wifi.NumChannels)
+        hist[PEERS] = np.bincount(peer_channels[peer_channels >= 0], minlength=wifi.NumChannels)
 
         # normalize
-        aps_per_chan = [e / num_aps for e in aps_per_chan]
-        sta_per_chan = [e / num_sta for e in sta_per_chan]
-        peers_per_chan = [e / num_peers for e in peers_per_chan]
+        hist[APS] /= len(aps) + 1e-10
+        hist[STATIONS] /= ap_clients.sum() + 1e-10
+        hist[PEERS] /= num_peers
 
-        self._observation = {
-            'aps_histogram': aps_per_chan,
-            'sta_histogram': sta_per_chan,
-            'peers_histogram': peers_per_chan
-        }
         self._observation_ready.set()
 
+    @staticmethod
+    def _channel_indexes(channels, count, what):
+        """
+        Histogram indexes of the channels, -1 for the ones we can't store.
+        """
+        indexes = np.fromiter(channels, dtype=np.intp, count=count) - 1
+        out = indexes >= wifi.NumChannels
+        if out.any():
+            for channel in np.unique(indexes[out]) + 1:
+                logging.error("got %sdata on channel %d, we can store %d channels" % (what, channel, wifi.NumChannels))
+            indexes[out] = -1
+        return indexes
+
     def track(self, deauth=False, assoc=False, handshake=False, hop=False, sleep=False, miss=False, inc=1):
         if deauth:
             self.num_deauths += inc
@@ -176,10 +214,21 @@ class Epoch(object):
             self.sad_for = 0
             self.bored_for = 0
 
+        history = ''
+        if self.history is not None:
+            stats = self.history.stats()
+            history = " history=%d/%d hits=%d misses=%d evicted=%d expired=%d" % (
+                stats['size'], stats['capacity'], stats['hits'], stats['misses'], stats['evictions'],
+                stats['expirations'])
+
+        timings = timing.summary() if timing.enabled else None
+        phases = ' ' + timing.format_summary(timings) if timings else ''
+
         now = time.time()
-        cpu = pwnagotchi.cpu_load()
-        mem = pwnagotchi.mem_usage()
-        temp = pwnagotchi.temperature()
+        system = sysmon.latest()
+        cpu = system['cpu_load']
+        mem = system['mem_usage']
+        temp = system['temperature']
 
         self.epoch_duration = now - self.epoch_started
 
@@ -204,13 +253,20 @@ class Epoch(object):
             'mem_usage': mem,
             'temperature': temp
         }
+        if len(self.radios) > 1:
+            self._epoch_data['radios'] = {radio.name: radio.counters(reset=True) for radio in self.radios}
+        if timings is not None:
+            # seconds per phase of the main loop during this epoch
+            self._epoch_data['timing'] = timings
 
         self._epoch_data['reward'] = self._reward(self.epoch + 1, self._epoch_data)
+        self._update_metrics()
+        self._epoch_observation = {key: value.copy() for key, value in self._observation.items()}
         self._epoch_data_ready.set()
 
         logging.info("[epoch %d] duration=%s slept_for=%s blind=%d sad=%d bored=%d inactive=%d active=%d peers=%d tot_bond=%.2f "
                      "avg_bond=%.2f hops=%d missed=%d deauths=%d assocs=%d handshakes=%d cpu=%d%% mem=%d%% "
-                     "temperature=%dC reward=%s" % (
+                     "temperature=%dC reward=%s%s%s" % (
                          self.epoch,
                          utils.secs_to_hhmmss(self.epoch_duration),
                          utils.secs_to_hhmmss(self.num_slept),
@@ -230,7 +286,9 @@ class Epoch(object):
                          cpu * 100,
                          mem * 100,
                          temp,
-                         self._epoch_data['reward']))
+                         self._epoch_data['reward'],
+                         history,
+                         phases))
 
         self.epoch += 1
         self.epoch_started = now
@@ -37,30 +37,47 @@ def describe(extended=False):
                             1)
 
 
-def featurize(state, step):
+def buffer(extended=False):
+    """
+    Observation vector featurize() can write into, to reuse at every epoch.
+    """
+    _, shape = describe(extended)
+    return np.zeros(shape[1], dtype=np.float32)
+
+
+def featurize(state, step, out=None):
+    """
+    Writes the observation vector of state in out (a new buffer if None) and returns it.
+    Histograms shorter than the ones out has room for are zero padded.
+    """
+    if out is None:
+        out = buffer()
+    size = (len(out) - 8) // 3
     tot_epochs = step + 1e-10
     tot_interactions = (state['num_deauths'] + state['num_associations']) + 1e-10
-    return np.concatenate((
-        # aps per channel
-        state['aps_histogram'],
-        # clients per channel
-        state['sta_histogram'],
-        # peers per channel
-        state['peers_histogram'],
-        # duration
-        [np.clip(state['duration_secs'] / MAX_EPOCH_DURATION, 0.0, 1.0)],
-        # inactive
-        [state['inactive_for_epochs'] / tot_epochs],
-        # active
-        [state['active_for_epochs'] / tot_epochs],
-        # missed
-        [state['missed_interactions'] / tot_interactions],
-        # hops
-        [state['num_hops'] / wifi.NumChannels],
-        # deauths
-        [state['num_deauths'] / tot_interactions],
-        # assocs
-        [state['num_associations'] / tot_interactions],
-        # handshakes
-        [state['num_handshakes'] / tot_interactions],
-    ))
+
+    # aps, clients and peers per channel
+    for i, key in enumerate(('aps_histogram', 'sta_histogram', 'peers_histogram')):
+        hist = state[key]
+        n = min(len(hist), size)
+        out[i * size:i * size + n] = hist[:n]
+        out[i * size + n:(i + 1) * size] = 0.0
+
+    tail = 3 * size
+    # duration
+    out[tail] = min(max(state['duration_secs'] / MAX_EPOCH_DURATION, 0.0), 1.0)
+    # inactive
+    out[tail + 1] = state['inactive_for_epochs'] / tot_epochs
+    # active
+    out[tail + 2] = state['active_for_epochs'] / tot_epochs
+    # missed
+    out[tail + 3] = state['missed_interactions'] / tot_interactions
+    # hops
+    out[tail + 4] = state['num_hops'] / wifi.NumChannels
+    # deauths
+    out[tail + 5] = state['num_deauths'] / tot_interactions
+    # assocs
+    out[tail + 6] = state['num_associations'] / tot_interactions
+    # handshakes
+    out[tail + 7] = state['num_handshakes'] / tot_interactions
+    return out
@@ -5,27 +5,12 @@ import numpy as np
 
 import pwnagotchi.ai.featurizer as featurizer
 import pwnagotchi.ai.reward as reward
-from pwnagotchi.ai.parameter import Parameter
+import pwnagotchi.ai.parameter as parameter
 
 
 class Environment(gym.Env):
     metadata = {'render.modes': ['human']}
-    params = [
-        Parameter('min_rssi', min_value=-200, max_value=-50),
-        Parameter('ap_ttl', min_value=30, max_value=600),
-        Parameter('sta_ttl', min_value=60, max_value=300),
-
-        Parameter('recon_time', min_value=5, max_value=60),
-        Parameter('max_inactive_scale', min_value=3, max_value=10),
-        Parameter('recon_inactive_multiplier', min_value=1, max_value=3),
-        Parameter('hop_recon_time', min_value=5, max_value=60),
-        Parameter('min_recon_time', min_value=1, max_value=30),
-        Parameter('max_interactions', min_value=1, max_value=25),
-        Parameter('max_misses_for_recon', min_value=3, max_value=10),
-        Parameter('excited_num_epochs', min_value=5, max_value=30),
-        Parameter('bored_num_epochs', min_value=5, max_value=30),
-        Parameter('sad_num_epochs', min_value=5, max_value=30),
-    ]
+    params = parameter.personality()
 
     def __init__(self, agent, epoch):
         super(Environment, self).__init__()
@@ -38,11 +23,10 @@ class Environment(gym.Env):
         self._supported_channels = agent.supported_channels()
         self._extended_spectrum = any(ch > 140 for ch in self._supported_channels)
         self._histogram_size, self._observation_shape = featurizer.describe(self._extended_spectrum)
+        # reused at every step, the vectorized env copies the observations it gets
+        self._state_v = featurizer.buffer(self._extended_spectrum)
 
-        Environment.params += [
-            Parameter('_channel_%d' % ch, min_value=0, max_value=1, meta=ch + 1) for ch in
-            range(self._histogram_size) if ch + 1 in self._supported_channels
-        ]
+        Environment.params += parameter.channels(self._histogram_size, self._supported_channels)
 
         self.last = {
             'reward': 0.0,
@@ -57,34 +41,21 @@ class Environment(gym.Env):
         self.observation_space = spaces.Box(low=0, high=1, shape=self._observation_shape, dtype=np.float32)
         self.reward_range = reward.range
 
+        self._journal = None
+        config = agent.config()['ai']['journal']
+        if config['enabled']:
+            from pwnagotchi.ai.journal import Writer
+            from pwnagotchi.log import parse_max_size
+            self._journal = Writer(config['path'], int(np.prod(self._observation_shape)), self.action_space.nvec,
+                                   parse_max_size(config['max_size']))
+
     @staticmethod
     def policy_size():
         return len(list(p for p in Environment.params if p.trainable))
 
     @staticmethod
     def policy_to_params(policy):
-        num = len(policy)
-        params = {}
-
-        assert len(Environment.params) == num
-
-        channels = []
-
-        for i in range(num):
-            param = Environment.params[i]
-
-            if '_channel' not in param.name:
-                params[param.name] = param.to_param_value(policy[i])
-            else:
-                has_chan = param.to_param_value(policy[i])
-                # print("%s policy:%s bool:%s" % (param.name, policy[i], has_chan))
-                chan = param.meta
-                if has_chan:
-                    channels.append(chan)
-
-        params['channels'] = channels
-
-        return params
+        return parameter.to_params(Environment.params, policy)
 
     def _next_epoch(self):
         logging.debug("[ai] waiting for epoch to finish...")
@@ -107,18 +78,25 @@ class Environment(gym.Env):
 
         self.last['reward'] = state['reward']
         self.last['state'] = state
-        self.last['state_v'] = featurizer.featurize(state, self._epoch_num)
+        done = not self._agent.is_training()
+        if self._journal is not None:
+            # the observation the policy was chosen from, before the buffer gets the new one
+            try:
+                self._journal.append(self._state_v, policy, state['reward'], done)
+            except Exception as e:
+                logging.error("[ai] error while writing to the journal (%s)" % e)
+        self.last['state_v'] = featurizer.featurize(state, self._epoch_num, self._state_v)
 
         self._agent.on_ai_step()
 
-        return self.last['state_v'], self.last['reward'], not self._agent.is_training(), {}
+        return self.last['state_v'], self.last['reward'], done, {}
 
     def reset(self):
         # logging.info("[ai] resetting environment...")
         self._epoch_num = 0
         state = self._next_epoch()
         self.last['state'] = state
-        self.last['state_v'] = featurizer.featurize(state, 1)
+        self.last['state_v'] = featurizer.featurize(state, 1, self._state_v)
         return self.last['state_v']
 
     def _render_histogram(self, hist):
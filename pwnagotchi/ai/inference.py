@@ -0,0 +1,141 @@
+"""
+NumPy forward pass of the stable-baselines A2C MlpLstmPolicy, so that the unit can run its
+policy without importing TensorFlow when it's not training. The weights are exported from
+the A2C model to a .npz file next to the brain:
+
+    python3 -m pwnagotchi.ai.inference /root/brain.nn
+"""
+import argparse
+import logging
+import os
+
+import numpy as np
+
+
+def npz_path(nn_path):
+    return "%s.npz" % os.path.splitext(nn_path)[0]
+
+
+def _key(name):
+    # 'model/pi_fc0/w:0' -> 'pi_fc0.w'
+    name = name.split(':')[0]
+    if name.startswith('model/'):
+        name = name[len('model/'):]
+    return name.replace('/', '.')
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+class Policy(object):
+    """
+    MLP feature extractor (tanh), single LSTM cell and one categorical head per MultiDiscrete
+    dimension, the same graph stable-baselines builds for MlpLstmPolicy.
+    """
+
+    def __init__(self, weights, action_sizes):
+        self.action_sizes = [int(n) for n in action_sizes]
+        self._layers = []
+        i = 0
+        while 'pi_fc%d.w' % i in weights:
+            self._layers.append((weights['pi_fc%d.w' % i].astype(np.float32),
+                                 weights['pi_fc%d.b' % i].astype(np.float32)))
+            i += 1
+        self._wx = weights['lstm1.wx'].astype(np.float32)
+        self._wh = weights['lstm1.wh'].astype(np.float32)
+        self._b = weights['lstm1.b'].astype(np.float32)
+        self._pi_w = weights['pi.w'].astype(np.float32)
+        self._pi_b = weights['pi.b'].astype(np.float32)
+        self.n_lstm = self._wh.shape[0]
+        self.n_input = self._layers[0][0].shape[0] if self._layers else self._wx.shape[0]
+        self._splits = np.cumsum(self.action_sizes)[:-1]
+
+        if self._pi_b.shape[0] != sum(self.action_sizes):
+            raise ValueError("the policy has %d logits, the action space needs %d" % (
+                self._pi_b.shape[0], sum(self.action_sizes)))
+
+    @staticmethod
+    def load(path):
+        with np.load(path) as data:
+            weights = {key: data[key] for key in data.files}
+        return Policy(weights, weights.pop('action_sizes'))
+
+    def initial_state(self):
+        # cell state and hidden state, concatenated like stable-baselines does
+        return np.zeros(2 * self.n_lstm, dtype=np.float32)
+
+    def logits(self, obs, state=None, mask=False):
+        """
+        Action logits and the new LSTM state for a single observation.
+        """
+        x = np.asarray(obs, dtype=np.float32).reshape(-1)
+        if x.shape[0] != self.n_input:
+            raise ValueError("got an observation of size %d, the policy expects %d" % (x.shape[0], self.n_input))
+
+        for w, b in self._layers:
+            x = np.tanh(x.dot(w) + b)
+
+        if state is None or mask:
+            state = self.initial_state()
+        cell, hidden = state[:self.n_lstm], state[self.n_lstm:]
+        gates = x.dot(self._wx) + hidden.dot(self._wh) + self._b
+        in_gate, forget_gate, out_gate, candidate = np.split(gates, 4)
+        cell = _sigmoid(forget_gate) * cell + _sigmoid(in_gate) * np.tanh(candidate)
+        hidden = _sigmoid(out_gate) * np.tanh(cell)
+
+        return hidden.dot(self._pi_w) + self._pi_b, np.concatenate((cell, hidden))
+
+    def predict(self, obs, state=None, mask=False, deterministic=False):
+        """
+        Returns one choice per action dimension and the new LSTM state, like the predict() of
+        the stable-baselines models (which start from a zero state when none is given).
+        """
+        logits, state = self.logits(obs, state, mask)
+        heads = np.split(logits, self._splits)
+        if deterministic:
+            action = [int(np.argmax(head)) for head in heads]
+        else:
+            # gumbel-max sampling, as the stable-baselines categorical distributions do
+            action = [int(np.argmax(head - np.log(-np.log(np.random.uniform(size=head.shape))))) for head in heads]
+        return np.array(action), state
+
+
+def export(model, path):
+    """
+    Writes the policy weights of a stable-baselines A2C model to path, returns the Policy.
+    """
+    return export_weights(model.get_parameters(), model.action_space.nvec, path)
+
+
+def export_weights(params, action_sizes, path):
+    """
+    Same as export, from a {tensorflow variable name: array} copy of the weights.
+    """
+    weights = {_key(name): value for name, value in params.items()}
+    weights['action_sizes'] = np.asarray(action_sizes)
+    temp = "%s.tmp.npz" % os.path.splitext(path)[0]
+    np.savez(temp, **weights)
+    os.replace(temp, path)
+    return Policy(weights, weights['action_sizes'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Exports the policy of a brain.nn to the .npz read by the NumPy inference.')
+    parser.add_argument('path', nargs='?', default='/root/brain.nn', help='stable-baselines A2C model.')
+    parser.add_argument('--output', default=None, help='Where to save the weights (next to the model by default).')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] [%(levelname)s] %(message)s')
+
+    from stable_baselines import A2C
+
+    model = A2C.load(args.path)
+    output = args.output or npz_path(args.path)
+    policy = export(model, output)
+    logging.info("exported %s to %s (%d inputs, %d lstm units, %d action dimensions)" % (
+        args.path, output, policy.n_input, policy.n_lstm, len(policy.action_sizes)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Append-only experience journal: every step of the AI environment is written as a fixed-width
+record of float32 values (observation, action, reward, done) after a small header with the
+sizes of the observation and action spaces, so that the journals can be memory mapped and
+replayed offline with `pwnagotchi ai train`.
+"""
+import glob
+import logging
+import os
+import struct
+import time
+
+import numpy as np
+
+MAGIC = b'PWNJ'
+VERSION = 1
+# magic, version, observation size, action size, followed by the size of each action dimension
+HEADER = struct.Struct('<4sIII')
+EXTENSION = '.journal'
+
+
+def record_size(observation_size, action_size):
+    # observation, action, reward, done
+    return observation_size + action_size + 2
+
+
+class Writer(object):
+    """
+    Starts a new journal file in path, removing the oldest ones when the journals take more than
+    max_size bytes.
+    """
+
+    def __init__(self, path, observation_size, action_sizes, max_size=0):
+        os.makedirs(path, exist_ok=True)
+        if max_size:
+            prune(path, max_size)
+
+        self.observation_size = observation_size
+        self.action_size = len(action_sizes)
+        self.filename = os.path.join(path, "%d%s" % (time.time(), EXTENSION))
+        self._record = np.zeros(record_size(self.observation_size, self.action_size), dtype=np.float32)
+        self._fp = open(self.filename, 'ab')
+        self._fp.write(HEADER.pack(MAGIC, VERSION, self.observation_size, self.action_size))
+        self._fp.write(np.asarray(action_sizes, dtype='<u4').tobytes())
+        self._fp.flush()
+        logging.info("[ai] journaling the experience to %s" % self.filename)
+
+    def append(self, observation, action, reward, done):
+        obs_end = self.observation_size
+        act_end = obs_end + self.action_size
+        self._record[:obs_end] = np.asarray(observation).reshape(-1)
+        self._record[obs_end:act_end] = action
+        self._record[act_end] = reward
+        self._record[act_end + 1] = done
+        self._fp.write(self._record.tobytes())
+        self._fp.flush()
+
+    def close(self):
+        self._fp.close()
+
+
+class Journal(object):
+    """
+    A journal file, memory mapped. The columns are views on the records.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as fp:
+            magic, version, self.observation_size, self.action_size = HEADER.unpack(fp.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError("%s is not a version %d journal" % (filename, VERSION))
+            self.action_sizes = [int(n) for n in np.frombuffer(fp.read(4 * self.action_size), dtype='<u4')]
+
+        offset = HEADER.size + 4 * self.action_size
+        width = record_size(self.observation_size, self.action_size)
+        # a unit powered off while writing leaves a partial record at the end
+        count = (os.path.getsize(filename) - offset) // (width * 4)
+        if count:
+            self.records = np.memmap(filename, dtype=np.float32, mode='r', offset=offset, shape=(count, width))
+        else:
+            self.records = np.zeros((0, width), dtype=np.float32)
+
+        obs_end = self.observation_size
+        act_end = obs_end + self.action_size
+        self.observations = self.records[:, :obs_end]
+        self.actions = self.records[:, obs_end:act_end]
+        self.rewards = self.records[:, act_end]
+        self.dones = self.records[:, act_end + 1]
+
+    def __len__(self):
+        return len(self.records)
+
+
+def files(path):
+    return sorted(glob.glob(os.path.join(path, '**', '*%s' % EXTENSION), recursive=True))
+
+
+def load(path):
+    """
+    The non empty journals found in path and its subfolders, one per unit for instance.
+    """
+    journals = []
+    for filename in files(path):
+        try:
+            journal = Journal(filename)
+            if len(journal):
+                journals.append(journal)
+        except Exception as e:
+            logging.warning("skipping %s (%s)" % (filename, e))
+    return journals
+
+
+def prune(path, max_size):
+    filenames = files(path)
+    total = sum(os.path.getsize(f) for f in filenames)
+    while filenames and total > max_size:
+        oldest = filenames.pop(0)
+        total -= os.path.getsize(oldest)
+        os.remove(oldest)
+        logging.info("[ai] removed old journal %s" % oldest)
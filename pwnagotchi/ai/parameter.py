@@ -1,6 +1,3 @@
-from gym import spaces
-
-
 class Parameter(object):
     def __init__(self, name, value=0.0, min_value=0, max_value=2, meta=None, trainable=True):
         self.name = name
@@ -22,9 +19,67 @@ class Parameter(object):
         return self.max_value + self.scale_factor
 
     def space(self):
+        from gym import spaces
         return spaces.Discrete(self.max_value + self.scale_factor)
 
     def to_param_value(self, policy_v):
         self.value = policy_v - self.scale_factor
         assert self.min_value <= self.value <= self.max_value
         return int(self.value)
+
+
+def personality():
+    """
+    The personality parameters tuned by the AI engines, the channels are added per unit.
+    """
+    return [
+        Parameter('min_rssi', min_value=-200, max_value=-50),
+        Parameter('ap_ttl', min_value=30, max_value=600),
+        Parameter('sta_ttl', min_value=60, max_value=300),
+
+        Parameter('recon_time', min_value=5, max_value=60),
+        Parameter('max_inactive_scale', min_value=3, max_value=10),
+        Parameter('recon_inactive_multiplier', min_value=1, max_value=3),
+        Parameter('hop_recon_time', min_value=5, max_value=60),
+        Parameter('min_recon_time', min_value=1, max_value=30),
+        Parameter('max_interactions', min_value=1, max_value=25),
+        Parameter('max_misses_for_recon', min_value=3, max_value=10),
+        Parameter('excited_num_epochs', min_value=5, max_value=30),
+        Parameter('bored_num_epochs', min_value=5, max_value=30),
+        Parameter('sad_num_epochs', min_value=5, max_value=30),
+    ]
+
+
+def channels(histogram_size, supported_channels):
+    return [
+        Parameter('_channel_%d' % ch, min_value=0, max_value=1, meta=ch + 1) for ch in
+        range(histogram_size) if ch + 1 in supported_channels
+    ]
+
+
+def to_params(params, policy):
+    """
+    Turns a policy (one choice per parameter) into the personality configuration.
+    """
+    num = len(policy)
+    values = {}
+
+    assert len(params) == num
+
+    chans = []
+
+    for i in range(num):
+        param = params[i]
+
+        if '_channel' not in param.name:
+            values[param.name] = param.to_param_value(policy[i])
+        else:
+            has_chan = param.to_param_value(policy[i])
+            # print("%s policy:%s bool:%s" % (param.name, policy[i], has_chan))
+            chan = param.meta
+            if has_chan:
+                chans.append(chan)
+
+    values['channels'] = chans
+
+    return values
@@ -0,0 +1,172 @@
+import logging
+import multiprocessing
+import os
+import signal
+
+import gym
+
+import pwnagotchi.ai as ai
+import pwnagotchi.ai.reward as reward
+from pwnagotchi.ai.checkpoint import Checkpointer
+from pwnagotchi.ai.inference import export, npz_path
+
+
+class RemoteEnvironment(gym.Env):
+    """
+    Stands for the unit's Environment inside the trainer process: same spaces, but resets and
+    steps are sent to the agent process, which runs them on the real environment.
+    """
+    metadata = {'render.modes': ['human']}
+
+    def __init__(self, conn, observation_space, action_space, on_step=None):
+        super(RemoteEnvironment, self).__init__()
+        self._conn = conn
+        self._on_step = on_step
+        self.observation_space = observation_space
+        self.action_space = action_space
+        self.reward_range = reward.range
+
+    def _call(self, *msg):
+        self._conn.send(msg)
+        _, obs, r, done = self._conn.recv()
+        return obs, r, done
+
+    def reset(self):
+        obs, _, _ = self._call('reset')
+        return obs
+
+    def step(self, action):
+        obs, r, done = self._call('step', action)
+        if self._on_step is not None:
+            self._on_step()
+        return obs, r, done, {}
+
+    def render(self, mode='human', close=False):
+        pass
+
+
+class _Terminated(Exception):
+    """
+    Raised between two training steps once the trainer got SIGTERM.
+    """
+    pass
+
+
+def _trainer_main(conn, config, observation_space, action_space):
+    logging.basicConfig(filename=config['main']['log']['path'] or None, level=logging.INFO,
+                        format='[%(asctime)s] [%(levelname)s] %(message)s')
+    nice = config['ai']['trainer_nice']
+    if nice:
+        os.nice(nice)
+
+    nn_path = config['ai']['path']
+    holder = {}
+
+    def on_step():
+        # same as AsyncTrainer.on_ai_step
+        holder['checkpointer'].step()
+        if holder.get('terminating'):
+            raise _Terminated()
+
+    env = RemoteEnvironment(conn, observation_space, action_space, on_step=on_step)
+    model = ai.load(config, None, None, env=env)
+    if model:
+        checkpointer = holder['checkpointer'] = Checkpointer(model, nn_path, **config['ai']['checkpoint'])
+
+        def on_terminate(signum, frame):
+            # the agent is going away (shutdown, reboot or restart), the training loop saves the
+            # episode so far at the next step, not here in the middle of one
+            holder['terminating'] = True
+
+        signal.signal(signal.SIGTERM, on_terminate)
+        # so that the agent can infer with what we loaded
+        export(model, npz_path(nn_path))
+        logging.info("[ai-trainer] ready (pid %d, nice %d)" % (os.getpid(), nice))
+    conn.send(('ready', bool(model)))
+    if not model:
+        return
+
+    while True:
+        try:
+            msg = conn.recv()
+        except EOFError:
+            # the agent is gone
+            break
+        if msg[0] == 'stop' or holder.get('terminating'):
+            break
+        try:
+            model.learn(total_timesteps=msg[1])
+            ok = True
+        except _Terminated:
+            checkpointer.flush(60)
+            break
+        except Exception as e:
+            logging.exception("[ai-trainer] error while training (%s)", e)
+            ok = False
+        # end of the episode, the agent reloads the exported policy once we're done
+        checkpointer.flush()
+        conn.send(('done', ok))
+
+
+class RemoteTrainer(object):
+    """
+    Runs the A2C learner in a child process at a lower priority, so that TensorFlow never holds
+    the GIL of the agent. The child drives the training episodes and the agent answers its resets
+    and steps with the real environment, over a pipe.
+    """
+
+    def __init__(self, config, env):
+        self._env = env
+        # a fresh interpreter, forking a process with this many threads is asking for deadlocks
+        ctx = multiprocessing.get_context('spawn')
+        self._conn, child_conn = ctx.Pipe()
+        self._process = ctx.Process(target=_trainer_main, name='pwnagotchi-trainer', daemon=True,
+                                    args=(child_conn, config, env.observation_space, env.action_space))
+        self._process.start()
+        child_conn.close()
+        self._learning = False
+        logging.info("[ai] started the trainer process (pid %d), waiting for it to load the model..." %
+                     self._process.pid)
+        self.ready = self._conn.recv()[1]
+
+    def alive(self):
+        return self._process.is_alive()
+
+    def learn(self, total_timesteps):
+        """
+        Runs a training episode, returns once the trainer is done with it.
+        """
+        self._learning = True
+        try:
+            self._conn.send(('learn', total_timesteps))
+            while True:
+                msg = self._conn.recv()
+                if msg[0] == 'reset':
+                    self._conn.send(('obs', self._env.reset(), 0.0, False))
+                elif msg[0] == 'step':
+                    obs, r, done, _ = self._env.step(msg[1])
+                    self._conn.send(('obs', obs, r, done))
+                elif msg[0] == 'done':
+                    return msg[1]
+        finally:
+            self._learning = False
+
+    def stop(self, timeout=60):
+        """
+        Stops the trainer, an episode in progress is saved first.
+        """
+        if not self._process.is_alive():
+            return
+
+        if self._learning:
+            # the pipe is busy with the episode, the trainer saves and exits at its next step
+            self._process.terminate()
+        else:
+            try:
+                self._conn.send(('stop',))
+            except OSError:
+                pass
+        self._process.join(timeout)
+        if self._process.is_alive():
+            logging.warning("[ai] the trainer process didn't stop in %ds, killing it" % timeout)
+            self._process.kill()
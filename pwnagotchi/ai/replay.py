@@ -0,0 +1,174 @@
+"""
+Offline training on the experience journals of one or more units, meant to run on a workstation:
+the journals are replayed by vectorized environments and A2C is trained (or fine-tuned if the
+brain exists) on them, then the brain and its NumPy policy are saved for the units to load.
+"""
+import logging
+import os
+import time
+
+import gym
+from gym import spaces
+import numpy as np
+
+import pwnagotchi.ai.reward as reward
+from pwnagotchi.ai.journal import Journal, load
+
+
+class RewardModel(object):
+    """
+    Ridge regression of the reward on the observation and the one-hot encoded actions. The A2C
+    learner picks other actions than the ones the unit took, their reward is the logged one
+    corrected by how much better or worse the model expects the new actions to do.
+    """
+
+    def __init__(self, observation_size, action_sizes, l2=1.0):
+        self.observation_size = observation_size
+        self.action_sizes = list(action_sizes)
+        self.l2 = l2
+        self._offsets = np.concatenate(([0], np.cumsum(self.action_sizes)[:-1])).astype(np.int64)
+        self._width = observation_size + sum(self.action_sizes) + 1
+        self._action_weights = np.zeros(sum(self.action_sizes), dtype=np.float64)
+
+    def _features(self, observations, actions):
+        x = np.zeros((len(observations), self._width), dtype=np.float64)
+        x[:, :self.observation_size] = observations
+        rows = np.arange(len(actions))[:, None]
+        x[rows, self.observation_size + self._offsets + actions.astype(np.int64)] = 1.0
+        x[:, -1] = 1.0
+        return x
+
+    def fit(self, journals, chunk=4096):
+        xtx = np.zeros((self._width, self._width), dtype=np.float64)
+        xty = np.zeros(self._width, dtype=np.float64)
+        for journal in journals:
+            for start in range(0, len(journal), chunk):
+                x = self._features(journal.observations[start:start + chunk], journal.actions[start:start + chunk])
+                xtx += x.T.dot(x)
+                xty += x.T.dot(journal.rewards[start:start + chunk])
+
+        w = np.linalg.solve(xtx + self.l2 * np.eye(self._width), xty)
+        self._action_weights = w[self.observation_size:-1]
+        return self
+
+    def effect(self, action):
+        """
+        The part of the expected reward due to the action.
+        """
+        return float(self._action_weights[self._offsets + np.asarray(action, dtype=np.int64)].sum())
+
+
+class ReplayEnvironment(gym.Env):
+    """
+    Replays random stretches of the journals: the observations are the logged ones, whatever the
+    actions, and the rewards are corrected by the RewardModel.
+    """
+    metadata = {'render.modes': ['human']}
+
+    def __init__(self, filenames, observation_space, action_space, reward_model, episode_length=50, seed=None):
+        super(ReplayEnvironment, self).__init__()
+        self._journals = [Journal(filename) for filename in filenames]
+        lengths = np.array([len(j) for j in self._journals], dtype=np.float64)
+        self._weights = lengths / lengths.sum()
+        self._reward_model = reward_model
+        self._episode_length = episode_length
+        self._random = np.random.RandomState(seed)
+        self._journal = None
+        self._index = 0
+        self._steps = 0
+
+        self.observation_space = observation_space
+        self.action_space = action_space
+        self.reward_range = reward.range
+
+    def _observation(self):
+        return np.array(self._journal.observations[self._index]).reshape(self.observation_space.shape)
+
+    def reset(self):
+        self._journal = self._journals[self._random.choice(len(self._journals), p=self._weights)]
+        self._index = self._random.randint(0, max(1, len(self._journal) - self._episode_length))
+        self._steps = 0
+        return self._observation()
+
+    def step(self, action):
+        logged = self._journal.actions[self._index]
+        r = self._journal.rewards[self._index] + self._reward_model.effect(action) - self._reward_model.effect(logged)
+        self._index += 1
+        self._steps += 1
+        done = self._steps >= self._episode_length or self._index >= len(self._journal) - 1
+        self._index = min(self._index, len(self._journal) - 1)
+        return self._observation(), float(np.clip(r, *reward.range)), done, {}
+
+    def render(self, mode='human', close=False):
+        pass
+
+
+def train(paths, brain, output, timesteps, envs=1, params=None, episode_length=50, l2=1.0):
+    """
+    Trains brain (or a new model if it doesn't exist) on the journals found in paths and saves it
+    to output, returns False if there was nothing to train on.
+    """
+    from stable_baselines import A2C
+    from stable_baselines.common.policies import MlpLstmPolicy
+    from stable_baselines.common.vec_env import DummyVecEnv, SubprocVecEnv
+    from pwnagotchi.ai.checkpoint import Snapshot
+
+    journals = []
+    for path in paths:
+        journals += load(path)
+    if not journals:
+        logging.error("no journals found in %s" % ', '.join(paths))
+        return False
+
+    base = None
+    if os.path.exists(brain):
+        logging.info("fine-tuning %s" % brain)
+        base = A2C.load(brain)
+        observation_space, action_space = base.observation_space, base.action_space
+    else:
+        # the spaces of the unit with the most experience
+        largest = max(journals, key=len)
+        logging.info("%s not found, training a new model" % brain)
+        observation_space = spaces.Box(low=0, high=1, shape=(1, largest.observation_size), dtype=np.float32)
+        action_space = spaces.MultiDiscrete(largest.action_sizes)
+
+    sizes = [int(n) for n in action_space.nvec]
+    observation_size = observation_space.shape[-1]
+    matching = [j for j in journals if j.observation_size == observation_size and j.action_sizes == sizes]
+    for journal in journals:
+        if journal not in matching:
+            logging.warning("skipping %s, recorded with other observation or action spaces" % journal.filename)
+    if not matching:
+        logging.error("no journal matches the spaces of the model")
+        return False
+
+    steps = sum(len(j) for j in matching)
+    logging.info("fitting the reward model on %d steps from %d journals..." % (steps, len(matching)))
+    start = time.time()
+    reward_model = RewardModel(observation_size, sizes, l2).fit(matching)
+    logging.info("reward model fitted in %.2fs" % (time.time() - start))
+
+    filenames = [j.filename for j in matching]
+
+    def make_env(seed):
+        return lambda: ReplayEnvironment(filenames, observation_space, action_space, reward_model,
+                                         episode_length, seed)
+
+    params = params or {}
+    vec_env = SubprocVecEnv([make_env(i) for i in range(envs)]) if envs > 1 else DummyVecEnv([make_env(0)])
+    model = A2C(MlpLstmPolicy, vec_env, **params)
+    if base is not None:
+        model.load_parameters(base.get_parameters())
+
+    logging.info("training for %d timesteps on %d environments..." % (timesteps, envs))
+    start = time.time()
+    model.learn(total_timesteps=timesteps)
+    logging.info("trained in %.2fs" % (time.time() - start))
+    vec_env.close()
+
+    # the LSTM policy is built for a number of environments, the unit runs a single one
+    single = A2C(MlpLstmPolicy, DummyVecEnv([make_env(0)]), **params)
+    single.load_parameters(model.get_parameters())
+    _, size = Snapshot(single).write(output)
+    logging.info("saved %s (%d bytes with the exported policy)" % (output, size))
+    return True
@@ -1,4 +1,5 @@
 import _thread
+import atexit
 import threading
 import time
 import random
@@ -8,12 +9,18 @@ import logging
 
 import pwnagotchi.plugins as plugins
 import pwnagotchi.ai as ai
+from pwnagotchi import sysmon
+from pwnagotchi.ai import checkpoint
+from pwnagotchi.ai.bootstrap import Bootstrap
 
 
 class Stats(object):
-    def __init__(self, path, events_receiver):
+    def __init__(self, path, events_receiver, save_every=0):
         self._lock = threading.Lock()
         self._receiver = events_receiver
+        # seconds between saves, they're also saved with the checkpoints and on shutdown
+        self._save_every = save_every
+        self._saved_at = 0
 
         self.path = path
         self.born_at = time.time()
@@ -44,7 +51,8 @@ class Stats(object):
             if training:
                 self.epochs_trained += 1
 
-        self.save()
+        if time.time() - self._saved_at >= self._save_every:
+            self.save()
 
         if best_r:
             self._receiver.on_ai_best_reward(reward)
@@ -81,16 +89,33 @@ class Stats(object):
                 fp.write(data)
 
             os.replace(temp, self.path)
+            self._saved_at = time.time()
+
+    def flush(self, timeout=None):
+        self.save()
+        return True
 
 
 class AsyncTrainer(object):
     def __init__(self, config):
         self._config = config
+        # the gym environment, the TensorFlow model (loaded for training only) and the NumPy policy
+        self._env = None
         self._model = None
+        self._policy = None
+        # the trainer process when ai.trainer is "process"
+        self._remote = None
+        # writes the checkpoints of the model when training in this process
+        self._checkpointer = None
+        # the learner when ai.engine is "bandit"
+        self._bandit = None
+        self._bootstrap = Bootstrap(on_stage=self._on_ai_bootstrap)
         self._is_training = False
         self._training_epochs = 0
         self._nn_path = self._config['ai']['path']
-        self._stats = Stats("%s.json" % os.path.splitext(self._nn_path)[0], self)
+        self._stats = Stats("%s.json" % os.path.splitext(self._nn_path)[0], self,
+                            save_every=self._config['ai']['checkpoint']['every_secs'])
+        checkpoint.register(self._stats)
 
     def set_training(self, training, for_epochs=0):
         self._is_training = training
@@ -107,25 +132,94 @@ class AsyncTrainer(object):
     def training_epochs(self):
         return self._training_epochs
 
+    def ai_status(self):
+        status = {
+            'enabled': self._config['ai']['enabled'],
+            'engine': self._config['ai']['engine'],
+            'ready': self._bootstrap.ready_at is not None,
+            'training': self._is_training,
+            'bootstrap': self._bootstrap.status()
+        }
+        if self._checkpointer is not None:
+            status['checkpoints'] = self._checkpointer.stats()
+        if self._bandit is not None:
+            status['bandit'] = {'updates': self._bandit.bandit.updates}
+        return status
+
     def start_ai(self):
+        # the worker runs for as long as the agent, it would take one of the runtime workers forever
         _thread.start_new_thread(self._ai_worker, ())
 
     def _save_ai(self):
-        logging.info("[ai] saving model to %s..." % self._nn_path)
-        temp = "%s.tmp" % self._nn_path
-        self._model.save(temp)
-        os.replace(temp, self._nn_path)
+        self._checkpointer.save()
+        self._checkpointer.wait()
+
+    def _export_policy(self):
+        if self._remote is not None:
+            # exported by the trainer process once it loaded the model
+            self._policy = ai.load_policy(self._config, self._env)
+        else:
+            self._save_ai()
+        return self._policy if self._policy is not None else False
+
+    def _on_checkpoint(self, policy):
+        # called by the checkpoint writer thread
+        self._policy = policy
+        self._stats.save()
+
+    def _start_trainer(self):
+        """
+        Loads the model, or starts the trainer process, returns False if that failed.
+        """
+        if self._config['ai']['trainer'] == 'process':
+            if self._remote is None or not self._remote.alive():
+                from pwnagotchi.ai.remote import RemoteTrainer
+                try:
+                    self._remote = RemoteTrainer(self._config, self._env)
+                    # stopped at exit like the runtime, so that the episode in progress is saved
+                    atexit.register(self._remote.stop)
+                except Exception as e:
+                    logging.exception("[ai] error while starting the trainer process (%s)", e)
+                    self._remote = None
+                    return False
+            return self._remote.ready
+
+        if self._model is None:
+            self._model = ai.load(self._config, self, self._epoch, env=self._env)
+            if self._model:
+                self._checkpointer = checkpoint.Checkpointer(self._model, self._nn_path,
+                                                             on_saved=self._on_checkpoint,
+                                                             **self._config['ai']['checkpoint'])
+        return bool(self._model)
+
+    def _learn(self, epochs):
+        if self._remote is not None:
+            # the trainer process saves its checkpoints, get the policy it exported
+            try:
+                self._remote.learn(epochs)
+            finally:
+                policy = ai.load_policy(self._config, self._env)
+                if policy is not None:
+                    self._policy = policy
+                self._stats.save()
+        else:
+            try:
+                self._model.learn(total_timesteps=epochs, callback=self.on_ai_training_step)
+            finally:
+                # end of the episode
+                if self._checkpointer.dirty():
+                    self._checkpointer.save()
 
     def on_ai_step(self):
-        self._model.env.render()
+        self._env.render()
 
-        if self._is_training:
-            self._save_ai()
+        if self._is_training and self._checkpointer:
+            self._checkpointer.step()
 
         self._stats.on_epoch(self._epoch.data(), self._is_training)
 
     def on_ai_training_step(self, _locals, _globals):
-        self._model.env.render()
+        self._env.render()
         plugins.on('ai_training_step', self, _locals, _globals)
 
     def on_ai_policy(self, new_params):
@@ -140,11 +234,21 @@ class AsyncTrainer(object):
             else:
                 logging.error("[ai] param %s not in personality configuration!" % name)
 
-        self.run('set wifi.ap.ttl %d' % self._config['personality']['ap_ttl'])
-        self.run('set wifi.sta.ttl %d' % self._config['personality']['sta_ttl'])
-        self.run('set wifi.rssi.min %d' % self._config['personality']['min_rssi'])
+        commands = [
+            'set wifi.ap.ttl %d' % self._config['personality']['ap_ttl'],
+            'set wifi.sta.ttl %d' % self._config['personality']['sta_ttl'],
+            'set wifi.rssi.min %d' % self._config['personality']['min_rssi']
+        ]
+        for command, result in zip(commands, self.run_batch(commands)):
+            if isinstance(result, Exception):
+                logging.error("[ai] error while running '%s' (%s)" % (command, result))
+
+    def _on_ai_bootstrap(self, stage):
+        if stage != 'wait':
+            self._view.on_ai_bootstrap(stage, time.time() - self._bootstrap.started_at)
 
     def on_ai_ready(self):
+        self._bootstrap.ready()
         self._view.on_ai_ready()
         plugins.on('ai_ready', self)
 
@@ -158,32 +262,113 @@ class AsyncTrainer(object):
         self._view.on_demotivated(r)
         plugins.on('ai_worst_reward', self, r)
 
+    def _wait_for_bootstrap(self):
+        """
+        Defers loading the AI until the agent went through its first epochs or the system is idle,
+        so that the first recon doesn't compete with it for the CPU.
+        """
+        config = self._config['ai']['bootstrap']
+        while True:
+            if self._epoch.epoch >= config['after_epochs']:
+                return 'epochs'
+            if self._epoch.epoch >= 1 and config['idle_cpu'] > 0:
+                samples = sysmon.window(10)
+                if samples and sum(s['cpu_load'] for s in samples) / len(samples) < config['idle_cpu']:
+                    return 'idle'
+            time.sleep(1)
+
+    def _bootstrap_ai(self):
+        """
+        Runs the stages of the AI startup that aren't done yet, returns False if one failed.
+        """
+        self._env = self._bootstrap.run('environment', ai.environment, self, self._epoch)
+        if not self._env:
+            return False
+
+        # TensorFlow is only needed to train, inference runs on the exported weights if we have them
+        self._policy = self._bootstrap.run('policy', ai.load_policy, self._config, self._env)
+        if self._policy is None:
+            logging.info("[ai] no exported policy, loading the full model to export it...")
+            if self._config['ai']['trainer'] != 'process':
+                self._bootstrap.run('dependencies', ai.dependencies)
+            if not self._bootstrap.run('model', self._start_trainer):
+                return False
+            self._policy = self._bootstrap.run('export', self._export_policy)
+        return bool(self._policy)
+
     def _ai_worker(self):
-        self._model = ai.load(self._config, self, self._epoch)
-
-        if self._model:
-            self.on_ai_ready()
-
-            epochs_per_episode = self._config['ai']['epochs_per_episode']
-
-            obs = None
-            while True:
-                self._model.env.render()
-                # enter in training mode?
-                if random.random() > self._config['ai']['laziness']:
-                    logging.info("[ai] learning for %d epochs..." % epochs_per_episode)
-                    try:
-                        self.set_training(True, epochs_per_episode)
-                        self._model.learn(total_timesteps=epochs_per_episode, callback=self.on_ai_training_step)
-                    except Exception as e:
-                        logging.exception("[ai] error while training (%s)", e)
-                    finally:
-                        self.set_training(False)
-                        obs = self._model.env.reset()
-                # init the first time
-                elif obs is None:
-                    obs = self._model.env.reset()
-
-                # run the inference
-                action, _ = self._model.predict(obs)
-                obs, _, _, _ = self._model.env.step(action)
+        if not self._config['ai']['enabled']:
+            logging.info("ai disabled")
+            return
+
+        self._bootstrap.run('wait', self._wait_for_bootstrap)
+
+        if self._config['ai']['engine'] == 'bandit':
+            self._bandit_worker()
+            return
+
+        retries = self._config['ai']['bootstrap']['retries']
+        while True:
+            try:
+                if self._bootstrap_ai():
+                    break
+            except Exception as e:
+                logging.exception("[ai] error while loading the AI (%s)", e)
+            if retries <= 0:
+                logging.warning("[ai] AI not loaded!")
+                return
+            retries -= 1
+            logging.info("[ai] resuming the AI bootstrap in 60s (%d retries left)" % retries)
+            time.sleep(60)
+
+        self.on_ai_ready()
+
+        epochs_per_episode = self._config['ai']['epochs_per_episode']
+
+        obs = None
+        while True:
+            self._env.render()
+            # enter in training mode?
+            if random.random() > self._config['ai']['laziness'] and self._start_trainer():
+                logging.info("[ai] learning for %d epochs..." % epochs_per_episode)
+                try:
+                    self.set_training(True, epochs_per_episode)
+                    self._learn(epochs_per_episode)
+                except Exception as e:
+                    logging.exception("[ai] error while training (%s)", e)
+                finally:
+                    self.set_training(False)
+                    obs = self._env.reset()
+            # init the first time
+            elif obs is None:
+                obs = self._env.reset()
+
+            # run the inference
+            action, _ = self._policy.predict(obs)
+            obs, _, _, _ = self._env.step(action)
+
+    def _bandit_worker(self):
+        import pwnagotchi.ai.featurizer as featurizer
+        import pwnagotchi.ai.parameter as parameter
+        from pwnagotchi.ai.bandit import Engine, state_path
+
+        def load():
+            supported = self.supported_channels()
+            histogram_size, _ = featurizer.describe(any(ch > 140 for ch in supported))
+            config = self._config['ai']['bandit']
+            self._bandit = Engine(parameter.personality() + parameter.channels(histogram_size, supported),
+                                  state_path(self._nn_path), config['arms'], config['decay'],
+                                  save_every=self._config['ai']['checkpoint']['every_secs'])
+            checkpoint.register(self._bandit)
+            return self._bandit.bandit.params
+
+        params = self._bootstrap.run('bandit', load)
+
+        self.on_ai_ready()
+
+        while True:
+            self.on_ai_policy(parameter.to_params(params, self._bandit.choose()))
+            # the bandit learns from every epoch
+            data = self._epoch.wait_for_epoch_data(with_observation=False)
+            self._bandit.update(data['reward'])
+            self._stats.on_epoch(data, True)
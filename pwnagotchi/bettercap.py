@@ -1,9 +1,41 @@
+import asyncio
+import json
 import logging
+import random
+import threading
+import time
+from collections import OrderedDict
 import requests
 import websockets
 
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
 
+import pwnagotchi.metrics as metrics
+import pwnagotchi.timing as timing
+
+REQUEST_LATENCY = metrics.histogram('pwnagotchi_bettercap_request_seconds',
+                                    'Round trip time of the bettercap REST API requests.', ['request'])
+EVENTS = metrics.counter('pwnagotchi_bettercap_events',
+                         'bettercap websocket events, by what happened to them.', ['result'])
+EVENTS_QUEUE_DEPTH = metrics.gauge('pwnagotchi_bettercap_events_queue_depth',
+                                   'bettercap events waiting for the blocking handlers.')
+EVENT_HANDLER_TIME = metrics.histogram('pwnagotchi_bettercap_event_handler_seconds',
+                                       'Time spent handling the bettercap events.', ['tag'])
+
+# bettercap is always local, so fail fast when it's not answering
+# instead of hanging the main loop, but leave room for slow commands
+DEFAULT_TIMEOUT = (1.0, 30.0)
+# main loop, session fetcher, event poller and a few plugins
+POOL_SIZE = 8
+# how old a /api/session snapshot can be before it's fetched again
+DEFAULT_SESSION_MAX_AGE = 1.0
+# pending events for the blocking handlers before the oldest ones get dropped
+DEFAULT_EVENTS_QUEUE_SIZE = 64
+# websocket reconnection backoff bounds, in seconds
+RECONNECT_MIN_DELAY = 1.0
+RECONNECT_MAX_DELAY = 30.0
+
 
 def decode(r, verbose_errors=True):
     try:
@@ -19,26 +51,226 @@ def decode(r, verbose_errors=True):
         return r.text
 
 
+class Snapshot(object):
+    def __init__(self, generation, data, fetched_at):
+        # increases every time a new document is fetched from bettercap
+        self.generation = generation
+        # the decoded /api/session document, shared among threads: do not modify it
+        self.data = data
+        self.fetched_at = fetched_at
+
+    def age(self):
+        return time.time() - self.fetched_at
+
+
+class SessionCache(object):
+    """
+    Shares /api/session snapshots among threads: a snapshot younger than max_age is
+    returned as is, and callers arriving while a request is in flight wait for its
+    result instead of sending their own. Ages are counted from when the request was
+    sent, so with max_age=0 the snapshot is always one requested after the call.
+    """
+
+    def __init__(self, fetch, max_age=DEFAULT_SESSION_MAX_AGE):
+        self.max_age = max_age
+        self._fetch = fetch
+        self._cond = threading.Condition()
+        self._snapshot = None
+        self._generation = 0
+        self._fetching = False
+        # when the request in flight, or the one of the current snapshot, was sent
+        self._fetch_started = None
+        self._snapshot_started = None
+        self._completed = 0
+        self._error = None
+
+    def generation(self):
+        return self._generation
+
+    def get(self, max_age=None):
+        max_age = self.max_age if max_age is None else max_age
+        since = time.time() - max_age
+
+        with self._cond:
+            while True:
+                if self._snapshot is not None and self._snapshot_started >= since:
+                    return self._snapshot
+
+                if not self._fetching:
+                    break
+
+                started, completed = self._fetch_started, self._completed
+                while self._completed == completed:
+                    self._cond.wait()
+                if started >= since:
+                    if self._error is not None:
+                        raise self._error
+                    return self._snapshot
+                # that request was sent too early for us, send or join a newer one
+
+            self._fetching = True
+            started = self._fetch_started = time.time()
+
+        data, error = None, None
+        try:
+            data = self._fetch()
+        except Exception as e:
+            error = e
+
+        with self._cond:
+            self._fetching = False
+            self._completed += 1
+            self._error = error
+            if error is None:
+                self._generation += 1
+                self._snapshot = Snapshot(self._generation, data, time.time())
+                self._snapshot_started = started
+            self._cond.notify_all()
+
+        if error is not None:
+            raise error
+        return self._snapshot
+
+    def invalidate(self):
+        with self._cond:
+            self._snapshot = None
+
+
+class EventDispatcher(object):
+    """
+    Routes websocket events to the handlers registered for their tag.
+
+    Messages are matched with a substring test before being decoded, so events nobody
+    is interested in never reach json.loads. Handlers registered as blocking run on a
+    worker thread fed by a bounded queue: when the queue is full the oldest event is
+    dropped, and coalescing handlers only keep the latest pending event of their tag.
+    """
+
+    def __init__(self, queue_size=DEFAULT_EVENTS_QUEUE_SIZE):
+        self.queue_size = queue_size
+        # tag -> [(handler, blocking, coalesce)]
+        self._handlers = {}
+        self._needles = []
+        self._cond = threading.Condition()
+        self._queue = OrderedDict()
+        self._seq = 0
+        self._worker = None
+
+    def register(self, tag, handler, blocking=False, coalesce=False):
+        if tag not in self._handlers:
+            self._handlers[tag] = []
+            self._needles.append(('"%s"' % tag, tag))
+        self._handlers[tag].append((handler, blocking, coalesce))
+
+        if blocking and self._worker is None:
+            self._worker = threading.Thread(target=self._work, daemon=True)
+            self._worker.start()
+
+    def dispatch(self, msg, inline=False):
+        """
+        Routes msg to its handlers, inline runs the blocking ones on the calling thread too.
+        """
+        EVENTS.inc(result='received')
+
+        if not any(needle in msg for needle, _ in self._needles):
+            EVENTS.inc(result='skipped')
+            return
+
+        jmsg = json.loads(msg)
+        tag = jmsg['tag']
+        for handler, blocking, coalesce in self._handlers.get(tag, ()):
+            if blocking and not inline:
+                self._enqueue(tag, handler, coalesce, jmsg)
+            else:
+                self._call(tag, handler, jmsg)
+
+    async def on_message(self, msg):
+        self.dispatch(msg)
+
+    def _enqueue(self, tag, handler, coalesce, jmsg):
+        with self._cond:
+            if coalesce:
+                key = (tag, handler)
+                if key in self._queue:
+                    EVENTS.inc(result='coalesced')
+            else:
+                self._seq += 1
+                key = self._seq
+
+            self._queue[key] = (tag, handler, jmsg)
+            while len(self._queue) > self.queue_size:
+                _, (dropped_tag, _, _) = self._queue.popitem(last=False)
+                EVENTS.inc(result='dropped')
+                logging.debug(f"Event queue full, dropped {dropped_tag}")
+
+            EVENTS_QUEUE_DEPTH.set(len(self._queue))
+            self._cond.notify()
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                _, (tag, handler, jmsg) = self._queue.popitem(last=False)
+                EVENTS_QUEUE_DEPTH.set(len(self._queue))
+
+            self._call(tag, handler, jmsg)
+
+    def _call(self, tag, handler, jmsg):
+        with EVENT_HANDLER_TIME.time(tag=tag):
+            try:
+                handler(jmsg)
+            except Exception as e:
+                logging.error(f"Error while handling {tag} event ({e})")
+                logging.debug(e, exc_info=True)
+
+
 class Client(object):
-    def __init__(self, hostname='localhost', scheme='http', port=8081, username='user', password='pass'):
+    def __init__(self, hostname='localhost', scheme='http', port=8081, username='user', password='pass',
+                 timeout=DEFAULT_TIMEOUT, session_max_age=DEFAULT_SESSION_MAX_AGE,
+                 events_queue_size=DEFAULT_EVENTS_QUEUE_SIZE):
         self.hostname = hostname
         self.scheme = scheme
         self.port = port
         self.username = username
         self.password = password
+        self.timeout = timeout
         self.url = f"{scheme}://{hostname}:{port}/api"
         self.websocket = f"ws://{username}:{password}@{hostname}:{port}/api"
         self.auth = HTTPBasicAuth(username, password)
+        # keep-alive connections shared by every thread talking to the api
+        self._http = requests.Session()
+        self._http.auth = self.auth
+        self._http.mount(f"{scheme}://", HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE))
+        self._session_cache = SessionCache(self._fetch_session, session_max_age)
+        self.events = EventDispatcher(events_queue_size)
+        # used by the asyncio runtime only, see _aio_http
+        self._aio = None
 
-    def session(self):
-        r = requests.get(f"{self.url}/session", auth=self.auth)
+    @timing.timed('bettercap')
+    def _fetch_session(self):
+        with REQUEST_LATENCY.time(request='session'):
+            r = self._http.get(f"{self.url}/session", timeout=self.timeout)
         return decode(r)
 
-    async def start_websocket(self, consumer):
+    def session(self, max_age=None):
+        """
+        Returns the /api/session document, reusing a cached one if it's not older than
+        max_age seconds (bettercap.session_max_age by default, 0 forces a new request).
+        """
+        return self._session_cache.get(max_age).data
+
+    def session_snapshot(self, max_age=None):
+        return self._session_cache.get(max_age)
+
+    async def start_websocket(self, consumer=None):
+        consumer = self.events.on_message if consumer is None else consumer
         s = f"{self.websocket}/events"
+        attempt = 0
         while True:
             try:
                 async with websockets.connect(s, ping_interval=60, ping_timeout=90) as ws:
+                    attempt = 0
                     async for msg in ws:
                         try:
                             await consumer(msg)
@@ -48,7 +280,86 @@ class Client(object):
                 logging.debug("Lost websocket connection. Reconnecting...")
             except websockets.exceptions.WebSocketException as wex:
                 logging.debug(f"Websocket exception ({wex})")
+            except Exception as ex:
+                logging.debug(f"Error while connecting to the websocket ({ex})")
+
+            # exponential backoff with jitter, so we don't hammer bettercap while it's restarting
+            delay = min(RECONNECT_MAX_DELAY, RECONNECT_MIN_DELAY * (2 ** attempt))
+            attempt = min(attempt + 1, 8)
+            await asyncio.sleep(delay * random.uniform(0.5, 1.5))
 
+    @timing.timed('bettercap')
     def run(self, command, verbose_errors=True):
-        r = requests.post(f"{self.url}/session", auth=self.auth, json={'cmd': command})
+        with REQUEST_LATENCY.time(request='command'):
+            r = self._http.post(f"{self.url}/session", json={'cmd': command}, timeout=self.timeout)
         return decode(r, verbose_errors=verbose_errors)
+
+    def _aio_http(self):
+        """
+        Returns an aiohttp session bound to the running loop, or False if aiohttp is not installed
+        and the async methods have to fall back to the blocking client on the executor.
+        """
+        if self._aio is None:
+            try:
+                import aiohttp
+                self._aio = aiohttp.ClientSession(
+                    auth=aiohttp.BasicAuth(self.username, self.password),
+                    connector=aiohttp.TCPConnector(limit=POOL_SIZE),
+                    timeout=aiohttp.ClientTimeout(sock_connect=self.timeout[0], sock_read=self.timeout[1]))
+            except ImportError:
+                logging.warning("aiohttp not installed, async bettercap requests will use the executor")
+                self._aio = False
+        return self._aio
+
+    async def _aio_decode(self, r, verbose_errors=True):
+        text = await r.text()
+        try:
+            return json.loads(text)
+        except Exception as e:
+            if r.status == 200:
+                logging.error(f"Error while decoding json: error='{e}' resp='{text}'")
+            else:
+                err = f"Error {r.status}: {text.strip()}"
+                if verbose_errors:
+                    logging.info(err)
+                raise Exception(err)
+            return text
+
+    async def run_async(self, command, verbose_errors=True):
+        http = self._aio_http()
+        if not http:
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(None, self.run, command, verbose_errors)
+
+        with REQUEST_LATENCY.time(request='command'):
+            async with http.post(f"{self.url}/session", json={'cmd': command}) as r:
+                return await self._aio_decode(r, verbose_errors=verbose_errors)
+
+    async def close_async(self):
+        if self._aio:
+            await self._aio.close()
+        self._aio = None
+
+    def run_batch(self, commands, verbose_errors=True):
+        """
+        Runs a list of commands with a single request and returns one result per command,
+        failed commands get the exception they raised instead of a result.
+
+        bettercap stops at the first failing command without telling which one it was,
+        in that case every command is sent again on its own, so only use this for
+        idempotent commands (set, events.ignore, ...) that contain no ';'.
+        """
+        if not commands:
+            return []
+
+        try:
+            result = self.run('; '.join(commands), verbose_errors=False)
+            return [result] * len(commands)
+        except Exception:
+            results = []
+            for command in commands:
+                try:
+                    results.append(self.run(command, verbose_errors=verbose_errors))
+                except Exception as e:
+                    results.append(e)
+            return results
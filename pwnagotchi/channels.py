@@ -0,0 +1,201 @@
+import logging
+import math
+import random
+import threading
+import time
+
+# reconnections we need to see on a channel before trusting its latency
+MIN_SAMPLES = 3
+# weight of the last measure in the moving averages
+ALPHA = 0.3
+# deauthed stations we keep waiting a handshake from, for reconnect latencies
+MAX_PENDING = 4096
+
+
+class ChannelStats(object):
+    def __init__(self, channel):
+        self.channel = channel
+        # decaying sums, see ChannelPlanner.observe
+        self.dwell = 0.0
+        self.handshakes = 0.0
+        self.visits = 0.0
+        # seconds from a deauth to the handshake
+        self.latency = 0.0
+        self.latency_dev = 0.0
+        self.reconnects = 0
+        # fraction of the access points that changed between two epochs
+        self.churn = 0.0
+        self.targets = 0
+        self.aps = frozenset()
+        self.score = 0.0
+
+    def rate(self):
+        return self.handshakes / self.dwell if self.dwell > 0 else 0.0
+
+    def data(self):
+        return {
+            'targets': self.targets,
+            'visits': round(self.visits, 2),
+            'dwell': round(self.dwell, 2),
+            'handshakes': round(self.handshakes, 2),
+            'yield': self.rate(),
+            'latency': round(self.latency, 2) if self.reconnects else None,
+            'reconnects': self.reconnects,
+            'churn': round(self.churn, 3),
+            'score': round(self.score, 3)
+        }
+
+
+class ChannelPlanner(object):
+    """
+    Keeps per channel statistics (handshakes per second of dwell, reconnect latency after a deauth,
+    access points churn) as decaying averages and uses them as a bandit: channels are visited in
+    order of normalized yield plus an exploration bonus for the ones we know little about, and the
+    time we wait on a channel after deauthing follows the reconnect latency observed there. Some
+    waits are kept at the maximum anyway, so that a channel that went dry can recover and the
+    latency estimate also sees the stations that take long to reconnect.
+    """
+
+    def __init__(self, config):
+        self._config = config
+        self._options = config['personality']['channel_planner']
+        self._lock = threading.Lock()
+        self._stats = {}
+        # station mac -> (channel, time of the deauth)
+        self._pending = {}
+        self._current = None
+        self._entered_at = 0
+        self._order = []
+        self._random = random.Random()
+
+    def _get(self, channel):
+        stats = self._stats.get(channel)
+        if stats is None:
+            stats = self._stats[channel] = ChannelStats(channel)
+        return stats
+
+    def observe(self, channels):
+        """
+        Updates targets and churn from the (channel, access points) list of this epoch and decays the history.
+        """
+        decay = self._options['decay']
+        with self._lock:
+            for stats in self._stats.values():
+                stats.dwell *= decay
+                stats.handshakes *= decay
+                stats.visits *= decay
+                stats.targets = 0
+
+            for channel, aps in channels:
+                stats = self._get(channel)
+                macs = frozenset(ap['mac'] for ap in aps)
+                if stats.aps:
+                    changed = len(macs.symmetric_difference(stats.aps)) / len(macs | stats.aps)
+                    stats.churn += ALPHA * (changed - stats.churn)
+                stats.aps = macs
+                stats.targets = len(aps)
+
+    def order(self, plans):
+        """
+        Sorts the scheduler plans, channels without targets are already not there.
+        """
+        if not self._options['enabled']:
+            self._order = [plan.channel for plan in plans]
+            return plans
+
+        exploration = self._options['exploration']
+        churn_weight = self._options['churn_weight']
+        with self._lock:
+            best = max([self._get(plan.channel).rate() for plan in plans] + [0.0])
+            total = sum(self._get(plan.channel).visits for plan in plans)
+            for plan in plans:
+                stats = self._get(plan.channel)
+                exploit = stats.rate() / best if best > 0 else 0.0
+                explore = exploration * math.sqrt(math.log(total + 1.0) / (stats.visits + 1.0))
+                stats.score = exploit + explore + churn_weight * stats.churn
+
+            # stable sort, the scheduler order breaks ties
+            plans = sorted(plans, key=lambda plan: self._stats[plan.channel].score, reverse=True)
+            self._order = [plan.channel for plan in plans]
+        return plans
+
+    def dwell(self, channel, did_deauth, did_associate):
+        """
+        How long to wait on the channel before hopping, given what we did there.
+        """
+        personality = self._config['personality']
+        min_wait, max_wait = personality['min_recon_time'], personality['hop_recon_time']
+        if not did_deauth:
+            return min_wait if did_associate else 0
+
+        if not self._options['enabled']:
+            return max_wait
+
+        if self._random.random() < self._options['dwell_exploration']:
+            return max_wait
+
+        with self._lock:
+            stats = self._stats.get(channel)
+            if stats is not None and stats.visits >= MIN_SAMPLES and stats.handshakes < 0.01:
+                # nothing from here in a long while, don't sit on it
+                return min_wait
+            if stats is None or stats.reconnects < MIN_SAMPLES:
+                return max_wait
+            # long enough for most of the deauthed stations to reconnect
+            wait = stats.latency + 2 * stats.latency_dev
+            return min(max(wait, min_wait), max_wait)
+
+    def enter(self, channel, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            self._leave(now)
+            self._current = channel
+            self._entered_at = now
+            self._get(channel).visits += 1
+
+    def leave(self, now=None):
+        with self._lock:
+            self._leave(time.time() if now is None else now)
+
+    def _leave(self, now):
+        if self._current is not None:
+            self._get(self._current).dwell += now - self._entered_at
+            self._current = None
+
+    def on_deauth(self, channel, sta_mac, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            if len(self._pending) >= MAX_PENDING:
+                horizon = now - 3 * self._config['personality']['hop_recon_time']
+                self._pending = {mac: v for mac, v in self._pending.items() if v[1] >= horizon}
+            self._pending[sta_mac.lower()] = (channel, now)
+
+    def on_handshake(self, channel, sta_mac, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            pending = self._pending.pop(sta_mac.lower(), None)
+            if channel is None:
+                channel = pending[0] if pending else self._current
+            if channel is None:
+                return
+
+            stats = self._get(channel)
+            stats.handshakes += 1
+            if pending is not None and pending[0] == channel:
+                latency = now - pending[1]
+                if stats.reconnects == 0:
+                    stats.latency = latency
+                else:
+                    stats.latency_dev += ALPHA * (abs(latency - stats.latency) - stats.latency_dev)
+                    stats.latency += ALPHA * (latency - stats.latency)
+                stats.reconnects += 1
+                logging.debug("channel %d reconnect latency %.1fs (avg %.1fs)" % (channel, latency, stats.latency))
+
+    def data(self):
+        with self._lock:
+            return {
+                'enabled': self._options['enabled'],
+                'current': self._current,
+                'order': list(self._order),
+                'channels': {str(ch): stats.data() for ch, stats in sorted(self._stats.items())}
+            }
@@ -0,0 +1,206 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import struct
+import threading
+import time
+
+# see inotify(7)
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+EVENT_HEADER = struct.Struct('iIII')
+
+POLL_INTERVAL = 5.0
+
+_libc = None
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def _inotify():
+    global _libc
+    if _libc is None:
+        try:
+            _libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            _libc.inotify_init1
+            _libc.inotify_add_watch
+        except (OSError, AttributeError):
+            _libc = False
+    return _libc or None
+
+
+def index(path):
+    """
+    Returns the shared, running index of the given handshakes folder.
+    """
+    path = os.path.normpath(path)
+    with _indexes_lock:
+        if path not in _indexes:
+            _indexes[path] = HandshakeIndex(path).start()
+        return _indexes[path]
+
+
+class HandshakeIndex(object):
+    """
+    Set of the .pcap files in the handshakes folder, built with a single scan and then kept
+    current by inotify or, where that's not available, by polling the folder modification time.
+    """
+
+    def __init__(self, path, poll_interval=POLL_INTERVAL):
+        self.path = path
+        self.poll_interval = poll_interval
+        # 'inotify' or 'poll' once started
+        self.backend = None
+        self._lock = threading.Lock()
+        self._files = set()
+        self._mtime = None
+        self._subscribers = []
+        self._thread = None
+        self.rescan()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._watch, name='handshakes', daemon=True)
+                self._thread.start()
+        return self
+
+    def count(self):
+        return len(self._files)
+
+    def files(self):
+        with self._lock:
+            return list(self._files)
+
+    def paths(self):
+        return [os.path.join(self.path, filename) for filename in self.files()]
+
+    def __contains__(self, filename):
+        return os.path.basename(filename) in self._files
+
+    def subscribe(self, callback):
+        """
+        callback(index, added, removed) is called from the watcher thread with the sets of
+        file names that appeared and disappeared.
+        """
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        self._subscribers.remove(callback)
+
+    def rescan(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+            with os.scandir(self.path) as it:
+                names = set(entry.name for entry in it if entry.name.endswith('.pcap'))
+        except OSError:
+            mtime, names = None, set()
+
+        with self._lock:
+            added = names - self._files
+            removed = self._files - names
+            self._files = names
+            self._mtime = mtime
+        self._notify(added, removed)
+
+    def _apply(self, added, removed):
+        with self._lock:
+            added = added - self._files
+            removed = removed & self._files
+            self._files |= added
+            self._files -= removed
+        self._notify(added, removed)
+
+    def _notify(self, added, removed):
+        if not added and not removed:
+            return
+        for cb in list(self._subscribers):
+            try:
+                cb(self, added, removed)
+            except Exception as e:
+                logging.error("error in handshakes index subscriber %s: %s" % (cb, e))
+                logging.debug(e, exc_info=True)
+
+    def _watch(self):
+        while True:
+            fd = self._add_watch()
+            if fd is not None:
+                self.backend = 'inotify'
+                # catch up with anything that happened before the watch was in place
+                self.rescan()
+                try:
+                    self._read_events(fd)
+                except OSError as e:
+                    logging.warning("inotify on %s failed: %s" % (self.path, e))
+                finally:
+                    os.close(fd)
+            else:
+                if self.backend != 'poll':
+                    logging.debug("polling %s every %.1fs" % (self.path, self.poll_interval))
+                    self.backend = 'poll'
+                time.sleep(self.poll_interval)
+                self._poll()
+
+    def _poll(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime != self._mtime:
+            self.rescan()
+
+    def _add_watch(self):
+        libc = _inotify()
+        if libc is None or not os.path.isdir(self.path):
+            return None
+
+        fd = libc.inotify_init1(IN_CLOEXEC)
+        if fd < 0:
+            return None
+        if libc.inotify_add_watch(fd, os.fsencode(self.path), WATCH_MASK) < 0:
+            os.close(fd)
+            return None
+        return fd
+
+    def _read_events(self, fd):
+        """
+        Applies the events of the watch until the folder itself goes away.
+        """
+        while True:
+            buf = os.read(fd, 65536)
+            added, removed = set(), set()
+            offset = 0
+            gone = False
+            while offset < len(buf):
+                _, mask, _, size = EVENT_HEADER.unpack_from(buf, offset)
+                offset += EVENT_HEADER.size
+                name = os.fsdecode(buf[offset:offset + size].rstrip(b'\0'))
+                offset += size
+
+                if mask & IN_Q_OVERFLOW:
+                    self.rescan()
+                elif mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                    gone = True
+                elif name.endswith('.pcap'):
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        added.add(name)
+                        removed.discard(name)
+                    elif mask & (IN_DELETE | IN_MOVED_FROM):
+                        removed.add(name)
+                        added.discard(name)
+
+            self._apply(added, removed)
+            if gone:
+                self.rescan()
+                return
@@ -0,0 +1,197 @@
+import threading
+import time
+from array import array
+
+# keys are stored with this bit set, so that 0 marks the empty slots
+USED = 1 << 48
+# key, interactions count, last interaction time
+SLOT_BYTES = 8 + 2 + 4
+MAX_COUNT = 0xffff
+MAX_LOAD = 0.75
+# fraction of the slots kept when the table is full and nothing expired
+KEEP_ON_EVICTION = 0.75
+# fibonacci hashing multiplier
+GOLDEN = 0x9e3779b97f4a7c15
+MASK64 = (1 << 64) - 1
+
+
+class InteractionHistory(object):
+    """
+    Interactions count per MAC address (as the 48 bits integers of utils.mac_to_int) in a fixed
+    size open addressing table backed by arrays, sized to stay within max_memory bytes. Entries
+    not touched for ttl seconds expire and, when the table is full, the least recently used ones
+    are evicted in a batch.
+    """
+
+    def __init__(self, max_memory=1 << 20, ttl=86400, clock=None):
+        bits = 3
+        while (1 << (bits + 1)) * SLOT_BYTES <= max_memory:
+            bits += 1
+        self.capacity = 1 << bits
+        self.max_entries = int(self.capacity * MAX_LOAD)
+        self.ttl = ttl
+        # looked up now rather than when the module is imported, for the simulated clock
+        self._clock = time.time if clock is None else clock
+        self._shift = 64 - bits
+        self._mask = self.capacity - 1
+        self._lock = threading.Lock()
+        self._size = 0
+        self._reset_arrays()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._reported = (0, 0, 0, 0)
+
+    def _reset_arrays(self):
+        self._keys = array('Q', [0]) * self.capacity
+        self._counts = array('H', [0]) * self.capacity
+        self._seen = array('I', [0]) * self.capacity
+        self._size = 0
+
+    def memory(self):
+        return self.capacity * SLOT_BYTES
+
+    def __len__(self):
+        return self._size
+
+    def _slot(self, key):
+        tagged = key | USED
+        i = ((key * GOLDEN) & MASK64) >> self._shift
+        keys = self._keys
+        while True:
+            k = keys[i]
+            if k == tagged or k == 0:
+                return i
+            i = (i + 1) & self._mask
+
+    def _expired(self, i, now):
+        return self.ttl > 0 and now - self._seen[i] > self.ttl
+
+    def __getitem__(self, key):
+        with self._lock:
+            i = self._slot(key)
+            if self._keys[i] == 0 or self._expired(i, int(self._clock())):
+                return 0
+            return self._counts[i]
+
+    def lookup(self, key):
+        """
+        Returns the interactions count of key and the seconds since the last one, (0, None) if
+        there's none or they expired.
+        """
+        with self._lock:
+            now = int(self._clock())
+            i = self._slot(key)
+            if self._keys[i] == 0 or self._expired(i, now):
+                return 0, None
+            return self._counts[i], now - self._seen[i]
+
+    def __setitem__(self, key, count):
+        self.set(key, count)
+
+    def set(self, key, count, seen=None):
+        """
+        Sets the interactions count of key and when the last one happened (now by default), used
+        to restore the history after a restart without renewing the TTL of every entry.
+        """
+        with self._lock:
+            now = int(self._clock())
+            seen = now if seen is None else int(seen)
+            if self.ttl > 0 and now - seen > self.ttl:
+                return
+            self._put(key, count, now, seen)
+
+    def incr(self, key):
+        """
+        Counts one more interaction with key and returns its count.
+        """
+        now = int(self._clock())
+        with self._lock:
+            i = self._slot(key)
+            if self._keys[i] != 0:
+                if self._expired(i, now):
+                    self.expirations += 1
+                    self.misses += 1
+                    count = 1
+                else:
+                    self.hits += 1
+                    count = min(self._counts[i] + 1, MAX_COUNT)
+                self._counts[i] = count
+                self._seen[i] = now
+                return count
+
+            self.misses += 1
+            self._put(key, 1, now, now)
+            return 1
+
+    def _put(self, key, count, now, seen):
+        i = self._slot(key)
+        if self._keys[i] == 0:
+            if self._size >= self.max_entries:
+                self._evict(now)
+                i = self._slot(key)
+            self._keys[i] = key | USED
+            self._size += 1
+        self._counts[i] = min(count, MAX_COUNT)
+        self._seen[i] = seen
+
+    def _live(self, now, count_expired=False):
+        live = []
+        for i in range(self.capacity):
+            if self._keys[i] != 0:
+                if self._expired(i, now):
+                    if count_expired:
+                        self.expirations += 1
+                else:
+                    live.append((self._seen[i], self._keys[i] & ~USED, self._counts[i]))
+        return live
+
+    def _evict(self, now):
+        live = self._live(now, count_expired=True)
+        keep = int(self.max_entries * KEEP_ON_EVICTION)
+        if len(live) > keep:
+            # least recently used first
+            live.sort()
+            self.evictions += len(live) - keep
+            live = live[len(live) - keep:]
+
+        self._reset_arrays()
+        for seen, key, count in live:
+            i = self._slot(key)
+            self._keys[i] = key | USED
+            self._counts[i] = count
+            self._seen[i] = seen
+        self._size = len(live)
+
+    def items(self):
+        with self._lock:
+            return [(key, count) for _, key, count in self._live(int(self._clock()))]
+
+    def entries(self):
+        """
+        (key, count, last interaction time) of the live entries.
+        """
+        with self._lock:
+            return [(key, count, seen) for seen, key, count in self._live(int(self._clock()))]
+
+    def clear(self):
+        with self._lock:
+            self._reset_arrays()
+
+    def stats(self):
+        """
+        Size and the hits, misses, evictions and expirations since the previous call.
+        """
+        with self._lock:
+            totals = (self.hits, self.misses, self.evictions, self.expirations)
+            delta = [now - before for now, before in zip(totals, self._reported)]
+            self._reported = totals
+            return {
+                'size': self._size,
+                'capacity': self.max_entries,
+                'hits': delta[0],
+                'misses': delta[1],
+                'evictions': delta[2],
+                'expirations': delta[3]
+            }
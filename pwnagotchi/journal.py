@@ -0,0 +1,138 @@
+import json
+import logging
+import os
+import threading
+import time
+
+
+class Journal(object):
+    """
+    Crash recovery state kept as a JSON snapshot plus an append-only log of the changes made
+    since, one small JSON record per line. Records are flushed and fsync'd in batches to bound
+    the SD card writes, and the log is folded into a new snapshot once it grows too long.
+    Every record carries a sequence number so replaying a log that was not truncated yet after
+    a compaction is harmless.
+    """
+
+    def __init__(self, path, sync_every=32, sync_secs=10.0, compact_every=4096):
+        self.path = path
+        self.log_path = path + '.journal'
+        self.sync_every = sync_every
+        self.sync_secs = sync_secs
+        self.compact_every = compact_every
+        # held by the callers that change the state and log it in one go
+        self.lock = threading.RLock()
+        self._fp = None
+        self._seq = 0
+        self._pending = 0
+        self._synced_at = time.time()
+        # records in the log since the last compaction
+        self.records = 0
+
+    def last_write(self):
+        """
+        Time of the last write to the snapshot or the log, None if there's no recovery data.
+        """
+        times = [os.path.getmtime(p) for p in (self.path, self.log_path) if os.path.exists(p)]
+        return max(times) if times else None
+
+    def load(self):
+        """
+        Returns the snapshot (None if there's none) and the records logged after it.
+        """
+        snapshot = None
+        if os.path.exists(self.path):
+            with open(self.path, 'rt') as fp:
+                snapshot = json.load(fp)
+        since = snapshot.get('seq', 0) if snapshot else 0
+
+        records = []
+        if os.path.exists(self.log_path):
+            good = 0
+            with open(self.log_path, 'rb') as fp:
+                for line in fp:
+                    try:
+                        if not line.endswith(b'\n'):
+                            raise ValueError('incomplete line')
+                        record = json.loads(line)
+                    except ValueError:
+                        # the last write was cut by a power loss, drop it so new records start on a clean line
+                        logging.warning(f"ignoring torn record in {self.log_path}")
+                        os.truncate(self.log_path, good)
+                        break
+                    good += len(line)
+                    if record[0] > since:
+                        records.append(record)
+
+        with self.lock:
+            self._seq = max([since] + [record[0] for record in records])
+            self.records = len(records)
+        return snapshot, records
+
+    def append(self, kind, *values):
+        """
+        Logs a change, returns True when it's time to compact.
+        """
+        with self.lock:
+            self._seq += 1
+            line = json.dumps([self._seq, kind] + list(values), separators=(',', ':'))
+            if self._fp is None:
+                self._fp = open(self.log_path, 'at')
+            self._fp.write(line + '\n')
+            self._pending += 1
+            self.records += 1
+            if self._pending >= self.sync_every or time.time() - self._synced_at >= self.sync_secs:
+                self._sync()
+            return self.records >= self.compact_every
+
+    def sync(self):
+        with self.lock:
+            self._sync()
+
+    def _sync(self):
+        if self._fp is not None and self._pending:
+            self._fp.flush()
+            os.fsync(self._fp.fileno())
+        self._pending = 0
+        self._synced_at = time.time()
+
+    def compact(self, state):
+        """
+        Writes state() as the new snapshot and truncates the log. state is called with the lock
+        held, so no record can be appended between building the snapshot and truncating the log.
+        """
+        with self.lock:
+            state = dict(state())
+            state['seq'] = self._seq
+            tmp = self.path + '.tmp'
+            with open(tmp, 'wt') as fp:
+                json.dump(state, fp)
+                fp.flush()
+                os.fsync(fp.fileno())
+            os.replace(tmp, self.path)
+
+            if self._fp is not None:
+                self._fp.close()
+            self._fp = open(self.log_path, 'wt')
+            self._pending = 0
+            self._synced_at = time.time()
+            self.records = 0
+
+    def clear(self):
+        with self.lock:
+            if self._fp is not None:
+                self._fp.close()
+                self._fp = None
+            for path in (self.path, self.log_path):
+                if os.path.exists(path):
+                    os.unlink(path)
+            self._seq = 0
+            self._pending = 0
+            self.records = 0
+
+    def close(self):
+        with self.lock:
+            self._sync()
+            if self._fp is not None:
+                self._fp.close()
+                self._fp = None
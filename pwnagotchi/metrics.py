@@ -0,0 +1,168 @@
+import math
+import threading
+import time
+
+# request latencies, from 1ms to 10s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _number(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+class Metric(object):
+    kind = 'unknown'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        # label values tuple -> value
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labels)
+
+    def _labels(self, key, extra=None):
+        pairs = ['%s="%s"' % (name, _escape(value)) for name, value in zip(self.labels, key)]
+        if extra is not None:
+            pairs.append('%s="%s"' % extra)
+        return '{%s}' % ','.join(pairs) if pairs else ''
+
+    def samples(self):
+        return []
+
+    def render(self):
+        lines = ['# TYPE %s %s' % (self.name, self.kind), '# HELP %s %s' % (self.name, _escape(self.documentation))]
+        with self._lock:
+            lines += self.samples()
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        return ['%s_total%s %s' % (self.name, self._labels(key), _number(value)) for key, value in self._values.items()]
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self):
+        return ['%s%s %s' % (self.name, self._labels(key), _number(value)) for key, value in self._values.items()]
+
+
+class _HistogramTimer(object):
+    __slots__ = ('histogram', 'labels', 'started')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.monotonic()
+        return self
+
+    def __exit__(self, *unused):
+        self.histogram.observe(time.monotonic() - self.started, **self.labels)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super(Histogram, self).__init__(name, documentation, labels)
+        self.buckets = tuple(buckets) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += 1
+            state[2] += value
+
+    def time(self, **labels):
+        return _HistogramTimer(self, labels)
+
+    def samples(self):
+        lines = []
+        for key, (counts, count, total) in self._values.items():
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append('%s_bucket%s %d' % (self.name, self._labels(key, ('le', _number(bound))), cumulative))
+            lines.append('%s_count%s %d' % (self.name, self._labels(key), count))
+            lines.append('%s_sum%s %s' % (self.name, self._labels(key), _number(total)))
+        return lines
+
+
+class Registry(object):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric):
+                    raise ValueError("metric %s already registered as a %s" % (metric.name, existing.kind))
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def render(self):
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            lines += metric.render()
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def counter(name, documentation, labels=()):
+    return REGISTRY.register(Counter(name, documentation, labels))
+
+
+def gauge(name, documentation, labels=()):
+    return REGISTRY.register(Gauge(name, documentation, labels))
+
+
+def histogram(name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+    return REGISTRY.register(Histogram(name, documentation, labels, buckets))
+
+
+def render():
+    return REGISTRY.render()
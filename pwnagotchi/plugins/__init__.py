@@ -5,12 +5,17 @@ import threading
 import importlib, importlib.util
 import logging
 
-
+import pwnagotchi.metrics as metrics
 
 default_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), "default")
 loaded = {}
 database = {}
 locks = {}
+# when set (asyncio runtime), callbacks run on this executor instead of a new thread each
+executor = None
+
+CALLBACK_LATENCY = metrics.histogram('pwnagotchi_plugin_callback_seconds',
+                                     'Time spent in the plugins callbacks.', ['plugin', 'callback'])
 
 
 class Plugin:
@@ -82,7 +87,9 @@ def locked_cb(lock_name, cb, *args, **kwargs):
         locks[lock_name] = threading.Lock()
 
     with locks[lock_name]:
-        cb(*args, *kwargs)
+        plugin_name, _, cb_name = lock_name.partition('::')
+        with CALLBACK_LATENCY.time(plugin=plugin_name, callback=cb_name):
+            cb(*args, *kwargs)
 
 
 def one(plugin_name, event_name, *args, **kwargs):
@@ -96,7 +103,10 @@ def one(plugin_name, event_name, *args, **kwargs):
             try:
                 lock_name = "%s::%s" % (plugin_name, cb_name)
                 locked_cb_args = (lock_name, callback, *args, *kwargs)
-                _thread.start_new_thread(locked_cb, locked_cb_args)
+                if executor is not None:
+                    executor.submit(locked_cb, *locked_cb_args)
+                else:
+                    _thread.start_new_thread(locked_cb, locked_cb_args)
             except Exception as e:
                 logging.error("error while running %s.%s : %s" % (plugin_name, cb_name, e))
                 logging.error(e, exc_info=True)
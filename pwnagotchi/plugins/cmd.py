@@ -14,11 +14,10 @@ SAVE_DIR = '/usr/local/share/pwnagotchi/available-plugins/'
 DEFAULT_INSTALL_PATH = '/usr/local/share/pwnagotchi/installed-plugins/'
 
 
-def add_parsers(parser):
+def add_parsers(subparsers):
     """
-    Adds the plugins subcommand to a given argparse.ArgumentParser
+    Adds the plugins subcommand to the subparsers of the main argparse.ArgumentParser
     """
-    subparsers = parser.add_subparsers()
     ## pwnagotchi plugins
     parser_plugins = subparsers.add_parser('plugins')
     plugin_subparsers = parser_plugins.add_subparsers(dest='plugincmd')
@@ -58,7 +57,7 @@ def add_parsers(parser):
     parser_plugins_edit = plugin_subparsers.add_parser('edit', help='Edit the options')
     parser_plugins_edit.add_argument('name', type=str, help='Name of the plugin')
 
-    return parser
+    return subparsers
 
 
 def used_plugin_cmd(args):
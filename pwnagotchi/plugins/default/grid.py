@@ -1,4 +1,3 @@
-import glob
 import logging
 import os
 import re
@@ -6,6 +5,7 @@ from threading import Lock
 import time
 
 import pwnagotchi.grid as grid
+import pwnagotchi.handshakes as handshakes
 import pwnagotchi.plugins as plugins
 from pwnagotchi.utils import StatusFile, WifiInfo, extract_from_pcap
 
@@ -87,7 +87,7 @@ class Grid(plugins.Plugin):
     def check_handshakes(self, agent):
         logging.debug("[grid] Checking pcaps...")
 
-        pcap_files = glob.glob(os.path.join(agent.config()['bettercap']['handshakes'], "*.pcap"))
+        pcap_files = handshakes.index(agent.config()['bettercap']['handshakes']).paths()
         num_networks = len(pcap_files)
         reported = self.report.data_field_or('reported', default=[])
         num_reported = len(reported)
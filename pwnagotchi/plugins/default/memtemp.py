@@ -16,6 +16,8 @@
 # - Added CPU load
 # - Added horizontal and vertical orientation
 #
+# - Reads the samples of pwnagotchi.sysmon instead of sleeping on /proc/stat at every update
+#
 ###############################################################
 import logging
 
@@ -23,7 +25,7 @@ from pwnagotchi.ui.components import LabeledValue
 from pwnagotchi.ui.view import BLACK
 import pwnagotchi.ui.fonts as fonts
 import pwnagotchi.plugins as plugins
-import pwnagotchi
+import pwnagotchi.sysmon as sysmon
 
 
 class MemTemp(plugins.Plugin):
@@ -35,11 +37,11 @@ class MemTemp(plugins.Plugin):
     def on_loaded(self):
         logging.info("[memtemp] Plugin loaded.")
 
-    def mem_usage(self):
-        return int(pwnagotchi.mem_usage() * 100)
+    def mem_usage(self, sample):
+        return int(sample['mem_usage'] * 100)
 
-    def cpu_load(self):
-        return int(pwnagotchi.cpu_load() * 100)
+    def cpu_load(self, sample):
+        return int(sample['cpu_load'] * 100)
 
     def on_ui_setup(self, ui):
         if ui.is_waveshare_v2():
@@ -76,21 +78,22 @@ class MemTemp(plugins.Plugin):
             ui.remove_element('memtemp')
 
     def on_ui_update(self, ui):
+        sample = sysmon.latest()
         if self.options['scale'] == "fahrenheit":
-            temp = (pwnagotchi.temperature() * 9 / 5) + 32
+            temp = (sample['temperature'] * 9 / 5) + 32
             symbol = "f"
         elif self.options['scale'] == "kelvin":
-            temp = pwnagotchi.temperature() + 273.15
+            temp = sample['temperature'] + 273.15
             symbol = "k"
         else:
             # default to celsius
-            temp = pwnagotchi.temperature()
+            temp = sample['temperature']
             symbol = "c"
 
         if self.options['orientation'] == "vertical":
             ui.set('memtemp',
-                   f" mem:{self.mem_usage()}%\n cpu:{self.cpu_load()}%\ntemp:{temp}{symbol}")
+                   f" mem:{self.mem_usage(sample)}%\n cpu:{self.cpu_load(sample)}%\ntemp:{temp}{symbol}")
         else:
             # default to horizontal
             ui.set('memtemp',
-                   f" mem cpu  temp\n {self.mem_usage()}% {self.cpu_load()}%  {temp}{symbol}")
+                   f" mem cpu  temp\n {self.mem_usage(sample)}% {self.cpu_load(sample)}%  {temp}{symbol}")
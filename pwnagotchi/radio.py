@@ -0,0 +1,155 @@
+import threading
+import time
+
+
+class RadioModel(object):
+    """
+    In memory view of the access points and client stations bettercap is seeing, keyed by MAC
+    address, kept up to date by the wifi.ap.* and wifi.client.* websocket events and reconciled
+    from time to time with a full /api/session snapshot. bettercap sends no event when only the
+    signal of an access point changes, its rssi is as old as the last event or reconcile about it.
+    """
+
+    TAGS = ('wifi.ap.new', 'wifi.ap.lost', 'wifi.client.new', 'wifi.client.lost')
+
+    def __init__(self, reconcile_secs=30):
+        self.reconcile_secs = reconcile_secs
+        self._lock = threading.Lock()
+        # ap mac -> access point as received from bettercap, without clients
+        self._aps = {}
+        # ap mac -> {station mac -> station}
+        self._clients = {}
+        # station mac -> ap mac
+        self._stations = {}
+        # ap mac -> materialized access point with its 'clients' list, rebuilt only when changed
+        self._views = {}
+        # list of materialized access points, None when something changed
+        self._list = None
+        # increases on every change of the model
+        self.version = 0
+        self.reconciled_at = 0
+        self.reconciled_generation = None
+        # events received while a snapshot is being fetched, replayed on top of it, None if not fetching
+        self._replay = None
+
+    def needs_reconcile(self):
+        return time.time() - self.reconciled_at >= self.reconcile_secs
+
+    def begin_reconcile(self):
+        """
+        Called before fetching the snapshot to reconcile with, the events received from now on
+        are replayed on top of it.
+        """
+        with self._lock:
+            self._replay = []
+
+    def end_reconcile(self):
+        with self._lock:
+            self._replay = None
+
+    def reconcile(self, snapshot):
+        with self._lock:
+            self._aps = {}
+            self._clients = {}
+            self._stations = {}
+            self._views = {}
+            for ap in snapshot.data['wifi']['aps']:
+                self._add_ap(ap)
+            for tag, data in self._replay or ():
+                self._apply(tag, data)
+            self._replay = None
+            self._changed()
+            self.reconciled_at = time.time()
+            self.reconciled_generation = snapshot.generation
+
+    def on_event(self, tag, data):
+        with self._lock:
+            if self._apply(tag, data):
+                if self._replay is not None:
+                    self._replay.append((tag, data))
+                self._changed()
+
+    def _apply(self, tag, data):
+        if tag == 'wifi.ap.new':
+            self._add_ap(data)
+        elif tag == 'wifi.ap.lost':
+            self._del_ap(data['mac'].lower())
+        elif tag == 'wifi.client.new':
+            # the access point as bettercap sees it now, signal and encryption included
+            self._update_ap(data['AP'])
+            self._add_sta(data['AP']['mac'].lower(), data['Client'])
+        elif tag == 'wifi.client.lost':
+            self._update_ap(data['AP'])
+            self._del_sta(data['Client']['mac'].lower())
+        else:
+            return False
+        return True
+
+    def access_points(self):
+        with self._lock:
+            if self._list is None:
+                self._list = [self._view(mac) for mac in self._aps]
+            return self._list
+
+    def find(self, station_mac, ap_mac):
+        with self._lock:
+            ap_mac = ap_mac.lower()
+            if ap_mac not in self._aps:
+                return None
+            sta = self._clients[ap_mac].get(station_mac.lower(), {'mac': station_mac, 'vendor': ''})
+            return self._view(ap_mac), sta
+
+    def _view(self, mac):
+        view = self._views.get(mac)
+        if view is None:
+            view = dict(self._aps[mac])
+            view['clients'] = list(self._clients[mac].values())
+            self._views[mac] = view
+        return view
+
+    def _changed(self):
+        self.version += 1
+        self._list = None
+
+    def _add_ap(self, ap):
+        mac = ap['mac'].lower()
+        clients = ap.get('clients') or []
+        ap = {k: v for k, v in ap.items() if k != 'clients'}
+        self._aps[mac] = ap
+        self._views.pop(mac, None)
+        if mac not in self._clients:
+            self._clients[mac] = {}
+        for sta in clients:
+            self._add_sta(mac, sta)
+
+    def _update_ap(self, ap):
+        mac = ap['mac'].lower()
+        if mac not in self._aps:
+            self._add_ap(ap)
+            return
+        self._aps[mac].update((k, v) for k, v in ap.items() if k != 'clients')
+        self._views.pop(mac, None)
+
+    def _del_ap(self, mac):
+        if mac in self._aps:
+            for sta_mac in self._clients[mac]:
+                self._stations.pop(sta_mac, None)
+            del self._aps[mac]
+            del self._clients[mac]
+            self._views.pop(mac, None)
+
+    def _add_sta(self, ap_mac, sta):
+        sta_mac = sta['mac'].lower()
+        prev_ap = self._stations.get(sta_mac)
+        if prev_ap is not None and prev_ap != ap_mac:
+            # the station roamed to another access point
+            self._del_sta(sta_mac)
+        self._stations[sta_mac] = ap_mac
+        self._clients[ap_mac][sta_mac] = sta
+        self._views.pop(ap_mac, None)
+
+    def _del_sta(self, sta_mac):
+        ap_mac = self._stations.pop(sta_mac, None)
+        if ap_mac is not None and ap_mac in self._clients:
+            self._clients[ap_mac].pop(sta_mac, None)
+            self._views.pop(ap_mac, None)
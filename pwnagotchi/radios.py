@@ -0,0 +1,96 @@
+import queue
+import threading
+
+COUNTERS = ('hops', 'associations', 'deauths', 'handshakes', 'skipped')
+
+
+class TargetIndex(object):
+    """
+    Access points being attacked right now and by which radio, shared by all of them so that
+    two radios never go after the same BSSID at once.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._busy = {}
+
+    def claim(self, bssid, radio):
+        bssid = bssid.lower()
+        with self._lock:
+            owner = self._busy.get(bssid)
+            if owner is not None and owner != radio:
+                return False
+            self._busy[bssid] = radio
+            return True
+
+    def release(self, bssid, radio):
+        bssid = bssid.lower()
+        with self._lock:
+            if self._busy.get(bssid) == radio:
+                del self._busy[bssid]
+
+
+class Radio(object):
+    """
+    A monitor interface and the bettercap instance driving it. The primary radio is the agent
+    itself, the extra ones execute the channel plans they're given on their own worker thread.
+    """
+
+    def __init__(self, iface, client, supported_channels, primary=False):
+        self.name = iface
+        self.client = client
+        self.supported_channels = set(supported_channels)
+        self.primary = primary
+        self.channel = 0
+        self.did_deauth = False
+        self.did_associate = False
+        # extra radios take plans only once their bettercap is set up
+        self.ready = primary
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(COUNTERS, 0)
+        self._plans = queue.Queue()
+
+    def supports(self, channel):
+        # an empty list means we couldn't tell, assume it can
+        return not self.supported_channels or channel in self.supported_channels
+
+    def count(self, counter, inc=1):
+        with self._lock:
+            self._counters[counter] += inc
+
+    def counters(self, reset=False):
+        with self._lock:
+            counters = dict(self._counters)
+            if reset:
+                self._counters = dict.fromkeys(COUNTERS, 0)
+        return counters
+
+    def hopped(self, channel):
+        self.channel = channel
+        self.did_deauth = False
+        self.did_associate = False
+        self.count('hops')
+
+    def submit(self, plans):
+        self._plans.put(plans)
+
+    def next_plans(self):
+        return self._plans.get()
+
+    def done(self):
+        self._plans.task_done()
+
+    def wait(self):
+        """
+        Blocks until the submitted plans have been executed.
+        """
+        self._plans.join()
+
+    def data(self):
+        return {
+            'iface': self.name,
+            'primary': self.primary,
+            'ready': self.ready,
+            'channel': self.channel,
+            'counters': self.counters()
+        }
@@ -0,0 +1,94 @@
+import asyncio
+import atexit
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Runtime(object):
+    """
+    A single asyncio event loop running on its own thread, hosting the periodic tasks
+    of the agent (stats tick, peers polling), the bettercap websocket consumer and, through
+    a bounded executor, the blocking work that would otherwise get its own thread.
+    """
+
+    def __init__(self, workers=4, plugin_workers=4):
+        self.loop = asyncio.new_event_loop()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='runtime')
+        # plugin callbacks get their own pool so a slow plugin can't starve the agent tasks
+        self.plugins_executor = ThreadPoolExecutor(max_workers=plugin_workers, thread_name_prefix='plugins')
+        self.loop.set_default_executor(self.executor)
+        self._thread = None
+        # coroutine functions releasing what lives on the loop, awaited by stop()
+        self._closers = []
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='runtime', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def on_stop(self, closer):
+        self._closers.append(closer)
+
+    def stop(self, timeout=5.0):
+        """
+        Awaits the closers, then stops the loop and the executors.
+        """
+        if self._thread is None:
+            return
+
+        for closer in self._closers:
+            try:
+                self.spawn(closer()).result(timeout)
+            except Exception as e:
+                logging.debug("error while stopping the runtime: %s" % e)
+
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+        self._thread = None
+        self.executor.shutdown(wait=False)
+        self.plugins_executor.shutdown(wait=False)
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def spawn(self, coro):
+        """
+        Schedules a coroutine on the loop, can be called from any thread.
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run_blocking(self, fn, *args):
+        """
+        Runs fn(*args) on the executor and returns an awaitable for its result.
+        """
+        return self.loop.run_in_executor(None, fn, *args)
+
+    def every(self, interval, callback, initial_delay=0.0, blocking=False):
+        """
+        Calls callback every interval seconds, measured from the start of the previous call. Blocking
+        callbacks run on the executor, the others on the loop itself and may be coroutine functions.
+        """
+        return self.spawn(self._ticker(interval, callback, initial_delay, blocking))
+
+    async def _ticker(self, interval, callback, initial_delay, blocking):
+        if initial_delay > 0:
+            await asyncio.sleep(initial_delay)
+
+        while True:
+            started = self.loop.time()
+            try:
+                if blocking:
+                    await self.run_blocking(callback)
+                else:
+                    result = callback()
+                    if asyncio.iscoroutine(result):
+                        await result
+            except Exception as e:
+                logging.error("error in periodic task %s: %s" % (getattr(callback, '__name__', callback), e))
+                logging.debug(e, exc_info=True)
+
+            elapsed = self.loop.time() - started
+            await asyncio.sleep(max(0.0, interval - elapsed))
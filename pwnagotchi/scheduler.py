@@ -0,0 +1,208 @@
+import logging
+import math
+import threading
+
+import pwnagotchi.utils as utils
+
+ASSOC = 'assoc'
+DEAUTH = 'deauth'
+
+# what an action is assumed to cost, in seconds, before we measured it
+DEFAULT_ACTION_COST = 0.1
+# weight of the last measure in the action cost moving average
+COST_ALPHA = 0.2
+# signal range the rssi score is normalized on
+RSSI_FLOOR = -100
+RSSI_CEIL = -30
+
+SCHEDULERS = {}
+
+
+def register(name, cls):
+    """
+    Makes a scheduler class available as personality.scheduler.name, plugins can call this from on_loaded.
+    """
+    SCHEDULERS[name] = cls
+
+
+def load(config):
+    name = config['personality']['scheduler']['name']
+    if name not in SCHEDULERS:
+        logging.warning("unknown scheduler '%s', using 'sequential'" % name)
+        name = 'sequential'
+    logging.debug("using the '%s' scheduler" % name)
+    return SCHEDULERS[name](config)
+
+
+class Action(object):
+    __slots__ = ('kind', 'ap', 'sta', 'score')
+
+    def __init__(self, kind, ap, sta=None, score=0.0):
+        self.kind = kind
+        self.ap = ap
+        self.sta = sta
+        self.score = score
+
+    @property
+    def target(self):
+        return self.ap if self.sta is None else self.sta
+
+    def __repr__(self):
+        return "%s(%s, %.3f)" % (self.kind, self.target['mac'], self.score)
+
+
+class ChannelPlan(object):
+    def __init__(self, channel, aps, actions, budget=0):
+        self.channel = channel
+        self.aps = aps
+        self.actions = actions
+        # seconds we can spend on this channel, 0 for no limit
+        self.budget = budget
+
+    def score(self):
+        return sum(action.score for action in self.actions)
+
+
+class Scheduler(object):
+    """
+    Attacks every access point and client station of every channel, in the order they're listed.
+    """
+
+    def __init__(self, config):
+        self._config = config
+        self._options = config['personality']['scheduler']
+        self.stats = {}
+
+    def plan(self, channels, pwned=None, history=None):
+        """
+        Turns the (channel, access points) list of get_access_points_by_channel into the list
+        of ChannelPlan to execute, pwned(mac) tells if we already have a handshake for a MAC and
+        history is the InteractionHistory of the agent.
+        """
+        plans = []
+        for channel, aps in channels:
+            actions = []
+            for ap in aps:
+                actions.append(Action(ASSOC, ap))
+                for sta in ap['clients']:
+                    actions.append(Action(DEAUTH, ap, sta))
+            plans.append(ChannelPlan(channel, aps, actions))
+        return plans
+
+    def attempted(self, action, elapsed):
+        pass
+
+
+class PriorityScheduler(Scheduler):
+    """
+    Ranks the targets of each channel by signal strength, client activity, time since the last
+    attempt and past failures, prunes the ones we already pwned, the ones out of range and the ones
+    in cooldown, and keeps on each channel only what fits in its time budget. Channels with the
+    most valuable plans go first and the ones with nothing to do are skipped.
+    """
+
+    def __init__(self, config):
+        super(PriorityScheduler, self).__init__(config)
+        self._costs = {ASSOC: DEFAULT_ACTION_COST, DEAUTH: DEFAULT_ACTION_COST}
+        # the extra radios report their attempts from their own threads
+        self._lock = threading.Lock()
+
+    def score(self, target, num_clients, attempts=0, since=None):
+        """
+        Returns how much attacking the target is worth, or None if it shouldn't be attacked now.
+        attempts and since (seconds since the last one) come from the interaction history.
+        """
+        personality = self._config['personality']
+        if attempts >= personality['max_interactions']:
+            self.stats['exhausted'] += 1
+            return None
+
+        cooldown = self._options['cooldown']
+        if attempts and since < cooldown:
+            self.stats['cooling'] += 1
+            return None
+
+        weights = self._options['weights']
+        rssi = (target.get('rssi', RSSI_FLOOR) - RSSI_FLOOR) / (RSSI_CEIL - RSSI_FLOOR)
+        clients = math.log1p(num_clients) / math.log1p(32)
+        activity = math.log1p(target.get('sent', 0) + target.get('received', 0)) / math.log1p(100000)
+        freshness = 1.0 if not attempts else since / (since + cooldown + 1.0)
+        failures = attempts / personality['max_interactions']
+
+        return weights['rssi'] * min(max(rssi, 0.0), 1.0) + \
+               weights['clients'] * min(clients, 1.0) + \
+               weights['activity'] * min(activity, 1.0) + \
+               weights['freshness'] * freshness - \
+               weights['failures'] * failures
+
+    def _lookup(self, history, target):
+        if history is None:
+            return 0, None
+        try:
+            return history.lookup(utils.mac_to_int(target['mac']))
+        except ValueError:
+            return 0, None
+
+    def plan(self, channels, pwned=None, history=None):
+        personality = self._config['personality']
+        min_rssi = personality['min_rssi']
+        budget = self._options['channel_budget']
+        self.stats = {'pwned': 0, 'out_of_range': 0, 'exhausted': 0, 'cooling': 0, 'over_budget': 0, 'planned': 0}
+
+        plans = []
+        for channel, aps in channels:
+            candidates = []
+            for ap in aps:
+                if ap['rssi'] < min_rssi:
+                    self.stats['out_of_range'] += 1
+                    continue
+                if pwned is not None and pwned(ap['mac']):
+                    self.stats['pwned'] += 1
+                    continue
+
+                num_clients = len(ap['clients'])
+                if personality['associate']:
+                    score = self.score(ap, num_clients, *self._lookup(history, ap))
+                    if score is not None:
+                        candidates.append(Action(ASSOC, ap, None, score))
+
+                if personality['deauth']:
+                    for sta in ap['clients']:
+                        if sta.get('rssi', 0) < min_rssi:
+                            self.stats['out_of_range'] += 1
+                            continue
+                        if pwned is not None and pwned(sta['mac']):
+                            self.stats['pwned'] += 1
+                            continue
+                        score = self.score(sta, num_clients, *self._lookup(history, sta))
+                        if score is not None:
+                            candidates.append(Action(DEAUTH, ap, sta, score))
+
+            candidates.sort(key=lambda action: action.score, reverse=True)
+            if budget > 0:
+                actions = []
+                spent = 0.0
+                for action in candidates:
+                    spent += self._costs[action.kind]
+                    if spent > budget:
+                        self.stats['over_budget'] += len(candidates) - len(actions)
+                        break
+                    actions.append(action)
+            else:
+                actions = candidates
+
+            if actions:
+                self.stats['planned'] += len(actions)
+                plans.append(ChannelPlan(channel, aps, actions, budget))
+
+        plans.sort(key=lambda plan: plan.score(), reverse=True)
+        return plans
+
+    def attempted(self, action, elapsed):
+        # the attempts themselves are counted by the interaction history of the agent
+        with self._lock:
+            self._costs[action.kind] += COST_ALPHA * (elapsed - self._costs[action.kind])
+
+
+register('sequential', Scheduler)
+register('priority', PriorityScheduler)
@@ -0,0 +1,251 @@
+"""
+Runs the real agent loop against a synthetic scenario with a virtual clock, so that a whole day
+of activity replays in seconds:
+
+    pwnagotchi --simulate pwnagotchi/sim/example.toml --sim-hours 24
+
+the agent talks to the scenario in process instead of bettercap, and every sleep of the main
+loop (recon, channel hops, throttles, View.wait ...) advances the simulated time instead.
+"""
+import copy
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+
+import pwnagotchi.sim.scenario as scenario
+from pwnagotchi.agent import Agent
+from pwnagotchi.journal import Journal
+
+
+class SimulationOver(BaseException):
+    """
+    Raised by the virtual clock when the simulated time is up, it's not an Exception so that
+    it gets through the error handling of the main loop.
+    """
+    pass
+
+
+class VirtualClock(object):
+    """
+    Simulated time. Once installed, sleeps on the simulation thread return immediately after
+    moving the clock forward, while the other threads keep sleeping for real. time.time is
+    replaced for the whole process, so install it before building anything that keeps a
+    reference to it (the agent and its history); time.monotonic is left alone, it's only used
+    to measure how long things take.
+    """
+
+    def __init__(self, start, duration):
+        self.started = start
+        self.now = start
+        self.end = start + duration
+        self._listeners = []
+        self._thread = None
+        self._installed = False
+        self._real_time = time.time
+        self._real_sleep = time.sleep
+
+    def on_advance(self, cb):
+        self._listeners.append(cb)
+
+    def time(self):
+        return self.now
+
+    def elapsed(self):
+        return self.now - self.started
+
+    def advance(self, secs):
+        if secs > 0:
+            self.now += secs
+        for cb in self._listeners:
+            cb()
+        if self.now >= self.end:
+            raise SimulationOver()
+
+    def sleep(self, secs):
+        if threading.get_ident() != self._thread:
+            return self._real_sleep(secs)
+        self.advance(secs)
+
+    def install(self):
+        self._thread = threading.get_ident()
+        self._real_time, self._real_sleep = time.time, time.sleep
+        time.time, time.sleep = self.time, self.sleep
+        self._installed = True
+
+    def installed(self):
+        return self._installed
+
+    def uninstall(self):
+        if self._installed:
+            time.time, time.sleep = self._real_time, self._real_sleep
+            self._installed = False
+
+
+class Identity(object):
+    """
+    Stands for the unit keypair, the simulated agent never talks to the grid nor to other units.
+    """
+
+    def __init__(self, seed):
+        self.fingerprint = hashlib.sha256(('pwnagotchi-sim-%s' % seed).encode()).hexdigest()
+
+
+class SimulatedAgent(Agent):
+    def __init__(self, view, config, simulation):
+        self._simulation = simulation
+        Agent.__init__(self, view, config, Identity(simulation.scenario.options['seed']))
+
+        channels = simulation.scenario.options['channels']
+        self._supported_channels = list(channels)
+        self._radios[0].supported_channels = set(channels)
+        self._journal = Journal(os.path.join(simulation.workdir, 'recovery'),
+                                config['main']['recovery']['sync_every'],
+                                config['main']['recovery']['sync_secs'],
+                                config['main']['recovery']['compact_every'])
+        simulation.scenario.on_event(self._on_scenario_event)
+
+    def _fetch_session(self):
+        return copy.deepcopy(self._simulation.scenario.session())
+
+    def run(self, command, verbose_errors=True):
+        self._simulation.clock.advance(self._simulation.scenario.options['command_latency'])
+        return self._simulation.scenario.run(command)
+
+    def _on_scenario_event(self, event):
+        # handlers run right away on the simulation thread, so that runs are deterministic
+        self.events.dispatch(json.dumps(event), inline=True)
+
+    def _on_handshake(self, jmsg, radio=None):
+        before = len(self._handshakes)
+        Agent._on_handshake(self, jmsg, radio)
+        if len(self._handshakes) > before:
+            self._simulation.handshake()
+
+    def _reboot(self):
+        logging.warning("[sim] the agent asked for a reboot, ignoring")
+
+    def start(self):
+        # same as Agent.start, minus the AI and the background threads
+        self.setup_events()
+        self.set_starting()
+        self.start_monitor_mode()
+        self.next_epoch()
+        self.set_ready()
+
+    def next_epoch(self):
+        Agent.next_epoch(self)
+        self._update_counters()
+        self._simulation.epoch(self._epoch.epoch - 1, self._epoch.data())
+
+
+class Simulation(object):
+    """
+    Owns the virtual clock, the scenario and the working directory (handshakes, recovery data
+    and logs) of an offline run, and collects the handshakes and epochs for the report.
+    """
+
+    def __init__(self, path, config, hours=24.0):
+        self.workdir = tempfile.mkdtemp(prefix='pwnagotchi-sim-')
+        self.config = self._configure(config)
+        self.clock = VirtualClock(time.time(), hours * 3600.0)
+        # the clock stops a little past the end, the report covers the requested hours only
+        self.hours = max(1, int(math.ceil(hours)))
+        self.scenario = scenario.load(path, {
+            'iface': self.config['main']['iface'],
+            'handshakes': self.config['bettercap']['handshakes']
+        }, clock=self.clock.time)
+        self.clock.on_advance(self.scenario.tick)
+        self._handshakes = []
+        self._epochs = []
+        self._wall_started = None
+        self._wall_elapsed = 0.0
+        random.seed(self.scenario.options['seed'])
+
+    def _configure(self, config):
+        config = copy.deepcopy(config)
+        config['main']['runtime'] = 'threads'
+        config['main']['radios'] = []
+        config['main']['log']['path'] = os.path.join(self.workdir, 'pwnagotchi.log')
+        config['main']['log']['rotation']['enabled'] = False
+        config['bettercap']['handshakes'] = os.path.join(self.workdir, 'handshakes')
+        config['ai']['enabled'] = False
+        config['personality']['advertise'] = False
+        config['ui']['fps'] = 0.0
+        config['ui']['web']['enabled'] = False
+        config['ui']['display']['enabled'] = False
+        return config
+
+    def agent(self, view):
+        if not self.clock.installed():
+            raise RuntimeError("the simulation must be started before building the agent")
+        return SimulatedAgent(view, self.config, self)
+
+    def start(self):
+        # before the agent is built, see VirtualClock
+        self._wall_started = time.time()
+        self.clock.install()
+
+    def stop(self):
+        self.clock.uninstall()
+        self._wall_elapsed = time.time() - self._wall_started
+
+    def handshake(self):
+        self._handshakes.append(self.clock.elapsed())
+
+    def epoch(self, num, data):
+        self._epochs.append({
+            'epoch': num,
+            'at': self.clock.elapsed(),
+            'duration': data['duration_secs'],
+            'reward': data['reward'],
+            'handshakes': data['num_handshakes'],
+            'deauths': data['num_deauths'],
+            'associations': data['num_associations'],
+            'hops': data['num_hops'],
+            'inactive_for': data['inactive_for_epochs']
+        })
+
+    def report(self):
+        hours = self.hours
+        per_hour = [0] * hours
+        for at in self._handshakes:
+            per_hour[min(int(at // 3600), hours - 1)] += 1
+
+        rewards = [[] for _ in range(hours)]
+        for epoch in self._epochs:
+            rewards[min(int(epoch['at'] // 3600), hours - 1)].append(epoch['reward'])
+
+        return {
+            'scenario': self.scenario.options,
+            'simulated_secs': self.clock.elapsed(),
+            'wall_secs': self._wall_elapsed,
+            'epochs': len(self._epochs),
+            'handshakes': len(self._handshakes),
+            'handshakes_per_hour': per_hour,
+            'reward_per_hour': [sum(r) / len(r) if r else None for r in rewards],
+            'scenario_stats': dict(self.scenario.stats),
+            'epoch_log': self._epochs
+        }
+
+
+def format_report(report):
+    lines = [
+        "simulated %.1fh in %.1fs: %d epochs, %d handshakes (%.2f/h), scenario %s" % (
+            report['simulated_secs'] / 3600.0,
+            report['wall_secs'],
+            report['epochs'],
+            report['handshakes'],
+            report['handshakes'] / max(report['simulated_secs'] / 3600.0, 1e-9),
+            ' '.join('%s=%d' % kv for kv in sorted(report['scenario_stats'].items()))),
+        "",
+        "hour  handshakes  avg reward"
+    ]
+    for hour, (shakes, reward) in enumerate(zip(report['handshakes_per_hour'], report['reward_per_hour'])):
+        lines.append("%4d  %10d  %10s" % (hour, shakes, '-' if reward is None else '%.3f' % reward))
+    return '\n'.join(lines)
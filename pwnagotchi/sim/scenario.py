@@ -0,0 +1,303 @@
+import heapq
+import logging
+import os
+import random
+import struct
+import threading
+import time
+from datetime import datetime
+
+import toml
+
+# https://www.metageek.com/training/resources/why-channels-1-6-11.html
+NON_OVERLAPPING = (1, 6, 11)
+
+VENDORS = ('Apple', 'Samsung Electronics', 'TP-LINK TECHNOLOGIES', 'NETGEAR', 'Intel Corporate',
+           'Huawei Technologies', 'AVM GmbH', 'Ubiquiti Networks', 'Xiaomi Communications', '')
+
+DEFAULTS = {
+    'seed': 0,
+    # number of access points and client stations around
+    'aps': 100,
+    'clients': 300,
+    'channels': list(range(1, 14)),
+    # 0.0 = every access point on 1, 6 or 11, 1.0 = evenly spread over all channels
+    'channel_spread': 0.5,
+    'min_rssi': -95,
+    'max_rssi': -30,
+    # fraction of open networks
+    'open_ratio': 0.1,
+    # chance that a deauthed station reconnects with a full handshake we can sniff
+    'handshake_probability': 0.3,
+    # chance that an association yields a PMKID
+    'pmkid_probability': 0.1,
+    # how long a deauthed station takes to reconnect, in seconds
+    'reconnect_min': 1.0,
+    'reconnect_max': 8.0,
+    # access points that go out of range (and new ones showing up) per minute
+    'churn_per_minute': 0.0,
+    # simulated time every bettercap command takes when running offline (pwnagotchi --simulate)
+    'command_latency': 0.05,
+    'iface': 'mon0',
+    'handshakes': '/tmp/pwnagotchi-sim/handshakes',
+}
+
+# empty pcap file with radiotap link type
+PCAP_HEADER = struct.pack('<IHHiIII', 0xa1b2c3d4, 2, 4, 0, 0, 65535, 127)
+
+
+def load(path, overrides=None, clock=time.time):
+    options = {}
+    if path:
+        with open(path) as fp:
+            options = toml.load(fp)
+    options.update(overrides or {})
+    return Scenario(options, clock=clock)
+
+
+def _iso(ts):
+    return datetime.fromtimestamp(ts).isoformat()
+
+
+def _freq(channel):
+    if channel == 14:
+        return 2484
+    if channel < 14:
+        return 2407 + channel * 5
+    return 5000 + channel * 5
+
+
+class Scenario(object):
+    """
+    Deterministic synthetic RF environment reacting to the bettercap commands pwnagotchi sends:
+    access points and client stations spread over the channels, handshakes captured with a
+    configurable probability when deauthed stations reconnect on the channel we're listening to.
+    """
+
+    def __init__(self, options=None, clock=time.time):
+        self.options = dict(DEFAULTS)
+        self.options.update(options or {})
+        self.clock = clock
+        self._lock = threading.RLock()
+        self._rand = random.Random(self.options['seed'])
+        self._listeners = []
+        self._pending = []
+        self._seq = 0
+        self._aps = {}
+        self._clients = {}
+        self._pwned = set()
+        self._vars = {'wifi.handshakes.file': self.options['handshakes']}
+        # None means hopping on every channel
+        self._channels = None
+        self._last_churn = self.clock()
+        self.stats = {'assocs': 0, 'deauths': 0, 'handshakes': 0, 'missed_handshakes': 0, 'errors': 0}
+
+        for _ in range(self.options['aps']):
+            self._new_ap()
+        aps = list(self._aps.values())
+        for _ in range(self.options['clients'] if aps else 0):
+            self._new_client(self._rand.choice(aps))
+
+    def on_event(self, cb):
+        self._listeners.append(cb)
+
+    def _emit(self, tag, data):
+        event = {'tag': tag, 'time': _iso(self.clock()), 'data': data}
+        for cb in self._listeners:
+            cb(event)
+
+    def _mac(self):
+        # locally administered unicast
+        octets = [self._rand.randint(0, 255) for _ in range(6)]
+        octets[0] = (octets[0] | 0x02) & 0xfe
+        return ':'.join('%02x' % o for o in octets)
+
+    def _pick_channel(self):
+        channels = self.options['channels']
+        spread = self.options['channel_spread']
+        preferred = [ch for ch in channels if ch in NON_OVERLAPPING] or channels
+        if self._rand.random() < spread:
+            return self._rand.choice(channels)
+        return self._rand.choice(preferred)
+
+    def _new_ap(self):
+        now = self.clock()
+        mac = self._mac()
+        channel = self._pick_channel()
+        is_open = self._rand.random() < self.options['open_ratio']
+        ap = {
+            'ipv4': '0.0.0.0',
+            'ipv6': '',
+            'mac': mac,
+            'hostname': 'net-%s' % mac.replace(':', '')[-6:],
+            'alias': '',
+            'vendor': self._rand.choice(VENDORS),
+            'first_seen': _iso(now),
+            'last_seen': _iso(now),
+            'meta': {'values': {}},
+            'frequency': _freq(channel),
+            'channel': channel,
+            'rssi': self._rand.randint(self.options['min_rssi'], self.options['max_rssi']),
+            'sent': 0,
+            'received': 0,
+            'encryption': 'OPEN' if is_open else 'WPA2',
+            'cipher': '' if is_open else 'CCMP',
+            'authentication': '' if is_open else 'PSK',
+            'wps': {},
+            'clients': [],
+            'handshake': False
+        }
+        self._aps[mac] = ap
+        return ap
+
+    def _new_client(self, ap):
+        now = self.clock()
+        sta = {
+            'ipv4': '0.0.0.0',
+            'ipv6': '',
+            'mac': self._mac(),
+            'hostname': '',
+            'alias': '',
+            'vendor': self._rand.choice(VENDORS),
+            'first_seen': _iso(now),
+            'last_seen': _iso(now),
+            'meta': {'values': {}},
+            'frequency': ap['frequency'],
+            'channel': ap['channel'],
+            'rssi': self._rand.randint(self.options['min_rssi'], self.options['max_rssi']),
+            'sent': 0,
+            'received': 0,
+            'encryption': '',
+            'cipher': '',
+            'authentication': '',
+            'wps': {}
+        }
+        ap['clients'].append(sta)
+        self._clients[sta['mac']] = ap['mac']
+        return sta
+
+    def listening_on(self, channel):
+        return self._channels is None or channel in self._channels
+
+    def session(self):
+        with self._lock:
+            aps = list(self._aps.values())
+            return {
+                'interfaces': [{'name': self.options['iface'], 'flags': ['UP', 'MONITOR']}],
+                'modules': [{'name': 'wifi', 'running': True}, {'name': 'wifi.recon', 'running': True}],
+                'gps': {'Latitude': 0, 'Longitude': 0},
+                'wifi': {'aps': aps}
+            }
+
+    def run(self, line):
+        """
+        Runs one or more ';' separated commands, raises on the first failing one like bettercap does.
+        """
+        with self._lock:
+            for command in line.split(';'):
+                command = command.strip()
+                if command:
+                    self._run_one(command)
+        return {'success': True, 'msg': ''}
+
+    def _run_one(self, command):
+        parts = command.split()
+        name, args = parts[0], parts[1:]
+
+        if name == 'set' and len(args) >= 2:
+            self._vars[args[0]] = ' '.join(args[1:])
+        elif name == 'wifi.recon.channel':
+            if not args or args[0] == 'clear':
+                self._channels = None
+            else:
+                self._channels = set(int(ch) for ch in args[0].split(','))
+        elif name == 'wifi.assoc':
+            self._assoc(args[0].lower())
+        elif name == 'wifi.deauth':
+            self._deauth(args[0].lower())
+        # everything else (events.*, wifi.clear, module on/off, !shell ...) is accepted and ignored
+
+    def _unknown(self, mac):
+        self.stats['errors'] += 1
+        raise Exception(f"{mac} is an unknown BSSID or it is in the association skip list.")
+
+    def _schedule(self, delay, sta_mac, ap_mac):
+        self._seq += 1
+        heapq.heappush(self._pending, (self.clock() + delay, self._seq, sta_mac, ap_mac))
+
+    def _assoc(self, mac):
+        ap = self._aps.get(mac)
+        if ap is None:
+            self._unknown(mac)
+        self.stats['assocs'] += 1
+        if self._rand.random() < self.options['pmkid_probability']:
+            self._schedule(0.5, self.options['iface'], mac)
+
+    def _deauth(self, mac):
+        ap_mac = self._clients.get(mac)
+        if ap_mac is None:
+            self._unknown(mac)
+        self.stats['deauths'] += 1
+        if self._rand.random() < self.options['handshake_probability']:
+            delay = self._rand.uniform(self.options['reconnect_min'], self.options['reconnect_max'])
+            self._schedule(delay, mac, ap_mac)
+
+    def tick(self):
+        """
+        Delivers the handshakes that are due and applies the access points churn.
+        """
+        with self._lock:
+            now = self.clock()
+            while self._pending and self._pending[0][0] <= now:
+                _, _, sta_mac, ap_mac = heapq.heappop(self._pending)
+                ap = self._aps.get(ap_mac)
+                if ap is None:
+                    continue
+                if not self.listening_on(ap['channel']):
+                    self.stats['missed_handshakes'] += 1
+                    continue
+                self._handshake(ap, sta_mac)
+
+            churn = self.options['churn_per_minute']
+            if churn > 0 and self._aps:
+                elapsed = now - self._last_churn
+                for _ in range(int(elapsed * churn / 60.0)):
+                    self._last_churn = now
+                    self._churn()
+
+    def _churn(self):
+        lost = self._rand.choice(list(self._aps.values()))
+        del self._aps[lost['mac']]
+        for sta in lost['clients']:
+            self._clients.pop(sta['mac'], None)
+        self._emit('wifi.ap.lost', lost)
+
+        ap = self._new_ap()
+        self._emit('wifi.ap.new', ap)
+
+    def _handshake(self, ap, sta_mac):
+        key = (sta_mac, ap['mac'])
+        if key in self._pwned:
+            return
+        self._pwned.add(key)
+        self.stats['handshakes'] += 1
+        ap['handshake'] = True
+
+        path = self._vars.get('wifi.handshakes.file', self.options['handshakes'])
+        filename = os.path.join(path, "%s_%s.pcap" % (ap['hostname'], ap['mac'].replace(':', '')))
+        try:
+            os.makedirs(path, exist_ok=True)
+            if not os.path.exists(filename):
+                with open(filename, 'wb') as fp:
+                    fp.write(PCAP_HEADER)
+        except OSError as e:
+            logging.error("[sim] can't write %s: %s" % (filename, e))
+
+        self._emit('wifi.client.handshake', {
+            'file': filename,
+            'station': sta_mac,
+            'ap': ap['mac'],
+            'pmkid': sta_mac == self.options['iface'],
+            'full': sta_mac != self.options['iface'],
+            'half': False
+        })
@@ -0,0 +1,236 @@
+"""
+A local stand-in for bettercap's REST API, serving /api/session (GET and POST) and the
+/api/events websocket on top of a synthetic scenario, so the agent and the plugins can be
+exercised and benchmarked without a monitor mode radio:
+
+    python3 -m pwnagotchi.sim.server --aps 1000 --clients 3000 --port 8081
+
+then point bettercap.hostname/bettercap.port of the unit configuration to it.
+"""
+import argparse
+import base64
+import hashlib
+import json
+import logging
+import queue
+import secrets
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from pwnagotchi.sim.scenario import load, DEFAULTS
+
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+WS_TEXT = 0x1
+WS_CLOSE = 0x8
+WS_PING = 0x9
+WS_PONG = 0xa
+
+
+def _ws_frame(payload, opcode=WS_TEXT):
+    header = bytes([0x80 | opcode])
+    size = len(payload)
+    if size < 126:
+        header += bytes([size])
+    elif size < 65536:
+        header += bytes([126]) + struct.pack('!H', size)
+    else:
+        header += bytes([127]) + struct.pack('!Q', size)
+    return header + payload
+
+
+def _recv_exact(sock, size):
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError('connection closed')
+        data += chunk
+    return data
+
+
+def _ws_read(sock):
+    b1, b2 = _recv_exact(sock, 2)
+    opcode = b1 & 0x0f
+    size = b2 & 0x7f
+    if size == 126:
+        size = struct.unpack('!H', _recv_exact(sock, 2))[0]
+    elif size == 127:
+        size = struct.unpack('!Q', _recv_exact(sock, 8))[0]
+    mask = _recv_exact(sock, 4) if b2 & 0x80 else None
+    payload = _recv_exact(sock, size)
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return opcode, payload
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, fmt, *args):
+        logging.debug("[sim] %s - %s" % (self.address_string(), fmt % args))
+
+    def _authorized(self):
+        expected = base64.b64encode(('%s:%s' % (self.server.username, self.server.password)).encode()).decode()
+        return secrets.compare_digest(self.headers.get('Authorization', ''), 'Basic %s' % expected)
+
+    def _reply(self, status, body, ctype='application/json'):
+        data = body.encode() if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header('Content-Type', ctype)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if not self._authorized():
+            return self._reply(401, 'Unauthorized', 'text/plain')
+
+        if self.path.startswith('/api/session'):
+            self.server.requests += 1
+            return self._reply(200, json.dumps(self.server.scenario.session()))
+
+        if self.path.startswith('/api/events') and 'websocket' in self.headers.get('Upgrade', '').lower():
+            return self._stream_events()
+
+        self._reply(404, 'Not Found', 'text/plain')
+
+    def do_POST(self):
+        if not self._authorized():
+            return self._reply(401, 'Unauthorized', 'text/plain')
+
+        if not self.path.startswith('/api/session'):
+            return self._reply(404, 'Not Found', 'text/plain')
+
+        self.server.requests += 1
+        size = int(self.headers.get('Content-Length', 0))
+        try:
+            cmd = json.loads(self.rfile.read(size))['cmd']
+            self._reply(200, json.dumps(self.server.scenario.run(cmd)))
+        except Exception as e:
+            self._reply(400, str(e), 'text/plain')
+
+    def _stream_events(self):
+        key = self.headers['Sec-WebSocket-Key']
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        self.send_response(101)
+        self.send_header('Upgrade', 'websocket')
+        self.send_header('Connection', 'Upgrade')
+        self.send_header('Sec-WebSocket-Accept', accept)
+        self.end_headers()
+        self.wfile.flush()
+        self.close_connection = True
+
+        sock = self.connection
+        events = self.server.subscribe()
+        lock = threading.Lock()
+        closed = threading.Event()
+
+        def reader():
+            try:
+                while not closed.is_set():
+                    opcode, payload = _ws_read(sock)
+                    if opcode == WS_PING:
+                        with lock:
+                            sock.sendall(_ws_frame(payload, WS_PONG))
+                    elif opcode == WS_CLOSE:
+                        break
+            except (OSError, ConnectionError, ValueError):
+                pass
+            closed.set()
+
+        threading.Thread(target=reader, daemon=True).start()
+        try:
+            while not closed.is_set():
+                try:
+                    event = events.get(timeout=1.0)
+                except queue.Empty:
+                    continue
+                with lock:
+                    sock.sendall(_ws_frame(json.dumps(event).encode()))
+        except OSError:
+            pass
+        finally:
+            closed.set()
+            self.server.unsubscribe(events)
+
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, scenario, address='127.0.0.1', port=8081, username='pwnagotchi', password='pwnagotchi'):
+        super(Server, self).__init__((address, port), Handler)
+        self.scenario = scenario
+        self.username = username
+        self.password = password
+        self.requests = 0
+        self._subscribers = []
+        self._lock = threading.Lock()
+        scenario.on_event(self._broadcast)
+
+    def subscribe(self):
+        q = queue.Queue(maxsize=10000)
+        with self._lock:
+            self._subscribers.append(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.remove(q)
+
+    def _broadcast(self, event):
+        with self._lock:
+            for q in self._subscribers:
+                try:
+                    q.put_nowait(event)
+                except queue.Full:
+                    pass
+
+    def _ticker(self, interval):
+        while True:
+            self.scenario.tick()
+            time.sleep(interval)
+
+    def start(self, tick=0.25):
+        threading.Thread(target=self._ticker, args=(tick,), daemon=True).start()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake bettercap API serving a synthetic RF scenario.')
+    parser.add_argument('--scenario', dest='scenario', default=None, help='TOML scenario file.')
+    parser.add_argument('--address', dest='address', default='127.0.0.1')
+    parser.add_argument('--port', dest='port', type=int, default=8081)
+    parser.add_argument('--username', dest='username', default='pwnagotchi')
+    parser.add_argument('--password', dest='password', default='pwnagotchi')
+    parser.add_argument('--seed', dest='seed', type=int, default=None)
+    parser.add_argument('--aps', dest='aps', type=int, default=None)
+    parser.add_argument('--clients', dest='clients', type=int, default=None)
+    parser.add_argument('--channel-spread', dest='channel_spread', type=float, default=None)
+    parser.add_argument('--handshake-probability', dest='handshake_probability', type=float, default=None)
+    parser.add_argument('--handshakes', dest='handshakes', default=None, help='Where to write the stub pcaps.')
+    parser.add_argument('--debug', dest='debug', action='store_true', default=False)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO,
+                        format='[%(asctime)s] [%(levelname)s] %(message)s')
+
+    overrides = {name: getattr(args, name) for name in DEFAULTS if getattr(args, name, None) is not None}
+    scenario = load(args.scenario, overrides)
+
+    server = Server(scenario, args.address, args.port, args.username, args.password)
+    server.start()
+    logging.info("[sim] fake bettercap with %d access points and %d clients on http://%s:%d/api" % (
+        scenario.options['aps'], scenario.options['clients'], args.address, args.port))
+
+    try:
+        while True:
+            time.sleep(10)
+            logging.info("[sim] requests=%d %s" % (server.requests, scenario.stats))
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+import collections
+import logging
+import threading
+import time
+
+PROC_STAT = '/proc/stat'
+PROC_MEMINFO = '/proc/meminfo'
+PROC_LOADAVG = '/proc/loadavg'
+THERMAL_ZONE = '/sys/class/thermal/thermal_zone0/temp'
+# exposed by the raspberry pi firmware driver, same bits as `vcgencmd get_throttled`
+THROTTLED = '/sys/devices/platform/soc/soc:firmware/get_throttled'
+
+_lock = threading.Lock()
+_sampler = None
+
+
+class _File(object):
+    """
+    A /proc or /sys file kept open and read again from the start, None if it's not there.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            self._fp = open(path, 'rt')
+        except OSError:
+            self._fp = None
+
+    def read(self):
+        if self._fp is None:
+            return None
+        self._fp.seek(0)
+        return self._fp.read()
+
+
+class Sampler(object):
+    """
+    Samples CPU load, memory usage, temperature, load average and the throttling state every
+    interval seconds on a background thread, keeping the last history seconds of samples in
+    a ring buffer. Readers never block on it.
+    """
+
+    def __init__(self, interval=1.0, history=300):
+        self.interval = interval
+        self._samples = collections.deque(maxlen=max(1, int(history / interval)))
+        self._stat = _File(PROC_STAT)
+        self._meminfo = _File(PROC_MEMINFO)
+        self._loadavg = _File(PROC_LOADAVG)
+        self._thermal = _File(THERMAL_ZONE)
+        self._throttled = _File(THROTTLED)
+        self._prev_cpu = None
+        # sample() runs on the sampler thread and, until there's a first sample, from latest()
+        self._sample_lock = threading.Lock()
+        self._thread = None
+
+    def _cpu_load(self):
+        data = self._stat.read()
+        if data is None:
+            return 0.0
+        user, nice, sys, idle, iowait, irq, softirq, steal = map(int, data.split('\n', 1)[0].split()[1:9])
+        busy = user + nice + sys + irq + softirq + steal
+        total = busy + idle + iowait
+        prev, self._prev_cpu = self._prev_cpu, (busy, total)
+        if prev is None:
+            # since boot
+            return busy / total if total else 0.0
+        elapsed = total - prev[1]
+        return (busy - prev[0]) / elapsed if elapsed else 0.0
+
+    def _mem_usage(self):
+        data = self._meminfo.read()
+        if data is None:
+            return 0.0
+        kb = {}
+        for line in data.split('\n'):
+            parts = line.split()
+            if len(parts) >= 2 and parts[0] in ('MemTotal:', 'MemFree:', 'Buffers:', 'Cached:'):
+                kb[parts[0]] = int(parts[1])
+        total = kb.get('MemTotal:', 0)
+        if not total:
+            return 0.0
+        used = total - kb.get('MemFree:', 0) - kb.get('Cached:', 0) - kb.get('Buffers:', 0)
+        return used / total
+
+    def _temperature(self):
+        data = self._thermal.read()
+        return int(int(data.strip()) / 1000) if data else 0
+
+    def _load(self):
+        data = self._loadavg.read()
+        return [float(v) for v in data.split()[:3]] if data else [0.0, 0.0, 0.0]
+
+    def _throttling(self):
+        data = self._throttled.read()
+        if not data:
+            return None
+        return int(data.strip(), 16) if data.strip().startswith('0x') else int(data.strip())
+
+    def sample(self):
+        """
+        Takes a sample now and adds it to the buffer.
+        """
+        with self._sample_lock:
+            return self._sample()
+
+    def _sample(self):
+        load = self._load()
+        sample = {
+            'time': time.time(),
+            'cpu_load': self._cpu_load(),
+            'mem_usage': self._mem_usage(),
+            'temperature': self._temperature(),
+            'load_1': load[0],
+            'load_5': load[1],
+            'load_15': load[2],
+            'throttled': self._throttling()
+        }
+        self._samples.append(sample)
+        return sample
+
+    def _run(self):
+        while True:
+            try:
+                self.sample()
+            except Exception as e:
+                logging.debug(f"error while sampling the system: {e}")
+            time.sleep(self.interval)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def latest(self):
+        """
+        Last sample, taken right away if there's none yet. If that fails the values are the ones
+        of a missing /proc or /sys file, so that the UI and the epochs can go on.
+        """
+        try:
+            return self._samples[-1]
+        except IndexError:
+            pass
+
+        try:
+            return self.sample()
+        except Exception as e:
+            logging.warning(f"error while sampling the system: {e}")
+            return {
+                'time': time.time(),
+                'cpu_load': 0.0,
+                'mem_usage': 0.0,
+                'temperature': 0,
+                'load_1': 0.0,
+                'load_5': 0.0,
+                'load_15': 0.0,
+                'throttled': None
+            }
+
+    def window(self, seconds):
+        """
+        Samples of the last seconds, oldest first.
+        """
+        since = time.time() - seconds
+        samples = []
+        for sample in reversed(list(self._samples)):
+            if sample['time'] < since:
+                break
+            samples.append(sample)
+        samples.reverse()
+        return samples
+
+
+def start(interval=1.0, history=300):
+    """
+    Starts the shared sampler, or returns it if it's already running.
+    """
+    global _sampler
+    with _lock:
+        if _sampler is None:
+            _sampler = Sampler(interval, history).start()
+            logging.debug(f"sampling the system every {interval}s")
+        return _sampler
+
+
+def sampler():
+    return start() if _sampler is None else _sampler
+
+
+def latest():
+    return sampler().latest()
+
+
+def window(seconds):
+    return sampler().window(seconds)
@@ -0,0 +1,136 @@
+import bisect
+import threading
+import time
+from functools import wraps
+
+# bucket upper bounds in seconds, from 100us to ~2 minutes, 4 buckets per decade
+BOUNDS = tuple(1e-4 * 10 ** (i / 4.0) for i in range(25))
+
+enabled = False
+
+_lock = threading.Lock()
+_phases = {}
+
+
+class Histogram(object):
+    """
+    Fixed size histogram of durations over BOUNDS, the last bucket counts everything above.
+    """
+
+    def __init__(self):
+        self.buckets = [0] * (len(BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, secs):
+        self.buckets[bisect.bisect_left(BOUNDS, secs)] += 1
+        self.count += 1
+        self.total += secs
+        if secs > self.max:
+            self.max = secs
+
+    def percentile(self, p):
+        """
+        Upper bound of the bucket holding the p-th percentile, capped to the max seen.
+        """
+        if not self.count:
+            return 0.0
+        rank = p / 100.0 * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank and n:
+                return min(BOUNDS[i], self.max) if i < len(BOUNDS) else self.max
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'total': self.total,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'max': self.max
+        }
+
+
+def enable(flag=True):
+    global enabled
+    enabled = flag
+
+
+def record(phase, secs):
+    with _lock:
+        hist = _phases.get(phase)
+        if hist is None:
+            hist = _phases[phase] = Histogram()
+        hist.add(secs)
+
+
+class _Timer(object):
+    __slots__ = ('phase', 'started')
+
+    def __init__(self, phase):
+        self.phase = phase
+
+    def __enter__(self):
+        self.started = time.monotonic()
+        return self
+
+    def __exit__(self, *unused):
+        record(self.phase, time.monotonic() - self.started)
+
+
+class _NoTimer(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *unused):
+        pass
+
+
+_no_timer = _NoTimer()
+
+
+def phase(name):
+    """
+    Context manager timing its block as the given phase, does nothing while timing is disabled.
+    """
+    return _Timer(name) if enabled else _no_timer
+
+
+def timed(name):
+    """
+    Decorator timing every call of the function as the given phase.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return fn(*args, **kwargs)
+            started = time.monotonic()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(name, time.monotonic() - started)
+
+        return wrapper
+
+    return decorator
+
+
+def summary(reset=True):
+    """
+    Percentiles per phase since the previous reset.
+    """
+    global _phases
+    with _lock:
+        phases = _phases
+        if reset:
+            _phases = {}
+    return {name: hist.summary() for name, hist in sorted(phases.items())}
+
+
+def format_summary(phases):
+    return ' '.join("%s=%.3f/%.3f/%.3f" % (name, s['p50'], s['p90'], s['max']) for name, s in phases.items())
@@ -8,6 +8,8 @@ from PIL import ImageDraw
 import pwnagotchi
 import pwnagotchi.utils as utils
 import pwnagotchi.plugins as plugins
+import pwnagotchi.metrics as metrics
+import pwnagotchi.timing as timing
 from pwnagotchi.voice import Voice
 
 import pwnagotchi.ui.web as web
@@ -20,6 +22,8 @@ WHITE = 0xff
 BLACK = 0x00
 ROOT = None
 
+RENDER_TIME = metrics.histogram('pwnagotchi_ui_render_seconds', 'Time to draw a frame of the UI.')
+
 
 class View(object):
     def __init__(self, config, impl, state=None):
@@ -140,6 +144,10 @@ class View(object):
         self.set('face', faces.AWAKE)
         self.update()
 
+    def on_ai_bootstrap(self, stage, elapsed):
+        self.set('status', self._voice.on_ai_bootstrap(stage, elapsed))
+        self.update()
+
     def on_ai_ready(self):
         self.set('mode', '  AI')
         self.set('face', faces.HAPPY)
@@ -355,6 +363,7 @@ class View(object):
         self.set('status', self._voice.custom(text))
         self.update()
 
+    @timing.timed('view_update')
     def update(self, force=False, new_data={}):
         for key, val in new_data.items():
             self.set(key, val)
@@ -366,6 +375,7 @@ class View(object):
             state = self._state
             changes = state.changes(ignore=self._ignore_changes)
             if force or len(changes):
+                started = time.monotonic()
                 self._canvas = Image.new('1', (self._width, self._height), WHITE)
                 drawer = ImageDraw.Draw(self._canvas)
 
@@ -380,3 +390,4 @@ class View(object):
                     cb(self._canvas)
 
                 self._state.reset()
+                RENDER_TIME.observe(time.monotonic() - started)
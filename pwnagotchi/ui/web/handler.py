@@ -12,6 +12,8 @@ os.environ['WERKZEUG_RUN_MAIN'] = 'true'
 
 import pwnagotchi
 import pwnagotchi.grid as grid
+import pwnagotchi.metrics as metrics
+import pwnagotchi.sysmon as sysmon
 import pwnagotchi.ui.web as web
 from pwnagotchi import plugins
 
@@ -37,6 +39,12 @@ class Handler:
         self._app.add_url_rule('/reboot', 'reboot', self.with_auth(self.reboot), methods=['POST'])
         self._app.add_url_rule('/restart', 'restart', self.with_auth(self.restart), methods=['POST'])
 
+        self._app.add_url_rule('/api/channels', 'channels', self.with_auth(self.channels))
+        self._app.add_url_rule('/api/radios', 'radios', self.with_auth(self.radios))
+        self._app.add_url_rule('/api/system', 'system', self.with_auth(self.system))
+        self._app.add_url_rule('/api/ai', 'ai', self.with_auth(self.ai))
+        self._app.add_url_rule('/metrics', 'metrics', self.with_auth(self.metrics))
+
         # inbox
         self._app.add_url_rule('/inbox', 'inbox', self.with_auth(self.inbox))
         self._app.add_url_rule('/inbox/profile', 'inbox_profile', self.with_auth(self.inbox_profile))
@@ -76,6 +84,25 @@ class Handler:
                                other_mode='AUTO' if self._agent.mode == 'manual' else 'MANU',
                                fingerprint=self._agent.fingerprint())
 
+    def radios(self):
+        return jsonify(self._agent.radios())
+
+    def system(self):
+        seconds = request.args.get("seconds", default=60, type=int)
+        return jsonify({
+            'latest': sysmon.latest(),
+            'window': sysmon.window(seconds)
+        })
+
+    def ai(self):
+        return jsonify(self._agent.ai_status())
+
+    def metrics(self):
+        return Response(metrics.render(), mimetype=metrics.CONTENT_TYPE)
+
+    def channels(self):
+        return jsonify(self._agent.channel_plan())
+
     def inbox(self):
         page = request.args.get("p", default=1, type=int)
         inbox = {
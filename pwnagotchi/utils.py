@@ -14,6 +14,8 @@ from zipfile import ZipFile
 import toml
 from toml.encoder import TomlEncoder, _dump_str
 
+import pwnagotchi.handshakes as handshakes
+
 
 class DottedTomlEncoder(TomlEncoder):
     """
@@ -289,9 +291,15 @@ def secs_to_hhmmss(secs):
     return f'{hours:02}:{mins:02}:{secs:02}'
 
 
+def mac_to_int(mac):
+    """
+    Converts a MAC address to a 48 bit integer, regardless of case and separators
+    """
+    return int(mac.replace(':', '').replace('-', ''), 16)
+
+
 def total_unique_handshakes(path):
-    expr = os.path.join(path, "*.pcap")
-    return len(glob.glob(expr))
+    return handshakes.index(path).count()
 
 
 def iface_channels(ifname):
@@ -26,6 +26,9 @@ class Voice:
             self._('New day, new hunt, new pwns!'),
             self._('Hack the Planet!')])
 
+    def on_ai_bootstrap(self, stage, elapsed):
+        return self._('Waking up the AI: {stage} ({secs}s so far)...').format(stage=stage, secs=int(elapsed))
+
     def on_ai_ready(self):
         return random.choice([
             self._('AI ready.'),
@@ -0,0 +1,62 @@
+import re
+
+# full MAC addresses and MAC prefixes (OUIs) like aa:bb:cc
+MAC_PREFIX = re.compile(r'^([0-9a-f]{2}:){1,5}[0-9a-f]{2}$')
+MAC_LEN = 17
+
+
+class Whitelist(object):
+    """
+    Compiled form of main.whitelist and main.filter: hostnames and MAC addresses are looked up
+    in a set, MAC prefixes in a table keyed by prefix length and the filters are merged in a
+    single regular expression, so that the cost per access point doesn't grow with the lists.
+    """
+
+    def __init__(self, entries, filters=None):
+        # copies, the config lists can be changed in place after this
+        self.source = (list(entries), filters if filters is None or isinstance(filters, str) else list(filters))
+        self._exact = set()
+        # prefix length -> set of prefixes
+        self._prefixes = {}
+        self._filter = None
+
+        for entry in entries:
+            entry = str(entry)
+            # hostnames are matched case sensitive
+            self._exact.add(entry)
+            lowered = entry.lower()
+            if MAC_PREFIX.match(lowered):
+                if len(lowered) == MAC_LEN:
+                    self._exact.add(lowered)
+                else:
+                    self._prefixes.setdefault(len(lowered), set()).add(lowered)
+
+        if isinstance(filters, str):
+            filters = [filters]
+        filters = [f for f in (filters or []) if f]
+        if len(filters) == 1:
+            self._filter = re.compile(filters[0])
+        elif filters:
+            self._filter = re.compile('|'.join('(?:%s)' % f for f in filters))
+
+    def compiled_from(self, entries, filters):
+        return self.source[0] == entries and self.source[1] == filters
+
+    def whitelisted(self, ap):
+        if ap['hostname'] in self._exact:
+            return True
+        mac = ap['mac'].lower()
+        if mac in self._exact:
+            return True
+        for size, prefixes in self._prefixes.items():
+            if mac[:size] in prefixes:
+                return True
+        return False
+
+    def filtered_out(self, ap):
+        return self._filter is not None and \
+               self._filter.match(ap['hostname']) is None and \
+               self._filter.match(ap['mac']) is None
+
+    def included(self, ap):
+        return not self.whitelisted(ap) and not self.filtered_out(ap)
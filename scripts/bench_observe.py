@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+import sys
+import os
+import argparse
+import random
+import timeit
+
+import numpy as np
+
+sys.path.insert(0,
+                os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                             '../'))
+
+import pwnagotchi.mesh.wifi as wifi
+import pwnagotchi.ai.featurizer as featurizer
+from pwnagotchi.ai.epoch import Epoch
+
+CHANNELS = list(range(1, 15)) + [36, 40, 44, 48, 52, 56, 60, 64, 100, 104, 108, 112, 116, 120, 124, 128, 132, 136]
+
+
+class Peer(object):
+    def __init__(self, channel):
+        self.last_channel = channel
+        self.encounters = 1
+
+
+def make_aps(rand, count):
+    return [{'channel': rand.choice(CHANNELS), 'clients': [None] * rand.randint(0, 8)} for _ in range(count)]
+
+
+def lists_observe(aps, peers):
+    # what Epoch.observe used to do
+    num_peers = len(peers) + 1e-10
+    num_aps = len(aps) + 1e-10
+    num_sta = sum(len(ap['clients']) for ap in aps) + 1e-10
+    aps_per_chan = [0.0] * wifi.NumChannels
+    sta_per_chan = [0.0] * wifi.NumChannels
+    peers_per_chan = [0.0] * wifi.NumChannels
+
+    for ap in aps:
+        ch_idx = ap['channel'] - 1
+        aps_per_chan[ch_idx] += 1.0
+        sta_per_chan[ch_idx] += len(ap['clients'])
+
+    for peer in peers:
+        peers_per_chan[peer.last_channel - 1] += 1.0
+
+    return {
+        'aps_histogram': [e / num_aps for e in aps_per_chan],
+        'sta_histogram': [e / num_sta for e in sta_per_chan],
+        'peers_histogram': [e / num_peers for e in peers_per_chan]
+    }
+
+
+def concatenate_featurize(state, step):
+    # what featurizer.featurize used to do
+    tot_epochs = step + 1e-10
+    tot_interactions = (state['num_deauths'] + state['num_associations']) + 1e-10
+    return np.concatenate((
+        state['aps_histogram'],
+        state['sta_histogram'],
+        state['peers_histogram'],
+        [np.clip(state['duration_secs'] / featurizer.MAX_EPOCH_DURATION, 0.0, 1.0)],
+        [state['inactive_for_epochs'] / tot_epochs],
+        [state['active_for_epochs'] / tot_epochs],
+        [state['missed_interactions'] / tot_interactions],
+        [state['num_hops'] / wifi.NumChannels],
+        [state['num_deauths'] / tot_interactions],
+        [state['num_associations'] / tot_interactions],
+        [state['num_handshakes'] / tot_interactions],
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measures Epoch.observe and featurize over a growing number of APs.')
+    parser.add_argument('--sizes', default='10,100,1000,10000', help='Comma separated numbers of access points.')
+    parser.add_argument('--peers', type=int, default=5)
+    parser.add_argument('--rounds', type=int, default=50)
+    args = parser.parse_args()
+
+    rand = random.Random(0)
+    epoch = Epoch({'personality': {'bond_encounters_factor': 20000}})
+    peers = [Peer(rand.choice(CHANNELS)) for _ in range(args.peers)]
+    state = {
+        'duration_secs': 120.0, 'inactive_for_epochs': 2, 'active_for_epochs': 5, 'missed_interactions': 3,
+        'num_hops': 9, 'num_deauths': 30, 'num_associations': 12, 'num_handshakes': 2
+    }
+    out = featurizer.buffer()
+
+    print("%8s %12s %12s %12s %12s" % ('aps', 'lists', 'numpy', 'concatenate', 'buffer'))
+    for size in map(int, args.sizes.split(',')):
+        aps = make_aps(rand, size)
+
+        epoch.observe(aps, peers)
+        expected = lists_observe(aps, peers)
+        for key, hist in expected.items():
+            assert np.allclose(epoch._observation[key], hist, atol=1e-6), key
+        state.update(epoch._observation)
+        assert np.allclose(concatenate_featurize(state, 10), featurizer.featurize(state, 10, out), atol=1e-6)
+
+        timings = [min(timeit.repeat(fn, number=1, repeat=args.rounds)) * 1e6 for fn in (
+            lambda: lists_observe(aps, peers),
+            lambda: epoch.observe(aps, peers),
+            lambda: concatenate_featurize(state, 10),
+            lambda: featurizer.featurize(state, 10, out))]
+        print("%8d %10.1fus %10.1fus %10.1fus %10.1fus" % tuple([size] + timings))
+
+
+if __name__ == '__main__':
+    main()
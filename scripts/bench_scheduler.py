@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+import sys
+import os
+import argparse
+import json
+import random
+import time
+
+sys.path.insert(0,
+                os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                             '../'))
+
+import toml
+
+import pwnagotchi.scheduler as scheduler
+import pwnagotchi.utils as utils
+from pwnagotchi.history import InteractionHistory
+from pwnagotchi.sim.scenario import Scenario
+
+
+def load_config():
+    path = os.path.join(os.path.dirname(scheduler.__file__), 'defaults.toml')
+    with open(path) as fp:
+        return toml.load(fp)
+
+
+def group_by_channel(aps):
+    # what Agent.get_access_points_by_channel does
+    grouped = {}
+    for ap in aps:
+        if ap['encryption'] in ('', 'OPEN'):
+            continue
+        grouped.setdefault(ap['channel'], []).append(ap)
+    return sorted(grouped.items(), key=lambda kv: len(kv[1]), reverse=True)
+
+
+def success_chance(action, base):
+    # toy yield model: closer and busier targets give handshakes more often
+    target = action.target
+    signal = min(max((target.get('rssi', -100) + 95) / 65.0, 0.0), 1.0)
+    busy = 1.0 if target.get('sent', 0) + target.get('received', 0) > 0 else 0.5
+    return base * signal * busy
+
+
+def simulate(name, config, session, args):
+    config['personality']['scheduler']['name'] = name
+    sched = scheduler.load(config)
+    rand = random.Random(args.seed)
+    pwned = set()
+    clock = [0.0]
+    history = InteractionHistory(ttl=config['main']['history']['ttl'], clock=lambda: clock[0])
+    max_interactions = config['personality']['max_interactions']
+    now = 0.0
+    airtime = 0.0
+    actions = 0
+    handshakes = 0
+    planning = []
+
+    for _ in range(args.epochs):
+        channels = group_by_channel(session['wifi']['aps'])
+        started = time.perf_counter()
+        clock[0] = now
+        plans = sched.plan(channels, lambda mac: mac.lower() in pwned, history)
+        planning.append(time.perf_counter() - started)
+
+        for plan in plans:
+            deadline = now + plan.budget if plan.budget > 0 else None
+            for action in plan.actions:
+                if deadline is not None and now >= deadline:
+                    break
+                # what Agent.associate and Agent.deauth skip without using any airtime
+                if action.ap['mac'].lower() in pwned:
+                    continue
+                clock[0] = now
+                if history.incr(utils.mac_to_int(action.target['mac'])) > max_interactions:
+                    continue
+                now += args.action_cost
+                airtime += args.action_cost
+                actions += 1
+                sched.attempted(action, args.action_cost)
+                if action.ap['mac'].lower() not in pwned and rand.random() < success_chance(action, args.base_chance):
+                    pwned.add(action.ap['mac'].lower())
+                    handshakes += 1
+            # wait for the deauthed stations to reconnect before hopping
+            now += args.hop_time
+            airtime += args.hop_time
+        # recon
+        now += args.recon_time
+
+    planning.sort()
+    print("%-12s plan p50 %7.3f ms  max %7.3f ms  actions %6d  airtime %7.1f s  handshakes %4d  (%.2f / airtime minute)" % (
+        name, planning[len(planning) // 2] * 1000.0, planning[-1] * 1000.0, actions, airtime, handshakes,
+        handshakes * 60.0 / airtime if airtime else 0.0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Feeds a bettercap session to the attack schedulers, offline.')
+    parser.add_argument('--session', default=None,
+                        help='JSON dump of /api/session, a synthetic one is generated if not given.')
+    parser.add_argument('--aps', type=int, default=200)
+    parser.add_argument('--clients', type=int, default=600)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--epochs', type=int, default=20)
+    parser.add_argument('--action-cost', dest='action_cost', type=float, default=0.2,
+                        help='Airtime of one association or deauth, in seconds.')
+    parser.add_argument('--hop-time', dest='hop_time', type=float, default=10.0)
+    parser.add_argument('--recon-time', dest='recon_time', type=float, default=30.0)
+    parser.add_argument('--base-chance', dest='base_chance', type=float, default=0.1)
+    parser.add_argument('--schedulers', default='sequential,priority')
+    args = parser.parse_args()
+
+    if args.session:
+        with open(args.session) as fp:
+            session = json.load(fp)
+    else:
+        session = Scenario({'seed': args.seed, 'aps': args.aps, 'clients': args.clients}).session()
+
+    for name in args.schedulers.split(','):
+        simulate(name, load_config(), session, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+import sys
+import os
+import re
+import argparse
+import random
+import timeit
+
+sys.path.insert(0,
+                os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                             '../'))
+
+from pwnagotchi.whitelist import Whitelist
+
+
+def random_mac(rand):
+    return ':'.join('%02x' % rand.randint(0, 255) for _ in range(6))
+
+
+def make_aps(rand, count):
+    return [{'hostname': 'net-%d' % i, 'mac': random_mac(rand).upper()} for i in range(count)]
+
+
+def make_whitelist(rand, count):
+    entries = []
+    for i in range(count):
+        kind = i % 3
+        if kind == 0:
+            entries.append('corp-%d' % i)
+        elif kind == 1:
+            entries.append(random_mac(rand))
+        else:
+            entries.append(random_mac(rand)[:8])
+    return entries
+
+
+def linear(aps, whitelist, flt):
+    # what Agent.get_access_points used to do
+    included = []
+    for ap in aps:
+        if ap['hostname'] not in whitelist \
+                and ap['mac'].lower() not in whitelist \
+                and ap['mac'][:8].lower() not in whitelist:
+            if flt is None or flt.match(ap['hostname']) is not None or flt.match(ap['mac']) is not None:
+                included.append(ap)
+    return included
+
+
+def compiled(aps, matcher):
+    return [ap for ap in aps if matcher.included(ap)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measures the whitelist and filter cost per 1000 access points.')
+    parser.add_argument('--aps', type=int, default=1000)
+    parser.add_argument('--whitelist', type=int, default=300, help='Number of whitelist entries.')
+    parser.add_argument('--filter', default='', help='main.filter regular expression.')
+    parser.add_argument('--rounds', type=int, default=50)
+    args = parser.parse_args()
+
+    rand = random.Random(0)
+    aps = make_aps(rand, args.aps)
+    whitelist = make_whitelist(rand, args.whitelist)
+    flt = re.compile(args.filter) if args.filter else None
+    matcher = Whitelist(whitelist, args.filter)
+
+    assert linear(aps, whitelist, flt) == compiled(aps, matcher)
+
+    per_k = 1000.0 / args.aps
+    for name, fn in (('linear', lambda: linear(aps, whitelist, flt)),
+                     ('compiled', lambda: compiled(aps, matcher))):
+        best = min(timeit.repeat(fn, number=1, repeat=args.rounds))
+        print("%-10s %8.3f ms / 1000 APs (%d entries)" % (name, best * 1000.0 * per_k, len(whitelist)))
+
+    compile_time = min(timeit.repeat(lambda: Whitelist(whitelist, args.filter), number=1, repeat=args.rounds))
+    print("%-10s %8.3f ms" % ('compile', compile_time * 1000.0))
+
+
+if __name__ == '__main__':
+    main()